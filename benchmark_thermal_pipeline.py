@@ -0,0 +1,130 @@
+"""
+Headless benchmark of the thermal camera pipeline on the simulated camera.
+Every frame goes through the same stages as in FlirCameraAcquisitionThread and the display:
+    acquire  : SimulatedFlirCameraController.get_image, itself split into wait, synthesize and convert
+    lut_only : counts -> °C lookup of the same raw frame timed on its own (already included in acquire)
+    average  : TemporalAverager.update
+    roi      : ROIStatisticsEngine.compute
+    render   : ThermalImageView.update_image and a full repaint (offscreen), skipped with --no-render
+With --roi-only, frames are fetched as raw counts and only ROI pixels are converted (compute_counts),
+as the acquisition thread does in ROI-only mode while no image is on screen.
+Run e.g.:  python benchmark_thermal_pipeline.py --frames 1000 --rois 8 --averaging Boxcar
+"""
+import os
+import argparse
+import time
+import numpy as np
+from devices.simulated_flir_camera_controller import SimulatedFlirCameraController
+from processing.frame_ring_buffer import FrameRingBuffer
+from processing.roi_statistics import ROIStatisticsEngine
+from processing.robust_estimators import ESTIMATORS, ROIEstimator
+from processing.temporal_averaging import TemporalAverager, AveragingMode
+from processing.thermal_conversion import temperature_lut, convert_counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the thermal camera pipeline on synthetic frames")
+    parser.add_argument("--frames", type=int, default=500, help="number of frames to process")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=0.0, help="camera frame rate, 0 for as fast as possible")
+    parser.add_argument("--noise", type=float, default=0.05, help="temperature noise [K rms]")
+    parser.add_argument("--incomplete", type=float, default=0.0, help="fraction of incomplete frames")
+    parser.add_argument("--rois", type=int, default=2, help="number of ROIs evaluated per frame")
+    parser.add_argument("--estimator", default=ROIEstimator.MEAN, choices=ESTIMATORS, help="location estimator of every ROI")
+    parser.add_argument("--averaging", default=AveragingMode.OFF,
+                        choices=[AveragingMode.OFF, AveragingMode.BOXCAR, AveragingMode.EMA])
+    parser.add_argument("--averaging-frames", type=int, default=8)
+    parser.add_argument("--no-render", action="store_true", help="skip the pyqtgraph rendering stage")
+    parser.add_argument("--roi-only", action="store_true", help="convert only ROI pixels, no averaging or rendering")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", help="export stage statistics and latency histograms to this file")
+    return parser.parse_args()
+
+
+def create_view(width:int, height:int):
+    """
+    offscreen ThermalImageView sized like the frames; Qt is only imported when rendering
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    from widgets.thermal_image_view import ThermalImageView
+    app = QApplication.instance() or QApplication([])
+    view = ThermalImageView()
+    view.resize(width, height)
+    view.show()
+    app.processEvents()
+    return app, view
+
+
+def main():
+    args = parse_args()
+    controller = SimulatedFlirCameraController(
+        width=args.width, height=args.height, frame_rate=args.fps, noise=args.noise,
+        incomplete_probability=args.incomplete, seed=args.seed
+    )
+    controller.connect()
+    controller.start_stream()
+    shape = controller.image_shape
+    calibration = controller.calibration_parameters
+    lut = temperature_lut(calibration["ir_type"], calibration)
+
+    frame_buffer = FrameRingBuffer()
+    raw = np.empty(shape, dtype=np.uint16)
+    scratch = np.empty(shape, dtype=np.float32)
+    averager = TemporalAverager(args.averaging, args.averaging_frames)
+    roi_engine = ROIStatisticsEngine()
+    rng = np.random.default_rng(args.seed)
+    for i in range(args.rois):
+        roi_engine.set_roi(f"roi{i}", int(rng.integers(shape[1])), int(rng.integers(shape[0])), 50, 20, args.estimator)
+    app, view = (None, None) if args.no_render or args.roi_only else create_view(args.width, args.height)
+
+    metrics = controller.metrics # also holds wait, synthesize and convert timed inside get_image
+    processed = 0
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        if args.roi_only:
+            with metrics.timed("acquire"):
+                counts = controller.get_image(raw_out=raw, convert=False)
+            if counts is None:
+                continue
+            timestamp = controller.last_frame_info.host_timestamp
+            with metrics.timed("roi"):
+                roi_engine.compute_counts(counts, controller.temperature_lut, frame_buffer.skip(), timestamp)
+            processed += 1
+            continue
+        buffer = frame_buffer.begin_write(shape, np.float32)
+        with metrics.timed("acquire"):
+            image = controller.get_image(out=buffer, raw_out=raw)
+        if image is None:
+            continue
+        with metrics.timed("lut_only"):
+            convert_counts(lut, raw, out=scratch)
+        with metrics.timed("average"):
+            averager.update(image)
+        timestamp = controller.last_frame_info.host_timestamp
+        seq = frame_buffer.commit(timestamp)
+        with metrics.timed("roi"):
+            roi_engine.compute(image, seq, timestamp)
+        if view is not None:
+            with metrics.timed("render"):
+                view.update_image(image)
+                view.grab() # forces a complete paint of the scene
+                app.processEvents()
+        processed += 1
+    elapsed = time.perf_counter() - start
+    controller.stop_stream()
+
+    print(f"{args.width}x{args.height}, {args.rois} ROIs, "
+          f"{'ROI-only conversion' if args.roi_only else f'averaging {args.averaging}'}, "
+          f"camera {'unthrottled' if args.fps <= 0 else f'{args.fps:g} fps'}")
+    print(f"frames: {processed} processed, {controller.incomplete_frames} incomplete, "
+          f"{controller.dropped_frames} dropped by the camera")
+    print(f"throughput: {processed / elapsed:.1f} frames/s")
+    print(metrics.format_summary())
+    if args.csv:
+        metrics.export_csv(args.csv)
+        print(f"statistics written to {args.csv}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import csv
 import yaml
 import os
+import logging
 from data_interface import IData
 from pathlib import Path
 
@@ -13,6 +14,8 @@ class DataLogger:
     def __init__(self, csv_path, yml_path):
         self._csv_path = csv_path
         self._yml_path = yml_path
+        self._fieldnames = None # columns of the csv header
+        self._dropped = set() # channels already reported as missing from the header
 
 
     @property
@@ -28,6 +31,8 @@ class DataLogger:
     def write_csv(self, data: IData) -> None:
         """
         Use IData as an interface for different data classes.
+        Columns are fixed by the header; channels that appear later (e.g. a spectral band
+        added while recording) are left out, channels that disappear are left empty.
         """
         data_dict = data.to_dict()
         # write header if file not existing
@@ -35,10 +40,19 @@ class DataLogger:
             with open(self._csv_path, "w", newline="", encoding=ENCODING) as f_csv:
                 writer = csv.DictWriter(f_csv, fieldnames=data_dict.keys())
                 writer.writeheader()
+            self._fieldnames = list(data_dict.keys())
+        elif self._fieldnames is None:
+            with open(self._csv_path, "r", newline="", encoding=ENCODING) as f_csv:
+                self._fieldnames = next(csv.reader(f_csv), list(data_dict.keys()))
+
+        extra = [key for key in data_dict if key not in self._fieldnames and key not in self._dropped]
+        if extra:
+            self._dropped.update(extra)
+            logging.warning(f"Not in the csv header, not written: {', '.join(extra)}")
 
         # add data (create csv file if not existing)
         with open(self._csv_path, "a", newline="", encoding=ENCODING) as f_csv:
-            writer = csv.DictWriter(f_csv, fieldnames=data_dict.keys())
+            writer = csv.DictWriter(f_csv, fieldnames=self._fieldnames, extrasaction="ignore")
             writer.writerow(data_dict)
     
 
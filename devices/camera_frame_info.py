@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+
+CAMERA_TIMESTAMP_UNIT = 1e-9 # chunk Timestamp is in ns
+
+
+@dataclass
+class FrameInfo:
+    frame_id: int # camera frame counter, -1 without chunk data
+    camera_timestamp: int # camera clock [ns], -1 without chunk data
+    host_timestamp: float # time.time() of the exposure (camera clock mapped onto host by the earliest receptions,
+                          # so late by the minimum transfer latency only), reception time without chunk data
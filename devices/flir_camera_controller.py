@@ -2,29 +2,35 @@ import os
 import PySpin # install using wheel!
 import numpy as np
 import logging
+import time
 from typing import Optional
+from processing.thermal_conversion import IRFormatType, convert_counts
+from processing.sensor_window import snap_window
+from devices.camera_frame_info import FrameInfo
+from devices.thermal_camera_base import ThermalCameraBase
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
+CHUNK_ENTRIES = ("FrameID", "Timestamp")
+CALIBRATION_NODES = ("J1", "R", "B", "F", "X", "alpha1", "alpha2", "beta1", "beta2") # float nodes, J0 is an integer node
 
-class IRFormatType:
-    LINEAR_10MK = 1
-    LINEAR_100MK = 2
-    RADIOMETRIC = 3
 
-
-class FlirCameraController:
+class FlirCameraController(ThermalCameraBase):
 
     def __init__(self) -> None:
-        self._ir_type = IRFormatType.RADIOMETRIC
+        super().__init__()
         self._system = PySpin.System.GetInstance()
          # system object is used to retrive the list of interfaces and cameras available
         self._cam_list = []
         self._camera = None
         self._streaming = False
+        self._image_shape = None # (height, width) of streamed frames
+        self._sensor_shape = None # (height, width) of the full sensor
+        self._requested_window = None # (offset_x, offset_y, width, height) applied by the next setup_camera, None for full frames
+        self._chunk_enabled = False
 
         
     @property
@@ -40,6 +46,59 @@ class FlirCameraController:
         return self._streaming
     
 
+    @property
+    def last_frame_info(self) -> Optional[FrameInfo]:
+        """
+        frame ID and timestamps of the frame most recently returned by get_image
+        """
+        return self._last_frame_info
+
+
+    @property
+    def dropped_frames(self) -> int:
+        """
+        frames missing from the frame ID sequence since streaming started
+        """
+        return self.metrics.counter("dropped")
+
+
+    @property
+    def incomplete_frames(self) -> int:
+        return self.metrics.counter("incomplete")
+
+
+    @property
+    def image_shape(self) -> Optional[tuple[int, int]]:
+        """
+        (height, width) of the frames returned by get_image; known once streaming
+        """
+        return self._image_shape
+
+
+    @property
+    def sensor_shape(self) -> Optional[tuple[int, int]]:
+        """
+        (height, width) of the full sensor; known once streaming
+        """
+        return self._sensor_shape
+
+
+    @property
+    def window(self) -> Optional[tuple[int, int, int, int]]:
+        """
+        (offset_x, offset_y, width, height) of the sensor area in the streamed frames
+        """
+        return self._window
+
+
+    def set_window(self, window:Optional[tuple[int, int, int, int]]) -> None:
+        """
+        read out only (offset_x, offset_y, width, height) of the sensor, None for full frames.
+        Takes effect on the next start_stream; the window is grown to the increments the camera supports.
+        """
+        self._requested_window = window
+    
+
     def connect(self):
         if self._camera is None:
             try:
@@ -79,13 +138,20 @@ class FlirCameraController:
     
 
     @property
-    def serial_number(self) -> str:
-        self.NodeDeviceSerialNumber = PySpin.CStringPtr(self.NodeMapTlDevice.GetNode('DeviceSerialNumber'))
-        if PySpin.IsAvailable(self.NodeDeviceSerialNumber) and PySpin.IsReadable(self.NodeDeviceSerialNumber):
-            self.DeviceSerialNumber = self.NodeDeviceSerialNumber.GetValue()
-            logging.info(f"Device serial number retrieved as {self.DeviceSerialNumber}")
-            return 
-            
+    def serial_number(self) -> Optional[str]:
+        if self._camera is None:
+            return None
+        try:
+            self.NodeDeviceSerialNumber = PySpin.CStringPtr(self.NodeMapTlDevice.GetNode('DeviceSerialNumber'))
+            if PySpin.IsAvailable(self.NodeDeviceSerialNumber) and PySpin.IsReadable(self.NodeDeviceSerialNumber):
+                self.DeviceSerialNumber = self.NodeDeviceSerialNumber.GetValue()
+                logging.info(f"Device serial number retrieved as {self.DeviceSerialNumber}")
+                return self.DeviceSerialNumber
+            logging.error("Device serial number is not readable")
+        except PySpin.SpinnakerException as e:
+            logging.error(f"Failed to read serial number: {e}")
+        return None
+
 
     @property
     def library_version(self) -> str:
@@ -103,67 +169,12 @@ class FlirCameraController:
         pass
 
 
-    @property
-    def emissivity(self) -> Optional[float]:
-        if self._camera is None:
-            return None
-        try:
-            return self._emissivity
-        except PySpin.SpinnakerException as e:
-            logging.error(f"Failed to read emissivity: {e}")
-            return None
-
-
     def set_calibration_parameters(self) -> None:
         # Retrieve Calibration details
         try:
-            self.NodeCalibrationQueryR = PySpin.CFloatPtr(self.Nodemap.GetNode('R'))
-            self._R = self.NodeCalibrationQueryR.GetValue()
-
-            self.NodeCalibrationQueryB = PySpin.CFloatPtr(self.Nodemap.GetNode('B'))
-            self._B = self.NodeCalibrationQueryB.GetValue()
-
-            self.NodeCalibrationQueryF = PySpin.CFloatPtr(self.Nodemap.GetNode('F'))
-            self._F = self.NodeCalibrationQueryF.GetValue()
-
-            self.NodeCalibrationQueryX = PySpin.CFloatPtr(self.Nodemap.GetNode('X'))
-            self._X = self.NodeCalibrationQueryX.GetValue()
-
-            self.NodeCalibrationQueryA1 = PySpin.CFloatPtr(self.Nodemap.GetNode('alpha1'))
-            self._A1 = self.NodeCalibrationQueryA1.GetValue()
-
-            self.NodeCalibrationQueryA2 = PySpin.CFloatPtr(self.Nodemap.GetNode('alpha2'))
-            self._A2 = self.NodeCalibrationQueryA2.GetValue()
-
-            self.NodeCalibrationQueryB1 = PySpin.CFloatPtr(self.Nodemap.GetNode('beta1'))
-            self._B1 = self.NodeCalibrationQueryB1.GetValue()
-
-            self.NodeCalibrationQueryB2 = PySpin.CFloatPtr(self.Nodemap.GetNode('beta2'))
-            self._B2 = self.NodeCalibrationQueryB2.GetValue()
-
-            self.NodeCalibrationQueryJ1 = PySpin.CFloatPtr(self.Nodemap.GetNode('J1'))
-            self._J1 = self.NodeCalibrationQueryJ1.GetValue()
-
-            self.NodeCalibrationQueryJ0 = PySpin.CIntegerPtr(self.Nodemap.GetNode('J0'))
-            self._J0 = self.NodeCalibrationQueryJ0.GetValue()
-
-            self._emissivity = 0.97
-            self._TRefl = 293.15
-            self._TAtm = 293.15
-            self._TAtmC = self._TAtm - 273.15
-            self._Humidity = 0.55
-            self._Dist = 2
-            self._ExtOpticsTransmission = 1
-            self._ExtOpticsTemp = self._TAtm
-            self._H2O = self._Humidity * np.exp(1.5587 + 0.06939 * self._TAtmC - 0.00027816 * self._TAtmC * self._TAtmC + 0.00000068455 * self._TAtmC * self._TAtmC * self._TAtmC)
-            self._Tau = self._X * np.exp(-np.sqrt(self._Dist) * (self._A1 + self._B1 * np.sqrt(self._H2O))) + (1 - self._X) * np.exp(-np.sqrt(self._Dist) * (self._A2 + self._B2 * np.sqrt(self._H2O)))
-            # Pseudo radiance of the reflected environment
-            self._r1 = ((1 - self._emissivity) / self._emissivity) * (self._R / (np.exp(self._B / self._TRefl) - self._F))
-            # Pseudo radiance of the atmosphere
-            self._r2 = ((1 - self._Tau) / (self._emissivity * self._Tau)) * (self._R / (np.exp(self._B / self._TAtm) - self._F))
-            # Pseudo radiance of the external optics
-            self._r3 = ((1 - self._ExtOpticsTransmission) / (self._emissivity * self._Tau * self._ExtOpticsTransmission)) * (self._R / (np.exp(self._B / self._ExtOpticsTemp) - self._F))
-            self._K2 = self._r1 + self._r2 + self._r3
+            constants = {name: PySpin.CFloatPtr(self.Nodemap.GetNode(name)).GetValue() for name in CALIBRATION_NODES}
+            constants["J0"] = PySpin.CIntegerPtr(self.Nodemap.GetNode('J0')).GetValue()
+            self._load_calibration(constants)
             logging.info("Parameters of camera successfully retrieved")
         except (PySpin.SpinnakerException, Exception) as e:
             logging.error(f"Failed to read parameters: {e}")
@@ -204,28 +215,149 @@ class FlirCameraController:
                 self._streaming = False
         
 
-    def get_image(self) -> Optional[np.ndarray]:
-        if self._streaming:
+    def get_image(self, out:Optional[np.ndarray]=None, raw_out:Optional[np.ndarray]=None,
+                  convert:bool=True) -> Optional[np.ndarray]:
+        """
+        Blocks until the next frame arrives (at most 1 s) and returns it in °C (float32).
+        If out (float32, image_shape) is given the frame is converted into it in place and
+        out is returned, so the caller owns the only copy and nothing is allocated.
+        If raw_out (uint16, image_shape) is given the raw Mono16 counts are copied into it.
+        With convert=False only raw_out is filled and returned; the caller converts what it
+        needs through temperature_lut.
+        Frame ID and timestamps of the returned frame are available from last_frame_info.
+        Returns None for incomplete frames or when not streaming.
+        """
+        if not self._streaming:
+            return None
+        try:
+            wait_start = time.perf_counter()
+            image_result = self._camera.GetNextImage(1000)
+            received = time.monotonic()
+            self.metrics.record("wait", time.perf_counter() - wait_start)
             try:
-                self.ImageResult = self._camera.GetNextImage(1000)
-                if self.ImageResult.IsIncomplete():
-                    print('Image incomplete with image status %d ...' %
-                            self.ImageResult.GetImageStatus())
-                else:
-                    self.ImageData = self.ImageResult.GetNDArray()
-
-                    if self._ir_type == IRFormatType.LINEAR_10MK:
-                        self.ImageTempCelsiusHigh = (self.ImageData * 0.01) - 273.15
-                    elif self._ir_type == IRFormatType.LINEAR_100MK:
-                        self.ImageTempCelsiusLow = (self.ImageData * 0.1) - 273.15
-                    elif self._ir_type == IRFormatType.RADIOMETRIC:
-                        self.ImageRadiance = (self.ImageData - self._J0) / self._J1
-                        self.ImageTemp = (self._B / np.log(self._R / ((self.ImageRadiance / self._emissivity / self._Tau) - self._K2) + self._F)) - 273.15
-                self.ImageResult.Release()
-                return self.ImageTemp
-            except PySpin.SpinnakerException as e:
-                logging.error(f"Failed to get image: {e}")
-                return None
+                if image_result.IsIncomplete():
+                    self.metrics.count("incomplete")
+                    self._incomplete += 1
+                    logging.warning(f"Image incomplete with image status {image_result.GetImageStatus()}")
+                    return None
+                self._update_frame_info(image_result, received) # complete frames only feed the clock fit
+                # GetNDArray is a view of the driver buffer: convert before releasing it
+                with self.metrics.timed("convert" if convert else "copy"):
+                    counts = image_result.GetNDArray()
+                    if raw_out is not None:
+                        np.copyto(raw_out, counts)
+                    if not convert:
+                        return raw_out
+                    return convert_counts(self._temperature_lut, counts, out=out)
+            finally:
+                image_result.Release()
+        except PySpin.SpinnakerException as e:
+            logging.error(f"Failed to get image: {e}")
+            return None
+
+
+    def _update_frame_info(self, image_result, received:float) -> None:
+        """
+        read frame ID and camera timestamp from chunk data, count gaps in the frame IDs
+        and feed the camera -> host clock model
+        """
+        if not self._chunk_enabled:
+            self._last_frame_info = FrameInfo(-1, -1, received + (time.time() - time.monotonic()))
+            self._incomplete = 0
+            return
+        chunk_data = image_result.GetChunkData()
+        self._register_frame(chunk_data.GetFrameID(), chunk_data.GetTimestamp(), received)
+
+
+    def enable_chunk_data(self) -> bool:
+        """
+        attach frame ID and camera timestamp to every frame (see ChunkData.py in Spinnaker examples)
+        """
+        self._chunk_enabled = False
+        try:
+            self.NodeChunkModeActive = PySpin.CBooleanPtr(self.Nodemap.GetNode('ChunkModeActive'))
+            if not PySpin.IsAvailable(self.NodeChunkModeActive) or not PySpin.IsWritable(self.NodeChunkModeActive):
+                logging.warning("Chunk mode not available, frames are timestamped on reception")
+                return False
+            self.NodeChunkModeActive.SetValue(True)
+            self.NodeChunkSelector = PySpin.CEnumerationPtr(self.Nodemap.GetNode('ChunkSelector'))
+            for entry_name in CHUNK_ENTRIES:
+                entry = PySpin.CEnumEntryPtr(self.NodeChunkSelector.GetEntryByName(entry_name))
+                if not PySpin.IsAvailable(entry) or not PySpin.IsReadable(entry):
+                    logging.warning(f"Chunk entry {entry_name} not available, frames are timestamped on reception")
+                    return False
+                self.NodeChunkSelector.SetIntValue(entry.GetValue())
+                chunk_enable = PySpin.CBooleanPtr(self.Nodemap.GetNode('ChunkEnable'))
+                if not chunk_enable.GetValue():
+                    if not PySpin.IsWritable(chunk_enable):
+                        logging.warning(f"Chunk entry {entry_name} not writable, frames are timestamped on reception")
+                        return False
+                    chunk_enable.SetValue(True)
+            self._chunk_enabled = True
+            logging.info("Chunk data (frame ID, timestamp) enabled")
+            return True
+        except PySpin.SpinnakerException as e:
+            logging.error(f"Failed to enable chunk data: {e}")
+            return False
+
+
+    def apply_window(self) -> None:
+        """
+        program OffsetX/OffsetY/Width/Height for the requested window (full sensor if None)
+        and read back the frame geometry
+        """
+        self.NodeWidth = PySpin.CIntegerPtr(self.Nodemap.GetNode('Width'))
+        self.NodeHeight = PySpin.CIntegerPtr(self.Nodemap.GetNode('Height'))
+        self.NodeOffsetX = PySpin.CIntegerPtr(self.Nodemap.GetNode('OffsetX'))
+        self.NodeOffsetY = PySpin.CIntegerPtr(self.Nodemap.GetNode('OffsetY'))
+        windowing = all(PySpin.IsAvailable(node) and PySpin.IsWritable(node)
+                        for node in (self.NodeWidth, self.NodeHeight, self.NodeOffsetX, self.NodeOffsetY))
+        try:
+            if windowing:
+                # offsets first, so Width/Height may span the whole sensor
+                self.NodeOffsetX.SetValue(0)
+                self.NodeOffsetY.SetValue(0)
+                self._sensor_shape = (self.NodeHeight.GetMax(), self.NodeWidth.GetMax())
+                window = self._requested_window or (0, 0, self._sensor_shape[1], self._sensor_shape[0])
+                offset_x, offset_y, width, height = snap_window(
+                    window, self._sensor_shape,
+                    size_increment=(self.NodeWidth.GetInc(), self.NodeHeight.GetInc()),
+                    offset_increment=(self.NodeOffsetX.GetInc(), self.NodeOffsetY.GetInc()),
+                    min_size=(self.NodeWidth.GetMin(), self.NodeHeight.GetMin()),
+                )
+                self.NodeWidth.SetValue(width)
+                self.NodeHeight.SetValue(height)
+                self.NodeOffsetX.SetValue(offset_x)
+                self.NodeOffsetY.SetValue(offset_y)
+            else:
+                self._sensor_shape = (self.NodeHeight.GetValue(), self.NodeWidth.GetValue())
+                if self._requested_window is not None:
+                    logging.warning("Camera does not support windowing, streaming full frames")
+        except PySpin.SpinnakerException as e:
+            logging.error(f"Failed to set acquisition window: {e}")
+        offset_x = self.NodeOffsetX.GetValue() if PySpin.IsReadable(self.NodeOffsetX) else 0
+        offset_y = self.NodeOffsetY.GetValue() if PySpin.IsReadable(self.NodeOffsetY) else 0
+        self._image_shape = (self.NodeHeight.GetValue(), self.NodeWidth.GetValue())
+        self._window = (offset_x, offset_y, self._image_shape[1], self._image_shape[0])
+        logging.info(f"Acquisition window (x, y, w, h): {self._window} of sensor {self._sensor_shape[1]}x{self._sensor_shape[0]}")
+
+
+    def maximize_frame_rate(self) -> None:
+        """
+        run at the highest frame rate the current window allows, where the camera exposes AcquisitionFrameRate
+        """
+        try:
+            node_enable = PySpin.CBooleanPtr(self.Nodemap.GetNode('AcquisitionFrameRateEnable'))
+            if PySpin.IsAvailable(node_enable) and PySpin.IsWritable(node_enable):
+                node_enable.SetValue(True)
+            self.NodeFrameRate = PySpin.CFloatPtr(self.Nodemap.GetNode('AcquisitionFrameRate'))
+            if not PySpin.IsAvailable(self.NodeFrameRate) or not PySpin.IsReadable(self.NodeFrameRate):
+                return
+            if PySpin.IsWritable(self.NodeFrameRate):
+                self.NodeFrameRate.SetValue(self.NodeFrameRate.GetMax())
+            logging.info(f"Acquisition frame rate: {self.NodeFrameRate.GetValue():.1f} Hz")
+        except PySpin.SpinnakerException as e:
+            logging.error(f"Failed to set frame rate: {e}")
 
 
     def setup_camera(self):
@@ -251,15 +383,25 @@ class FlirCameraController:
             self.NodeTempLow = self.NodeTempLinearLow.GetValue()
             self.NodeIRFormat.SetIntValue(self.NodeTempLow)
 
+        self.enable_chunk_data()
+        self.clock.reset()
+        self._last_frame_info = None
+        self._incomplete = 0
+        self.metrics.reset()
+
+        self.apply_window()
+        self.maximize_frame_rate()
+
         if not PySpin.IsAvailable(self.NodeBufferHandlingMode) or not PySpin.IsWritable(self.NodeBufferHandlingMode):
             print('Unable to set stream buffer handling mode.. Aborting...')
             return False
 
-        self.NodeNewestOnly = self.NodeBufferHandlingMode.GetEntryByName(
-            'NewestOnly')
-        if not PySpin.IsAvailable(self.NodeNewestOnly) or not PySpin.IsReadable(self.NodeNewestOnly):
+        # OldestFirst hands over every frame in order, so a free-running acquisition thread loses none
+        self.NodeOldestFirst = self.NodeBufferHandlingMode.GetEntryByName(
+            'OldestFirst')
+        if not PySpin.IsAvailable(self.NodeOldestFirst) or not PySpin.IsReadable(self.NodeOldestFirst):
             print('Unable to set stream buffer handling mode.. Aborting...')
             return False
 
-        self.NodeNewestOnlyMode = self.NodeNewestOnly.GetValue()
-        self.NodeBufferHandlingMode.SetIntValue(self.NodeNewestOnlyMode)
\ No newline at end of file
+        self.NodeOldestFirstMode = self.NodeOldestFirst.GetValue()
+        self.NodeBufferHandlingMode.SetIntValue(self.NodeOldestFirstMode)
@@ -0,0 +1,208 @@
+import win32com.client
+import pythoncom
+from pywintypes import com_error
+from concurrent.futures import Future
+import numpy as np
+import queue
+import threading
+import time
+import logging
+from typing import Callable, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CHANNEL = 0 # single channel device
+
+
+class _ComProxy:
+    """
+    attribute calls on the COM object, run on the session worker and waited for
+    """
+
+    def __init__(self, session:"OphirComSession"):
+        self._session = session
+
+
+    def __getattr__(self, name:str):
+        def method(*args):
+            return self._session.call(lambda com: getattr(com, name)(*args))
+        return method
+
+
+class OphirComSession:
+    """
+    The one OphirLMMeasurement COM object of the application and every device handle opened through it.
+    All power meters share it, so opening or closing one meter never stops the streams of another.
+    The COM object lives in its own apartment on a worker thread, created on first use;
+    every call is queued to that thread:
+        submit(function, *args) -> Future, function(com, *args) runs on the worker (never blocks the caller)
+        call(function, *args)   -> result, waits for it (runs directly when already on the worker)
+        com.Method(*args)       -> call() of a single COM method
+    A queued function runs to completion before the next one starts, so a sequence of COM calls
+    submitted as one function (e.g. stop stream, set range, start stream) is never interleaved with polling.
+    """
+
+    def __init__(self) -> None:
+        self._ophir_com = None # only touched on the worker thread
+        self._handles = {} # serial number -> device handle
+        self._handles_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.com = _ComProxy(self)
+
+
+    def _ensure_worker(self) -> None:
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="OphirComWorker", daemon=True)
+                self._worker.start()
+
+
+    def _run(self) -> None:
+        pythoncom.CoInitialize()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                function, args, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(function(self._com_object(), *args))
+                except BaseException as e:
+                    future.set_exception(e)
+            if self._ophir_com is not None:
+                try:
+                    self._ophir_com.StopAllStreams()
+                    self._ophir_com.CloseAll()
+                except com_error as e:
+                    logging.error(f"Failed to close Ophir devices: {e}")
+                self._ophir_com = None
+        finally:
+            pythoncom.CoUninitialize()
+
+
+    def _com_object(self):
+        if self._ophir_com is None:
+            self._ophir_com = win32com.client.Dispatch("OphirLMMeasurement.CoLMMeasurement")
+            # streams left open by a previous run would block OpenUSBDevice
+            self._ophir_com.StopAllStreams()
+            self._ophir_com.CloseAll()
+        return self._ophir_com
+
+
+    def submit(self, function:Callable, *args) -> Future:
+        future = Future()
+        if threading.current_thread() is self._worker: # already on the worker: run now, queueing would deadlock
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(function(self._com_object(), *args))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        self._ensure_worker()
+        self._queue.put((function, args, future))
+        return future
+
+
+    def call(self, function:Callable, *args):
+        return self.submit(function, *args).result()
+
+
+    def shutdown(self) -> None:
+        """
+        close every device and end the worker (a later call starts a new one)
+        """
+        with self._worker_lock:
+            worker = self._worker
+        if worker is None or not worker.is_alive():
+            return
+        self._queue.put(None)
+        worker.join()
+        with self._handles_lock:
+            self._handles = {}
+
+
+    @property
+    def open_devices(self) -> dict[str, int]:
+        with self._handles_lock:
+            return dict(self._handles)
+
+
+    def scan_usb(self) -> tuple[str]:
+        try:
+            return self.com.ScanUSB()
+        except com_error as e:
+            logging.error(f"Failed to scan USB devices: {e}")
+            return ()
+
+
+    def open(self, serial_number:str) -> Optional[int]:
+        """
+        device handle of serial_number, opened on first request
+        """
+        with self._handles_lock:
+            if serial_number in self._handles:
+                return self._handles[serial_number]
+        try:
+            handle = self.com.OpenUSBDevice(serial_number)
+        except com_error as e:
+            logging.error(f"Failed to open {serial_number}: {e}")
+            return None
+        with self._handles_lock:
+            self._handles[serial_number] = handle
+        return handle
+
+
+    def close(self, serial_number:str) -> None:
+        """
+        stop the stream of serial_number and close its handle only
+        """
+        with self._handles_lock:
+            handle = self._handles.pop(serial_number, None)
+        if handle is None:
+            return
+        def stop_and_close(com):
+            com.StopStream(handle, CHANNEL)
+            com.Close(handle)
+        try:
+            self.call(stop_and_close)
+        except com_error as e:
+            logging.error(f"Failed to close {serial_number}: {e}")
+
+
+    def read_all(self, serial_numbers:list[str]) -> dict[str, tuple[np.ndarray, np.ndarray, np.ndarray, float]]:
+        """
+        every sample buffered since the last call of each device, as arrays (value [W], device timestamp [ms], status)
+        and the host time.monotonic() right after GetData returned (pairs with the newest sample for clock sync);
+        one round trip to the worker for all devices
+        """
+        handles = self.open_devices
+        def get_data(com):
+            batches = {}
+            for serial_number in serial_numbers:
+                handle = handles.get(serial_number)
+                if handle is None:
+                    continue
+                try:
+                    batches[serial_number] = (*com.GetData(handle, CHANNEL), time.monotonic())
+                except (ValueError, TypeError, com_error) as e:
+                    logging.error(f"Failed to get data reading of {serial_number}: {e}")
+            return batches
+        return {
+            serial_number: (np.asarray(values, dtype=np.float64),
+                            np.asarray(timestamps, dtype=np.float64),
+                            np.asarray(statuses, dtype=np.int32),
+                            received)
+            for serial_number, (values, timestamps, statuses, received) in self.call(get_data).items()
+        }
+
+
+    def get_data_arrays(self, serial_number:str) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        every sample of serial_number buffered since the last call as arrays (value [W], device timestamp [ms], status)
+        """
+        data = self.read_all([serial_number]).get(serial_number)
+        return None if data is None else data[:3]
@@ -1,28 +1,49 @@
-import win32com.client
 from pywintypes import com_error
+from devices.ophir_com_session import OphirComSession, CHANNEL
+from concurrent.futures import Future
+import numpy as np
 import logging
 from typing import Optional
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-CHANNEL = 0 # single channel device
-
 
 class OphirJunoController:
-
-    def __init__(self) -> None:
-        self._ophir_com = win32com.client.Dispatch("OphirLMMeasurement.CoLMMeasurement")
-        self._ophir_com.StopAllStreams()
-        self._ophir_com.CloseAll()
+    """
+    One Juno on a COM session that may be shared with other meters (a private one if not given).
+    Every COM call runs on the session worker thread; the blocking methods and properties wait for it,
+    the *_async / set_* methods return a Future so the GUI thread never waits on the device.
+    """
+
+    def __init__(self, session:Optional[OphirComSession]=None) -> None:
+        self._session = session if session is not None else OphirComSession()
         self._connected = False
         self._serial_number = None
         self._device_handler = None
         self._last_power = 0.0
     
 
+    @property
+    def _ophir_com(self):
+        """
+        proxy whose method calls run on the session worker
+        """
+        return self._session.com
+
+
+    @property
+    def session(self) -> OphirComSession:
+        return self._session
+
+
     @property
     def connected(self) -> bool:
         return self._connected
+
+
+    @property
+    def serial_number(self) -> Optional[str]:
+        return self._serial_number
     
 
     @property
@@ -37,17 +58,16 @@ class OphirJunoController:
         Raises:
             Logs an error and returns an empty list if a COM error occurs during scanning.
         """    
-        try:
-            return self._ophir_com.ScanUSB()
-        except com_error as e:
-            logging.error(f"Failed to scan USB devices: {e}")
-            return []
+        return self._session.scan_usb()
 
 
     def connect(self, serial_number:str):
         try:
-            self._device_handler = self._ophir_com.OpenUSBDevice(serial_number)
+            self._device_handler = self._session.open(serial_number)
+            if self._device_handler is None:
+                return
             self._ophir_com.StartStream(self._device_handler, CHANNEL)
+            self._serial_number = serial_number
             self._connected = True
             logging.info("Juno connected and started streaming")
         except (IndexError, com_error) as e:
@@ -55,14 +75,41 @@ class OphirJunoController:
     
 
     def disconnect(self):
-            try:
-                self._ophir_com.StopAllStreams()
-                self._ophir_com.CloseAll()
-                self._connected = False
-                logging.info(f"Juno disconnected")
-            except (AttributeError, com_error) as e:
-                logging.error(f"Failed to disconnect Juno or Juno not existing")
-                # no log if already disconnected
+        """
+        close this meter only; other meters on the session keep streaming
+        """
+        if not self._connected:
+            return
+        self._session.close(self._serial_number)
+        self._connected = False
+        self._device_handler = None
+        logging.info(f"Juno {self._serial_number} disconnected")
+
+
+    def connect_async(self, serial_number:str) -> Future:
+        """
+        connect on the session worker; resolves to describe() once streaming, None if connecting failed
+        """
+        def connect_and_describe(com):
+            self.connect(serial_number)
+            return self.describe() if self._connected else None
+        return self._session.submit(connect_and_describe)
+
+
+    def disconnect_async(self) -> Future:
+        return self._session.submit(lambda com: self.disconnect())
+
+
+    def describe(self) -> dict:
+        """
+        device and sensor info with the available ranges and wavelengths, as shown on connecting
+        """
+        description = {"device_info": self.device_info, "sensor_info": None, "ranges": [], "wavelengths": []}
+        if self.is_sensor_exist:
+            description["sensor_info"] = self.sensor_info
+            description["ranges"] = self.available_ranges
+            description["wavelengths"] = self.available_wavelengths
+        return description
 
 
     def __del__(self):
@@ -88,13 +135,20 @@ class OphirJunoController:
         Returns the latest power reading from the device.
         Returns an empty list if not connected or if data is unavailable.
         """
-        try:
-            value_array, timestamp_array, status_array = self._ophir_com.GetData(self._device_handler, CHANNEL)
-            data = [{"value": v, "timestamp": t, "status": s} for v, t, s in zip(value_array, timestamp_array, status_array)]
-            return data
-        except (ValueError, TypeError, AttributeError, com_error) as e:
-            logging.error(f"Failed to get data reading: {e}")
+        data = self.get_data_arrays()
+        if data is None:
             return []
+        return [{"value": v, "timestamp": t, "status": s} for v, t, s in zip(*(array.tolist() for array in data))]
+
+
+    def get_data_arrays(self) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Returns every sample buffered since the last call as arrays (value [W], device timestamp [ms], status).
+        Returns None if not connected or if data is unavailable.
+        """
+        if not self._connected:
+            return None
+        return self._session.get_data_arrays(self._serial_number)
 
     
     @property
@@ -189,6 +243,17 @@ class OphirJunoController:
 
     @wavelength.setter
     def wavelength(self, new_index:int):
+        self.set_wavelength(new_index).result()
+
+
+    def set_wavelength(self, new_index:int) -> Future:
+        """
+        stop stream, set wavelength and restart as one job on the session worker; returns at once
+        """
+        return self._session.submit(lambda com: self._apply_wavelength(new_index))
+
+
+    def _apply_wavelength(self, new_index:int):
         try:
             self.stop_stream()
             self._ophir_com.SetWavelength(self._device_handler, CHANNEL, new_index)
@@ -237,6 +302,17 @@ class OphirJunoController:
 
     @range.setter
     def range(self, new_range_index: int):
+        self.set_range(new_range_index).result()
+
+
+    def set_range(self, new_range_index:int) -> Future:
+        """
+        stop stream, set range and restart as one job on the session worker; returns at once
+        """
+        return self._session.submit(lambda com: self._apply_range(new_range_index))
+
+
+    def _apply_range(self, new_range_index:int):
         try:
             self.stop_stream()
             self._ophir_com.SetRange(self._device_handler, CHANNEL, new_range_index)
@@ -0,0 +1,259 @@
+import numpy as np
+import logging
+import time
+from typing import Optional
+from processing.thermal_conversion import MONO16_LEVELS, convert_counts, radiometric_counts
+from processing.sensor_window import snap_window
+from devices.camera_frame_info import FrameInfo, CAMERA_TIMESTAMP_UNIT
+from devices.thermal_camera_base import ThermalCameraBase
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# typical calibration constants of a FLIR A-series camera, used to turn the synthetic scene into counts
+SIMULATED_CALIBRATION = {
+    "J0": 4000,
+    "J1": 60.0,
+    "R": 16556.0,
+    "B": 1428.0,
+    "F": 1.0,
+    "X": 1.9,
+    "alpha1": 0.006569,
+    "alpha2": 0.01262,
+    "beta1": -0.002276,
+    "beta2": -0.00667,
+}
+NOISE_POOL_FRAMES = 16 # precomputed noise frames, picked at random for every frame
+STREAM_BUFFER_FRAMES = 10 # frames the "driver" queues before the oldest are lost
+SPOT_EXTENT = 3.0 # spot is rendered out to this many radii from its center
+WINDOW_INCREMENT = (16, 4) # x, y step of window offsets and sizes, like the Width/Height nodes of a real camera
+
+
+class SimulatedFlirCameraController(ThermalCameraBase):
+    """
+    Stand-in for FlirCameraController that needs neither PySpin nor a camera, for headless
+    development and benchmarking of the thermal pipeline.
+    Radiometric Mono16 frames are synthesized from a scene at background temperature [°C]
+    with a gaussian hot (amplitude > 0) or cold (amplitude < 0) spot of the given radius [px]
+    circling the image center once per spot_period [s], plus white temperature noise [K rms].
+    Frames are paced at frame_rate [Hz] on a simulated camera clock (0 delivers frames as fast
+    as they are requested). A consumer that falls behind by more than STREAM_BUFFER_FRAMES loses
+    frames, which shows up as gaps in the frame IDs exactly like chunk data of the real camera.
+    A fraction incomplete_probability of the frames is reported incomplete.
+    set_window() reads out part of the sensor, and only that part is synthesized.
+    Calibration and object parameters come from ThermalCameraBase, as for the real camera.
+    """
+
+    def __init__(self, width:int=640, height:int=480, frame_rate:float=30.0, noise:float=0.05,
+                 background:float=22.0, spot_amplitude:float=-5.0, spot_radius:float=15.0,
+                 spot_period:float=10.0, incomplete_probability:float=0.0, clock_drift_ppm:float=20.0,
+                 seed:Optional[int]=None) -> None:
+        super().__init__()
+        self._width = width
+        self._height = height
+        self.frame_rate = frame_rate
+        self.noise = noise
+        self.background = background
+        self.spot_amplitude = spot_amplitude
+        self.spot_radius = spot_radius
+        self.spot_period = spot_period
+        self.incomplete_probability = incomplete_probability
+        self._clock_drift_ppm = clock_drift_ppm
+        self._rng = np.random.default_rng(seed)
+        self._connected = False
+        self._streaming = False
+        self._image_shape = None
+        self._requested_window = None
+
+
+    @property
+    def camera_connected(self) -> bool:
+        return self._connected
+
+
+    @property
+    def streaming(self) -> bool:
+        return self._streaming
+
+
+    @property
+    def last_frame_info(self) -> Optional[FrameInfo]:
+        return self._last_frame_info
+
+
+    @property
+    def dropped_frames(self) -> int:
+        return self.metrics.counter("dropped")
+
+
+    @property
+    def incomplete_frames(self) -> int:
+        return self.metrics.counter("incomplete")
+
+
+    @property
+    def image_shape(self) -> Optional[tuple[int, int]]:
+        return self._image_shape
+
+
+    @property
+    def sensor_shape(self) -> tuple[int, int]:
+        return (self._height, self._width)
+
+
+    @property
+    def window(self) -> Optional[tuple[int, int, int, int]]:
+        return self._window
+
+
+    def set_window(self, window:Optional[tuple[int, int, int, int]]) -> None:
+        self._requested_window = window
+
+
+    def connect(self):
+        if self._connected:
+            return
+        self._connected = True
+        self._load_calibration(SIMULATED_CALIBRATION)
+        logging.info("Simulated FLIR camera connected")
+
+
+    def disconnect(self):
+        if not self._connected:
+            return
+        self.stop_stream()
+        self._connected = False
+        logging.info("Simulated FLIR camera disconnected")
+
+
+    @property
+    def serial_number(self) -> str:
+        return "SIMULATED"
+
+
+    @property
+    def library_version(self) -> str:
+        return "simulated"
+
+
+    def _counts(self, temperature) -> np.ndarray:
+        """
+        counts (float64) the camera reads for an object at temperature [°C]; the scene is rendered
+        with the calibration fixed at start_stream, so changing emissivity changes the reading
+        """
+        return radiometric_counts(temperature, *self._scene_calibration)
+
+
+    def setup_camera(self):
+        window = self._requested_window or (0, 0, self._width, self._height)
+        self._window = snap_window(window, self.sensor_shape, WINDOW_INCREMENT, WINDOW_INCREMENT, WINDOW_INCREMENT)
+        self._image_shape = (self._window[3], self._window[2])
+        self._scene_calibration = (self._J0, self._J1, self._R, self._B, self._F, self._Tau, self._K2, self._emissivity)
+        self._scene_counts = self._counts(np.full(self._image_shape, self.background))
+        self._background_counts = np.rint(self._scene_counts).astype(np.int32)
+        # noise is drawn once in temperature and scaled to counts with the local slope of the Planck curve
+        gain = self._counts(self.background + 0.5) - self._counts(self.background - 0.5)
+        self._noise_pool = np.rint(
+            self._rng.normal(0.0, self.noise * gain, size=(NOISE_POOL_FRAMES, *self._image_shape))
+        ).astype(np.int32)
+        self._work = np.empty(self._image_shape, dtype=np.int32)
+        self._frame = np.empty(self._image_shape, dtype=np.uint16)
+        extent = int(np.ceil(SPOT_EXTENT * self.spot_radius))
+        offsets = np.arange(-extent, extent + 1, dtype=np.float64)
+        self._spot_offsets = offsets
+        self._spot_r2 = offsets[:, None] ** 2 + offsets[None, :] ** 2
+        self._frame_id = 0
+        self.clock.reset()
+        self._last_frame_info = None
+        self._incomplete = 0
+        self.metrics.reset()
+
+
+    def start_stream(self):
+        if not self._connected:
+            return
+        self.setup_camera()
+        self._stream_start = time.monotonic()
+        self._streaming = True
+        logging.info("Simulated camera started streaming")
+
+
+    def stop_stream(self):
+        self._streaming = False
+
+
+    def _render(self, elapsed:float) -> np.ndarray:
+        """
+        synthesize the Mono16 frame exposed elapsed [s] after the stream started
+        """
+        work = self._work
+        np.add(self._background_counts, self._noise_pool[self._rng.integers(NOISE_POOL_FRAMES)], out=work)
+        if self.spot_amplitude != 0 and self.spot_radius > 0:
+            height, width = self._image_shape
+            offset_x, offset_y = self._window[:2]
+            phase = 2 * np.pi * elapsed / self.spot_period if self.spot_period > 0 else 0.0
+            # the spot circles the sensor center; frame coordinates are relative to the window
+            center_x = int(round(self._width / 2 + self._width / 4 * np.cos(phase))) - offset_x
+            center_y = int(round(self._height / 2 + self._height / 4 * np.sin(phase))) - offset_y
+            extent = len(self._spot_offsets) // 2
+            # clip the spot patch to the image
+            x_start, x_end = max(center_x - extent, 0), min(center_x + extent + 1, width)
+            y_start, y_end = max(center_y - extent, 0), min(center_y + extent + 1, height)
+            if x_end > x_start and y_end > y_start:
+                r2 = self._spot_r2[y_start - center_y + extent:y_end - center_y + extent,
+                                   x_start - center_x + extent:x_end - center_x + extent]
+                spot = self.background + self.spot_amplitude * np.exp(-0.5 * r2 / (self.spot_radius * self.spot_radius))
+                delta = self._counts(spot) - self._scene_counts[y_start:y_end, x_start:x_end]
+                work[y_start:y_end, x_start:x_end] += np.rint(delta).astype(np.int32)
+        np.clip(work, 0, MONO16_LEVELS - 1, out=work)
+        np.copyto(self._frame, work, casting="unsafe")
+        return self._frame
+
+
+    def _wait_for_frame(self) -> float:
+        """
+        block until the next frame is due and return its exposure time (monotonic);
+        frames the consumer is too late for are skipped like an overflowing stream buffer
+        """
+        if self.frame_rate <= 0:
+            self._frame_id += 1
+            return time.monotonic()
+        period = 1.0 / self.frame_rate
+        now = time.monotonic()
+        due = self._stream_start + (self._frame_id + 1) * period
+        if due > now:
+            time.sleep(due - now)
+        else:
+            behind = int((now - due) / period)
+            if behind > STREAM_BUFFER_FRAMES:
+                self._frame_id += behind - STREAM_BUFFER_FRAMES
+                due = self._stream_start + (self._frame_id + 1) * period
+        self._frame_id += 1
+        return due
+
+
+    def get_image(self, out:Optional[np.ndarray]=None, raw_out:Optional[np.ndarray]=None,
+                  convert:bool=True) -> Optional[np.ndarray]:
+        """
+        same contract as FlirCameraController.get_image
+        """
+        if not self._streaming:
+            return None
+        wait_start = time.perf_counter()
+        exposure = self._wait_for_frame()
+        received = time.monotonic()
+        self.metrics.record("wait", time.perf_counter() - wait_start)
+        if self.incomplete_probability > 0 and self._rng.random() < self.incomplete_probability:
+            self.metrics.count("incomplete")
+            self._incomplete += 1
+            logging.warning(f"Simulated incomplete image (frame {self._frame_id})")
+            return None
+        camera_timestamp = int((exposure - self._stream_start) * (1 + self._clock_drift_ppm * 1e-6) / CAMERA_TIMESTAMP_UNIT)
+        self._register_frame(self._frame_id, camera_timestamp, received)
+        with self.metrics.timed("synthesize"):
+            counts = self._render(exposure - self._stream_start)
+        with self.metrics.timed("convert" if convert else "copy"):
+            if raw_out is not None:
+                np.copyto(raw_out, counts)
+            if not convert:
+                return raw_out
+            return convert_counts(self._temperature_lut, counts, out=out)
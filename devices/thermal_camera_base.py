@@ -0,0 +1,198 @@
+import numpy as np
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional
+from processing.thermal_conversion import (
+    IRFormatType, temperature_lut, atmospheric_transmission, background_pseudo_radiance
+)
+from processing.clock_sync import ClockSync
+from processing.pipeline_metrics import PipelineMetrics
+from devices.camera_frame_info import FrameInfo, CAMERA_TIMESTAMP_UNIT
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_EMISSIVITY = 0.97
+DEFAULT_TEMPERATURE = 293.15 # K, reflected and atmospheric temperature until set
+DEFAULT_HUMIDITY = 0.55
+DEFAULT_DISTANCE = 2 # m
+
+
+class ThermalCameraBase(ABC):
+    """
+    Radiometric calibration shared by FlirCameraController and SimulatedFlirCameraController:
+    calibration constants, object parameters (emissivity, atmosphere, external optics), the
+    counts -> °C lookup table built from them, the sensor window bookkeeping and the frame
+    bookkeeping (dropped frame count, camera -> host clock fit, last_frame_info).
+    Subclasses connect, stream and acquire; they pass the constants read from the camera to
+    _load_calibration(), every complete frame to _register_frame() and provide camera_connected,
+    sensor_shape and _window.
+    """
+
+    def __init__(self) -> None:
+        self._ir_type = IRFormatType.RADIOMETRIC
+        self._temperature_lut = None # counts -> °C (float32), rebuilt whenever calibration parameters change
+        self._window = None # window actually read out while streaming
+        # camera clock -> host clock; reception can only lag the exposure, so the fit follows the earliest receptions
+        self.clock = ClockSync(CAMERA_TIMESTAMP_UNIT, lower_envelope=True)
+        self._last_frame_info = None
+        self._incomplete = 0 # incomplete frames since the last complete one, not counted as dropped
+        self.metrics = PipelineMetrics() # stage timings and frame counters, shared with the acquisition thread and display
+
+
+    @property
+    @abstractmethod
+    def camera_connected(self) -> bool:
+        """
+        True while a camera is connected
+        """
+
+
+    @property
+    @abstractmethod
+    def sensor_shape(self) -> Optional[tuple[int, int]]:
+        """
+        (height, width) of the full sensor
+        """
+
+
+    @property
+    def full_sensor(self) -> bool:
+        """
+        True if the streamed frames cover the whole sensor
+        """
+        if self._window is None or self.sensor_shape is None:
+            return self._window is None
+        height, width = self.sensor_shape
+        return tuple(self._window) == (0, 0, width, height)
+
+
+    def _register_frame(self, frame_id:int, camera_timestamp:int, received:float) -> None:
+        """
+        count gaps in the frame IDs, feed the camera -> host clock model with the reception time
+        (time.monotonic()) of a complete frame and publish its FrameInfo
+        """
+        previous = self._last_frame_info
+        if previous is not None and previous.frame_id >= 0 and frame_id > previous.frame_id + 1 + self._incomplete:
+            self.metrics.count("dropped", frame_id - previous.frame_id - 1 - self._incomplete)
+        self._incomplete = 0
+        self.clock.add(camera_timestamp, received)
+        self._last_frame_info = FrameInfo(frame_id, camera_timestamp, float(self.clock.to_wall(camera_timestamp)))
+
+
+    @property
+    def emissivity(self) -> Optional[float]:
+        if not self.camera_connected:
+            return None
+        return self._emissivity
+
+
+    @emissivity.setter
+    def emissivity(self, new_emissivity:float):
+        if not 0 < new_emissivity <= 1:
+            logging.error(f"Invalid emissivity: {new_emissivity}")
+            return
+        self._emissivity = new_emissivity
+        self.update_object_parameters()
+        logging.info(f"Emissivity set to {new_emissivity}")
+
+
+    def _load_calibration(self, constants:dict) -> None:
+        """
+        take the camera calibration constants (J0, J1, R, B, F, X, alpha1, alpha2, beta1, beta2),
+        reset the object parameters to their defaults and rebuild the lookup table
+        """
+        self._J0 = constants["J0"]
+        self._J1 = constants["J1"]
+        self._R = constants["R"]
+        self._B = constants["B"]
+        self._F = constants["F"]
+        self._X = constants["X"]
+        self._A1 = constants["alpha1"]
+        self._A2 = constants["alpha2"]
+        self._B1 = constants["beta1"]
+        self._B2 = constants["beta2"]
+        self._emissivity = DEFAULT_EMISSIVITY
+        self._TRefl = DEFAULT_TEMPERATURE
+        self._TAtm = DEFAULT_TEMPERATURE
+        self._Humidity = DEFAULT_HUMIDITY
+        self._Dist = DEFAULT_DISTANCE
+        self._ExtOpticsTransmission = 1
+        self._ExtOpticsTemp = self._TAtm
+        self.update_object_parameters()
+
+
+    def set_atmospheric_parameters(self, reflected_temperature:Optional[float]=None,
+                                   atmospheric_temperature:Optional[float]=None,
+                                   humidity:Optional[float]=None, distance:Optional[float]=None,
+                                   ext_optics_transmission:Optional[float]=None,
+                                   ext_optics_temperature:Optional[float]=None) -> None:
+        """
+        temperatures in K, humidity as fraction (0-1), distance in m.
+        Parameters left as None keep their current value.
+        """
+        if reflected_temperature is not None:
+            self._TRefl = reflected_temperature
+        if atmospheric_temperature is not None:
+            self._TAtm = atmospheric_temperature
+        if humidity is not None:
+            self._Humidity = humidity
+        if distance is not None:
+            self._Dist = distance
+        if ext_optics_transmission is not None:
+            self._ExtOpticsTransmission = ext_optics_transmission
+        if ext_optics_temperature is not None:
+            self._ExtOpticsTemp = ext_optics_temperature
+        self.update_object_parameters()
+
+
+    def update_object_parameters(self) -> None:
+        """
+        recompute atmospheric transmission and pseudo radiances from object parameters,
+        then rebuild counts -> temperature lookup table
+        """
+        self._Tau = atmospheric_transmission(self._X, self._A1, self._A2, self._B1, self._B2,
+                                             self._Humidity, self._TAtm, self._Dist)
+        self._K2 = background_pseudo_radiance(self._R, self._B, self._F, self._emissivity, self._Tau,
+                                              self._TRefl, self._TAtm, self._ExtOpticsTransmission, self._ExtOpticsTemp)
+        self.build_temperature_lut()
+
+
+    def build_temperature_lut(self) -> None:
+        self._temperature_lut = temperature_lut(self._ir_type, self.calibration_parameters)
+
+
+    @property
+    def temperature_lut(self) -> Optional[np.ndarray]:
+        """
+        counts -> °C table (float32) used by get_image, for callers converting raw counts themselves
+        """
+        return self._temperature_lut
+
+
+    @property
+    def calibration_parameters(self) -> dict:
+        """
+        calibration constants and object parameters needed to turn raw counts into °C
+        """
+        return {
+            "ir_type": self._ir_type,
+            "J0": int(self._J0),
+            "J1": float(self._J1),
+            "R": float(self._R),
+            "B": float(self._B),
+            "F": float(self._F),
+            "X": float(self._X),
+            "alpha1": float(self._A1),
+            "alpha2": float(self._A2),
+            "beta1": float(self._B1),
+            "beta2": float(self._B2),
+            "emissivity": float(self._emissivity),
+            "TRefl": float(self._TRefl),
+            "TAtm": float(self._TAtm),
+            "Humidity": float(self._Humidity),
+            "Dist": float(self._Dist),
+            "ExtOpticsTransmission": float(self._ExtOpticsTransmission),
+            "ExtOpticsTemp": float(self._ExtOpticsTemp),
+            "Tau": float(self._Tau),
+            "K2": float(self._K2),
+        }
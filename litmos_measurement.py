@@ -1,24 +1,41 @@
 from data_interface import IData, IMetaData
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
 from typing import Optional
+from processing.power_samples import pair_samples
+import numpy as np
+import time
 
 
 
 @dataclass
 class LITMoSMeasurementData(IData):
     timestamp: str
+    frame_timestamp: Optional[str] = None # exposure time of the thermal frame behind the temperatures
     sample_temperature: Optional[float] = None
     reference_temperature: Optional[float] = None
+    sample_x: Optional[int] = None # sample ROI center [px], follows the sample while tracking
+    sample_y: Optional[int] = None
+    line_profile: Optional[str] = None # space-separated °C, one sample per px along the line
+    line_profile_geometry: Optional[str] = None # x0 y0 x1 y1 [px]
+    radial_profile: Optional[str] = None # space-separated °C, one ring per px from the center
+    radial_profile_geometry: Optional[str] = None # x y radius [px]
     reference_power: Optional[float] = None
     transmitted_power: Optional[float] = None
-    peak_wavelength: Optional[float] = None
-    mean_wavelength: Optional[float] = None
+    transmission: Optional[float] = None # mean transmitted / reference power, transmitted interpolated onto reference times
+    paired_samples: Optional[int] = None # sample pairs behind transmission
+    spectrum_timestamp: Optional[str] = None # time the spectrum behind the wavelengths was read
+    peak_wavelength: Optional[float] = None # sub-pixel peak
+    mean_wavelength: Optional[float] = None # centroid of the peak region above the centroid threshold
+    spectral_fwhm: Optional[float] = None
     rotator_angle: Optional[float] = None
+    band_channels: dict = field(default_factory=dict) # band_<name>_integral / _centroid / _peak of every spectral band
 
 
     def to_dict(self) -> dict:
-        return asdict(self)
+        data = asdict(self)
+        data.update(data.pop("band_channels"))
+        return data
 
 
 @dataclass
@@ -29,6 +46,41 @@ class LITMoSMetaData(IMetaData):
     
 
 
+def format_profile(profile) -> tuple[Optional[str], Optional[str]]:
+    """
+    (values, geometry) of a ThermalProfile as space-separated strings for one CSV cell each
+    """
+    if profile is None:
+        return None, None
+    values = " ".join(f"{v:.3f}" for v in profile.values)
+    geometry = " ".join(f"{g:.1f}" for g in profile.geometry)
+    return values, geometry
+
+
+def band_channels(results:dict) -> dict[str, float]:
+    """
+    one logged channel per spectral band and quantity
+    """
+    channels = {}
+    for name, result in results.items():
+        channels[f"band_{name}_integral"] = result.integral
+        channels[f"band_{name}_centroid"] = result.centroid
+        channels[f"band_{name}_peak"] = result.peak
+    return channels
+
+
+def paired_transmission(reference_samples, transmitted_samples, since:float) -> tuple[Optional[float], int]:
+    """
+    mean ratio transmitted / reference after since [time.time()], the transmitted power interpolated
+    onto the host-aligned reference timestamps, and the number of pairs
+    """
+    reference, transmitted = pair_samples(*reference_samples.since(since), *transmitted_samples.since(since))
+    valid = reference > 0
+    if not np.any(valid):
+        return None, 0
+    return float(np.mean(transmitted[valid] / reference[valid])), int(np.count_nonzero(valid))
+
+
 class LITMoSMeasurementCollector:
     def __init__(self, flir_cam_widget, power_meter_widget1, power_meter_widget2, spectrometer_widget, rotator_widget):
         self.flir_cam_widget = flir_cam_widget
@@ -36,17 +88,39 @@ class LITMoSMeasurementCollector:
         self.power_meter_widget2 = power_meter_widget2
         self.spectrometer_widget = spectrometer_widget
         self.rotator_widget = rotator_widget
+        self._last_collected = time.time() # power samples after this are paired on the next collect
 
 
     def collect_data(self) -> LITMoSMeasurementData:
+        frame_time = self.flir_cam_widget.temperature_timestamp
+        sample_position = self.flir_cam_widget.sample_position or (None, None)
+        line_profile, line_profile_geometry = format_profile(self.flir_cam_widget.line_profile)
+        radial_profile, radial_profile_geometry = format_profile(self.flir_cam_widget.radial_profile)
+        collected = time.time()
+        transmission, paired_samples = paired_transmission(self.power_meter_widget1.samples, self.power_meter_widget2.samples,
+                                                           self._last_collected)
+        self._last_collected = collected
+        features = self.spectrometer_widget.features
         return LITMoSMeasurementData(
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            frame_timestamp = None if frame_time is None else datetime.fromtimestamp(frame_time).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
             sample_temperature = self.flir_cam_widget.sample_temperature,
             reference_temperature = self.flir_cam_widget.reference_temperature,
+            sample_x = sample_position[0],
+            sample_y = sample_position[1],
+            line_profile = line_profile,
+            line_profile_geometry = line_profile_geometry,
+            radial_profile = radial_profile,
+            radial_profile_geometry = radial_profile_geometry,
             reference_power = self.power_meter_widget1.power,
             transmitted_power = self.power_meter_widget2.power,
-            peak_wavelength = self.spectrometer_widget.peak_wavelength,
-            mean_wavelength = self.spectrometer_widget.mean_wavelength,
-            rotator_angle = self.rotator_widget.angle
+            transmission = transmission,
+            paired_samples = paired_samples,
+            spectrum_timestamp = None if features is None else datetime.fromtimestamp(features.timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            peak_wavelength = None if features is None else features.peak_wavelength,
+            mean_wavelength = None if features is None else features.centroid_wavelength,
+            spectral_fwhm = None if features is None else features.fwhm,
+            rotator_angle = self.rotator_widget.angle,
+            band_channels = band_channels(self.spectrometer_widget.band_results)
         )
 
@@ -1,7 +1,8 @@
 from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QTabWidget
 from PyQt6.QtCore import QLocale
 from widgets.ipg_fiber_laser_widget import LaserControlWidget
-from widgets.ophir_powermeter_widget import OphirPowerMeterWidget
+from widgets.ophir_powermeter_widget import OphirPowerMeterWidget, OphirSessionPollingThread
+from devices.ophir_com_session import OphirComSession
 from widgets.ocean_spectrometer_widget import OceanSpectrometerWidget
 from widgets.elliptec_rotator_widget import ElliptecRotatorWidget
 from widgets.flir_camera_widget import FlirCameraWidget
@@ -24,8 +25,11 @@ def main():
 
     laser_widget = LaserControlWidget(polling_interval=polling_interval)
     flir_cam_widget = FlirCameraWidget(polling_interval=polling_interval)
-    power_meter_widget1 = OphirPowerMeterWidget(polling_interval=polling_interval)
-    power_meter_widget2 = OphirPowerMeterWidget(polling_interval=polling_interval)
+    # both meters share one COM session and one polling thread
+    ophir_session = OphirComSession()
+    ophir_polling_thread = OphirSessionPollingThread(ophir_session, interval=polling_interval)
+    power_meter_widget1 = OphirPowerMeterWidget(polling_thread=ophir_polling_thread)
+    power_meter_widget2 = OphirPowerMeterWidget(polling_thread=ophir_polling_thread)
     spectrometer_widget = OceanSpectrometerWidget(polling_interval=polling_interval)
     rotator_widget = ElliptecRotatorWidget(polling_interval=polling_interval)
 
@@ -47,6 +51,10 @@ def main():
     win.show()
 
     app.exec()
+    power_meter_widget1.spectrum_thread.stop()
+    power_meter_widget2.spectrum_thread.stop()
+    ophir_polling_thread.stop()
+    ophir_session.shutdown() # closes the meters in the apartment that opened them
 
 
 if __name__ == "__main__":
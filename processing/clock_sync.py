@@ -0,0 +1,149 @@
+import numpy as np
+import threading
+import time
+
+ENVELOPE_REFIT_INTERVAL = 32 # pairs between lower envelope refits once the window holds that many
+
+class ClockSync:
+    """
+    Online mapping of a device clock onto the host clock.
+    Pairs of (device time, host time.monotonic() at reception) are kept in a sliding window and
+    host = offset + rate * device is refit by least squares on every update, so both the offset
+    and the drift of the device oscillator are tracked. Host times can be converted to wall clock
+    (time.time()) through the monotonic -> wall offset captured at construction.
+    device_unit is the duration of one device tick in seconds (1e-9 for ns timestamps).
+    A device time that runs backwards (device reset, counter wrap) restarts the fit.
+    With lower_envelope the line is fit under all pairs instead of through them (the edge of their lower
+    convex hull at the window center): for devices whose reception delay is one-sided and large compared to
+    its spread, e.g. batches read every polling period whose newest sample is of random age,
+    this tracks the earliest receptions rather than the mean delay. The hull is rebuilt only every
+    ENVELOPE_REFIT_INTERVAL pairs; in between, times are mapped with the last rate and offset.
+    """
+
+    def __init__(self, device_unit:float=1.0, window:int=256, lower_envelope:bool=False):
+        self._device_unit = device_unit
+        self._window = window
+        self._lower_envelope = lower_envelope
+        self._device = np.zeros(window, dtype=np.float64)
+        self._host = np.zeros(window, dtype=np.float64)
+        self._wall_offset = time.time() - time.monotonic()
+        self._lock = threading.Lock()
+        self.reset()
+
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset()
+
+
+    def _reset(self) -> None:
+        self._count = 0
+        self._index = 0
+        self._added = 0 # pairs since the last reset
+        self._device_ref = None # first device time, fit runs on differences to stay precise
+        self._host_ref = None
+        self._last_device = None
+        self._offset = 0.0 # host seconds after host_ref at device_ref
+        self._rate = 1.0 # host seconds per device second
+        self._residual = np.nan
+
+
+    @property
+    def synchronized(self) -> bool:
+        return self._count >= 2
+
+
+    @property
+    def rate(self) -> float:
+        """
+        host seconds per device second; (rate - 1) * 1e6 is the device drift in ppm
+        """
+        return self._rate
+
+
+    @property
+    def drift_ppm(self) -> float:
+        return (self._rate - 1.0) * 1e6
+
+
+    @property
+    def residual(self) -> float:
+        """
+        rms deviation [s] of the reception times from the fitted line (reception jitter)
+        """
+        return self._residual
+
+
+    def add(self, device_time:float, host_time:float=None) -> None:
+        """
+        add one (device time, host time.monotonic()) pair and refit
+        """
+        if host_time is None:
+            host_time = time.monotonic()
+        with self._lock:
+            if self._last_device is not None and device_time < self._last_device:
+                self._reset()
+            if self._device_ref is None:
+                self._device_ref = device_time
+                self._host_ref = host_time
+            self._last_device = device_time
+            self._device[self._index] = (device_time - self._device_ref) * self._device_unit
+            self._host[self._index] = host_time - self._host_ref
+            self._index = (self._index + 1) % self._window
+            self._count = min(self._count + 1, self._window)
+            self._added += 1
+            if not self._lower_envelope or self._added <= ENVELOPE_REFIT_INTERVAL or self._added % ENVELOPE_REFIT_INTERVAL == 0:
+                self._fit()
+
+
+    def _fit(self) -> None:
+        x = self._device[:self._count] if self._count < self._window else self._device
+        y = self._host[:self._count] if self._count < self._window else self._host
+        x_mean = x.mean()
+        y_mean = y.mean()
+        dx = x - x_mean
+        sxx = float(np.dot(dx, dx))
+        if sxx > 0:
+            self._rate = float(np.dot(dx, y - y_mean)) / sxx
+        self._offset = y_mean - self._rate * x_mean
+        if self._lower_envelope:
+            self._fit_lower_envelope(x, y, x_mean)
+        residual = y - (self._offset + self._rate * x)
+        self._residual = float(np.sqrt(np.mean(residual * residual)))
+
+
+    def _fit_lower_envelope(self, x:np.ndarray, y:np.ndarray, x_mean:float) -> None:
+        order = np.argsort(x, kind="stable")
+        hull = [] # lower convex hull, monotone chain
+        for i in order:
+            while len(hull) >= 2:
+                o, a = hull[-2], hull[-1]
+                if (x[a] - x[o]) * (y[i] - y[o]) - (y[a] - y[o]) * (x[i] - x[o]) > 0:
+                    break
+                hull.pop()
+            hull.append(i)
+        if len(hull) < 2:
+            self._offset = float(y[hull[0]] - self._rate * x[hull[0]])
+            return
+        edge = min(max(int(np.searchsorted(x[hull], x_mean)), 1), len(hull) - 1)
+        left, right = hull[edge - 1], hull[edge]
+        if x[right] > x[left]:
+            self._rate = float((y[right] - y[left]) / (x[right] - x[left]))
+        self._offset = float(y[left] - self._rate * x[left])
+
+
+    def to_host(self, device_time):
+        """
+        host time.monotonic() of device_time (scalar or array)
+        """
+        if self._device_ref is None:
+            return np.nan
+        x = (np.asarray(device_time, dtype=np.float64) - self._device_ref) * self._device_unit
+        return self._host_ref + self._offset + self._rate * x
+
+
+    def to_wall(self, device_time):
+        """
+        host time.time() of device_time (scalar or array)
+        """
+        return self.to_host(device_time) + self._wall_offset
@@ -0,0 +1,118 @@
+import numpy as np
+import threading
+import yaml
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+ENCODING = "utf-8"
+
+
+class CoolingRateMap:
+    """
+    Per-pixel least-squares slope of temperature against time (dT/dt [K/s]) since the last reset.
+    Only the sums the regression needs are kept:
+        n, S_t, S_tt  : scalars, shared by all pixels (every frame covers every pixel)
+        S_T, S_tT     : per pixel, float64
+    so an update is two whole-frame passes and the slope can be read at any time:
+        dT/dt = (n S_tT - S_t S_T) / (n S_tt - S_t^2)
+    Time is counted from the first frame to keep the sums well conditioned.
+    A pixel that was non-finite in any frame stays NaN until the next reset.
+    update() runs in the acquisition thread, rate() in the GUI thread; both take a lock.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._shape = None
+
+
+    @property
+    def frame_count(self) -> int:
+        return self._n if self._shape is not None else 0
+
+
+    @property
+    def time_span(self) -> Optional[tuple[float, float]]:
+        """
+        timestamps of the first and the last frame in the fit
+        """
+        if self._shape is None:
+            return None
+        return self._t0, self._t_last
+
+
+    def reset(self) -> None:
+        with self._lock:
+            self._shape = None
+
+
+    def _allocate(self, shape:tuple, timestamp:float) -> None:
+        self._shape = shape
+        self._t0 = timestamp
+        self._t_last = timestamp
+        self._n = 0
+        self._s_t = 0.0
+        self._s_tt = 0.0
+        self._s_T = np.zeros(shape, dtype=np.float64)
+        self._s_tT = np.zeros(shape, dtype=np.float64)
+        self._scratch = np.empty(shape, dtype=np.float64) # update, acquisition thread
+        self._rate_scratch = np.empty(shape, dtype=np.float64) # rate, GUI thread
+        self._rate_scratch2 = np.empty(shape, dtype=np.float64)
+
+
+    def update(self, frame:np.ndarray, timestamp:float) -> None:
+        """
+        add frame [°C] taken at timestamp [s]; a change of frame shape restarts the fit
+        """
+        with self._lock:
+            if self._shape != frame.shape:
+                self._allocate(frame.shape, timestamp)
+            t = timestamp - self._t0
+            self._n += 1
+            self._s_t += t
+            self._s_tt += t * t
+            self._t_last = timestamp
+            np.add(self._s_T, frame, out=self._s_T)
+            np.multiply(frame, t, out=self._scratch, dtype=np.float64)
+            np.add(self._s_tT, self._scratch, out=self._s_tT)
+
+
+    def rate(self, out:Optional[np.ndarray]=None) -> Optional[np.ndarray]:
+        """
+        dT/dt [K/s] per pixel (float32, written into out if given), None until two distinct times were added
+        """
+        with self._lock:
+            if self._shape is None or self._n < 2:
+                return None
+            denominator = self._n * self._s_tt - self._s_t * self._s_t
+            if denominator <= 0:
+                return None
+            if out is None:
+                out = np.empty(self._shape, dtype=np.float32)
+            np.multiply(self._s_tT, self._n / denominator, out=self._rate_scratch)
+            np.multiply(self._s_T, self._s_t / denominator, out=self._rate_scratch2)
+            np.subtract(self._rate_scratch, self._rate_scratch2, out=out, casting="same_kind")
+            return out
+
+
+    def export(self, path, window:Optional[tuple]=None) -> bool:
+        """
+        write the map to path (CSV, one row per image row, K/s) and its metadata to a .yml next to it
+        """
+        rate = self.rate()
+        if rate is None:
+            return False
+        path = Path(path)
+        np.savetxt(path, rate, delimiter=",", fmt="%.6g", encoding=ENCODING)
+        start, end = self.time_span
+        meta_data = {
+            "unit": "K/s",
+            "frames": int(self._n),
+            "start": datetime.fromtimestamp(start).isoformat(),
+            "end": datetime.fromtimestamp(end).isoformat(),
+            "window": None if window is None else [int(v) for v in window],
+        }
+        with open(path.with_suffix(".yml"), "w", encoding=ENCODING) as f_yml:
+            yaml.dump(meta_data, f_yml, allow_unicode=True)
+        return True
@@ -0,0 +1,201 @@
+import numpy as np
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class Frame:
+    seq: int # sequence number, counts every frame committed since the buffer was created
+    timestamp: float # host time (time.time()) when the frame was acquired
+    data: np.ndarray # read-only view into the ring slot
+    slot: int # index of the ring slot holding data
+
+
+class FrameRingBuffer:
+    """
+    Fixed-size ring of preallocated frame buffers shared between one producer
+    (acquisition thread) and any number of consumers (display, logging, ...).
+    Frames are never copied on the way through: the producer converts straight into a slot,
+    consumers get read-only views of it.
+
+    Ownership protocol:
+        producer:  buf = begin_write(shape)  -> slot is owned by the producer and hidden from readers
+                   ...fill buf in place...
+                   commit(timestamp)         -> slot is published with the next sequence number
+                   (a slot that is not committed is handed out again by the next begin_write)
+        consumer:  frame = acquire_latest()  -> slot is pinned, producer skips it when wrapping
+                   ...use frame.data...
+                   release(frame)            -> pin dropped
+                   (or "with read_latest() as frame:")
+    Unpinned views (get, frames_since) stay valid only until the producer wraps around;
+    check is_valid() after using them.
+    """
+
+    def __init__(self, capacity:int=64):
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        self._capacity = capacity
+        self._frames = None
+        self._seqs = np.full(capacity, -1, dtype=np.int64)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._pins = np.zeros(capacity, dtype=np.int64)
+        self._next_seq = 0
+        self._write_slot = -1 # slot owned by the producer, -1 if none
+        self._last_slot = -1 # slot of the newest committed frame
+        self._latest_seq = -1
+        self._lock = threading.Lock()
+
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+
+    @property
+    def latest_seq(self) -> int:
+        """
+        sequence number of the newest frame, -1 if nothing has been committed yet
+        """
+        return self._latest_seq
+
+
+    def begin_write(self, shape:tuple, dtype=np.float32) -> np.ndarray:
+        """
+        claim the next free slot and return it as writable buffer;
+        storage is (re)allocated only when shape or dtype change
+        """
+        with self._lock:
+            if self._frames is None or self._frames.shape[1:] != tuple(shape) or self._frames.dtype != dtype:
+                # views held by consumers keep the previous storage alive
+                self._frames = np.empty((self._capacity, *shape), dtype=dtype)
+                self._seqs[:] = -1
+                self._pins[:] = 0
+                self._write_slot = -1
+            if self._write_slot < 0:
+                self._write_slot = self._next_free_slot()
+            self._seqs[self._write_slot] = -1 # hide from readers while being overwritten
+            return self._frames[self._write_slot]
+
+
+    def _next_free_slot(self) -> int:
+        for offset in range(1, self._capacity + 1):
+            slot = (self._last_slot + offset) % self._capacity
+            if self._pins[slot] == 0:
+                return slot
+        raise RuntimeError("all frame buffer slots are pinned by consumers")
+
+
+    def commit(self, timestamp:float) -> int:
+        """
+        publish the slot returned by begin_write and return its sequence number
+        """
+        with self._lock:
+            if self._write_slot < 0:
+                raise RuntimeError("commit() without begin_write()")
+            seq = self._next_seq
+            self._seqs[self._write_slot] = seq
+            self._timestamps[self._write_slot] = timestamp
+            self._last_slot = self._write_slot
+            self._latest_seq = seq
+            self._write_slot = -1
+            self._next_seq += 1
+        return seq
+
+
+    def skip(self) -> int:
+        """
+        take the next sequence number for a frame that is not published (e.g. not converted),
+        so sequence numbers keep counting camera frames; readers see a gap
+        """
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        return seq
+
+
+    def write(self, frame:np.ndarray, timestamp:float) -> int:
+        """
+        copy frame into the next slot and return its sequence number
+        """
+        np.copyto(self.begin_write(frame.shape, frame.dtype), frame)
+        return self.commit(timestamp)
+
+
+    def _find(self, seq:int) -> int:
+        if seq < 0:
+            return -1
+        slots = np.flatnonzero(self._seqs == seq)
+        return int(slots[0]) if slots.size else -1
+
+
+    def _frame(self, slot:int) -> Frame:
+        view = self._frames[slot].view()
+        view.flags.writeable = False
+        return Frame(int(self._seqs[slot]), float(self._timestamps[slot]), view, slot)
+
+
+    def get(self, seq:int) -> Optional[Frame]:
+        """
+        unpinned view of frame with given sequence number, None if overwritten or not yet written
+        """
+        with self._lock:
+            slot = self._find(seq)
+            return None if slot < 0 else self._frame(slot)
+
+
+    def latest(self) -> Optional[Frame]:
+        return self.get(self.latest_seq)
+
+
+    def acquire(self, seq:int) -> Optional[Frame]:
+        """
+        pin frame with given sequence number; must be paired with release()
+        """
+        with self._lock:
+            slot = self._find(seq)
+            if slot < 0:
+                return None
+            self._pins[slot] += 1
+            return self._frame(slot)
+
+
+    def acquire_latest(self) -> Optional[Frame]:
+        return self.acquire(self.latest_seq)
+
+
+    def release(self, frame:Optional[Frame]) -> None:
+        if frame is None:
+            return
+        with self._lock:
+            if self._seqs[frame.slot] == frame.seq and self._pins[frame.slot] > 0:
+                self._pins[frame.slot] -= 1
+
+
+    @contextmanager
+    def read_latest(self):
+        frame = self.acquire_latest()
+        try:
+            yield frame
+        finally:
+            self.release(frame)
+
+
+    def frames_since(self, seq:int) -> list[Frame]:
+        """
+        unpinned views of all frames still in the buffer with sequence number greater than seq,
+        oldest first; consumers reading slower than the producer lose overwritten frames
+        """
+        with self._lock:
+            slots = np.flatnonzero(self._seqs > seq)
+            slots = slots[np.argsort(self._seqs[slots])]
+            return [self._frame(slot) for slot in slots]
+
+
+    def is_valid(self, frame:Frame) -> bool:
+        """
+        True if the slot behind frame has not been overwritten since it was read
+        """
+        with self._lock:
+            return self._seqs[frame.slot] == frame.seq
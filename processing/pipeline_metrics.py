@@ -0,0 +1,197 @@
+import csv
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+ENCODING = "utf-8"
+HISTOGRAM_MIN = 1e-6 # sec, lower edge of the first histogram bin
+HISTOGRAM_DECADES = 7 # 1 us .. 10 s
+BINS_PER_DECADE = 10 # adjacent bin edges differ by 26 %
+PERCENTILES = (50, 95, 99)
+CSV_FIELDS = ["name", "kind", "count", "mean_ms", "min_ms"] + [f"p{p}_ms" for p in PERCENTILES] + ["max_ms"]
+
+
+class LatencyHistogram:
+    """
+    Log-spaced histogram of durations [s] with exact count, sum, min and max.
+    Recording is a log10 and a list increment, cheap enough to run on every frame;
+    percentiles are read from the bins (geometric bin center, within a bin width of the truth).
+    """
+
+    def __init__(self):
+        self.reset()
+
+
+    def reset(self) -> None:
+        self._bins = [0] * (HISTOGRAM_DECADES * BINS_PER_DECADE)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+
+    def record(self, seconds:float) -> None:
+        if seconds > HISTOGRAM_MIN:
+            index = min(int(math.log10(seconds / HISTOGRAM_MIN) * BINS_PER_DECADE), len(self._bins) - 1)
+        else:
+            index = 0
+        self._bins[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+
+    @property
+    def bins(self) -> list[int]:
+        return list(self._bins)
+
+
+    @staticmethod
+    def bin_edges() -> list[float]:
+        return [HISTOGRAM_MIN * 10 ** (i / BINS_PER_DECADE) for i in range(HISTOGRAM_DECADES * BINS_PER_DECADE + 1)]
+
+
+    def percentile(self, p:float) -> float:
+        if self.count == 0:
+            return math.nan
+        target = p / 100 * self.count
+        cumulative = 0
+        for i, n in enumerate(self._bins):
+            cumulative += n
+            if cumulative >= target and n > 0:
+                center = HISTOGRAM_MIN * 10 ** ((i + 0.5) / BINS_PER_DECADE)
+                return min(max(center, self.min), self.max)
+        return self.max
+
+
+class PipelineMetrics:
+    """
+    Stage timings and event counters of the camera pipeline.
+    Each stage is recorded by one thread only (acquisition or GUI); readers take a snapshot,
+    so recording needs no lock. Stages and counters are created on first use.
+        with metrics.timed("convert"):
+            ...
+        metrics.record("display_latency", seconds)
+        metrics.count("incomplete")
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock() # only guards creation of new entries and reset
+        self._since = time.time()
+
+
+    @property
+    def since(self) -> float:
+        """
+        time.time() of the last reset
+        """
+        return self._since
+
+
+    def _histogram(self, stage:str) -> LatencyHistogram:
+        histogram = self._stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._stages.setdefault(stage, LatencyHistogram())
+        return histogram
+
+
+    def record(self, stage:str, seconds:float) -> None:
+        self._histogram(stage).record(seconds)
+
+
+    @contextmanager
+    def timed(self, stage:str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._histogram(stage).record(time.perf_counter() - start)
+
+
+    def count(self, counter:str, n:int=1) -> None:
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + n
+
+
+    def counter(self, counter:str) -> int:
+        return self._counters.get(counter, 0)
+
+
+    def stage(self, stage:str) -> LatencyHistogram:
+        return self._histogram(stage)
+
+
+    def reset(self) -> None:
+        with self._lock:
+            for histogram in self._stages.values():
+                histogram.reset()
+            self._counters = {}
+            self._since = time.time()
+
+
+    def summary(self) -> list[dict]:
+        """
+        one row per stage (durations in ms) and per counter, see CSV_FIELDS
+        """
+        with self._lock:
+            stages = list(self._stages.items())
+            counters = list(self._counters.items())
+        rows = []
+        for name, histogram in stages:
+            row = {
+                "name": name,
+                "kind": "stage",
+                "count": histogram.count,
+                "mean_ms": histogram.mean * 1e3,
+                "min_ms": histogram.min * 1e3 if histogram.count else math.nan,
+            }
+            for p in PERCENTILES:
+                row[f"p{p}_ms"] = histogram.percentile(p) * 1e3
+            row["max_ms"] = histogram.max * 1e3 if histogram.count else math.nan
+            rows.append(row)
+        for name, n in counters:
+            rows.append({"name": name, "kind": "counter", "count": n})
+        return rows
+
+
+    def format_summary(self) -> str:
+        lines = [f"{'stage':<20}{'n':>8}{'mean':>9}{'p50':>9}{'p99':>9}{'max':>9}  [ms]"]
+        counters = []
+        for row in self.summary():
+            if row["kind"] == "stage":
+                lines.append(f"{row['name']:<20}{row['count']:>8}{row['mean_ms']:>9.2f}{row['p50_ms']:>9.2f}"
+                             f"{row['p99_ms']:>9.2f}{row['max_ms']:>9.2f}")
+            else:
+                counters.append(f"{row['name']}: {row['count']}")
+        if counters:
+            lines.append("  ".join(counters))
+        return "\n".join(lines)
+
+
+    def export_csv(self, path) -> None:
+        """
+        write summary() to path; the histogram bins of every stage follow as bin_<upper edge in ms> columns
+        """
+        edges = LatencyHistogram.bin_edges()
+        bin_fields = [f"bin_{edge * 1e3:.4g}" for edge in edges[1:]]
+        with self._lock:
+            bins = {name: histogram.bins for name, histogram in self._stages.items()}
+        with open(path, "w", newline="", encoding=ENCODING) as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS + bin_fields, restval="")
+            writer.writeheader()
+            for row in self.summary():
+                if row["name"] in bins and row["kind"] == "stage":
+                    row.update(zip(bin_fields, bins[row["name"]]))
+                writer.writerow(row)
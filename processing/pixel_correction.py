@@ -0,0 +1,238 @@
+import numpy as np
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CACHE_DIR = Path.home() / ".laser_cooling_app" / "pixel_correction"
+FLAT_FIELD_FRAMES = 64 # frames averaged for one reference
+MIN_GAIN_SPREAD = 2.0 # K, smallest mean difference between the two references for a usable gain
+OUTLIER_THRESHOLD = 8.0 # robust standard deviations (1.4826 MAD) beyond which a pixel is bad
+NEIGHBOR_OFFSETS = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if (dy, dx) != (0, 0)]
+
+
+def _robust_outliers(values:np.ndarray, threshold:float) -> np.ndarray:
+    median = np.nanmedian(values)
+    sigma = 1.4826 * np.nanmedian(np.abs(values - median))
+    if not sigma > 0:
+        return np.zeros(values.shape, dtype=bool)
+    return np.abs(values - median) > threshold * sigma
+
+
+def _local_median(image:np.ndarray) -> np.ndarray:
+    """
+    3x3 median of every pixel (edges replicated); only used while building a correction
+    """
+    padded = np.pad(image, 1, mode="edge")
+    height, width = image.shape
+    shifted = [padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width] for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+    return np.median(np.stack(shifted), axis=0)
+
+
+class FlatFieldCapture:
+    """
+    Accumulates n_frames uncorrected frames of a uniform scene into per-pixel mean and temporal std.
+    add() runs in the acquisition thread; read mean/std once complete.
+    """
+
+    def __init__(self, n_frames:int=FLAT_FIELD_FRAMES, second_reference:bool=False):
+        self.n_frames = n_frames
+        self.second_reference = second_reference # True: the capture provides the gain reference
+        self.count = 0
+        self._sum = None
+
+
+    @property
+    def complete(self) -> bool:
+        return self.count >= self.n_frames
+
+
+    def add(self, frame:np.ndarray) -> None:
+        if self.complete:
+            return
+        if self._sum is None or self._sum.shape != frame.shape:
+            self._sum = np.zeros(frame.shape, dtype=np.float64)
+            self._sum_sq = np.zeros(frame.shape, dtype=np.float64)
+            self._scratch = np.empty(frame.shape, dtype=np.float64)
+            self.count = 0
+        np.add(self._sum, frame, out=self._sum)
+        np.square(frame, out=self._scratch, dtype=np.float64)
+        np.add(self._sum_sq, self._scratch, out=self._sum_sq)
+        self.count += 1
+
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._sum / self.count
+
+
+    @property
+    def std(self) -> np.ndarray:
+        mean = self.mean
+        return np.sqrt(np.maximum(self._sum_sq / self.count - mean * mean, 0.0))
+
+
+class WindowedCorrection:
+    """
+    PixelCorrection cropped to one sensor window, with everything the per-frame path needs precomputed:
+    offset/gain views and, for every bad pixel, the flat indices of its good neighbors in the window.
+    """
+
+    def __init__(self, correction:"PixelCorrection", window:tuple[int, int, int, int]):
+        offset_x, offset_y, width, height = window
+        self.window = window
+        self.shape = (height, width)
+        rows = slice(offset_y, offset_y + height)
+        cols = slice(offset_x, offset_x + width)
+        self.offset = np.ascontiguousarray(correction.offset[rows, cols])
+        self.gain = None if correction.gain is None else np.ascontiguousarray(correction.gain[rows, cols])
+        bad = correction.bad_pixel_mask[rows, cols]
+        bad_y, bad_x = np.nonzero(bad)
+        self.bad_pixels = bad_y * width + bad_x
+        # good 8-neighbors of every bad pixel, padded by repeating the first one so the gather is rectangular
+        neighbors = np.empty((len(bad_y), len(NEIGHBOR_OFFSETS)), dtype=np.intp)
+        for i, (y, x) in enumerate(zip(bad_y, bad_x)):
+            good = [(y + dy) * width + (x + dx) for dy, dx in NEIGHBOR_OFFSETS
+                    if 0 <= y + dy < height and 0 <= x + dx < width and not bad[y + dy, x + dx]]
+            if not good:
+                good = [y * width + x] # no good neighbor: left as it is
+            neighbors[i] = (good * len(NEIGHBOR_OFFSETS))[:len(NEIGHBOR_OFFSETS)]
+        self.neighbors = neighbors
+        self._replacement = np.empty(len(bad_y), dtype=np.float32)
+
+
+    def apply(self, frame:np.ndarray) -> np.ndarray:
+        """
+        correct frame [°C] (float32, window shape) in place: gain/offset pass, then bad pixels
+        replaced by the mean of their good neighbors
+        """
+        if self.gain is not None:
+            np.multiply(frame, self.gain, out=frame)
+        np.add(frame, self.offset, out=frame)
+        if len(self.bad_pixels):
+            flat = frame.reshape(-1)
+            np.mean(flat[self.neighbors], axis=1, out=self._replacement)
+            flat[self.bad_pixels] = self._replacement
+        return frame
+
+
+    def gather(self, indices:np.ndarray) -> tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+        """
+        offset, gain and bad-pixel positions at flat window indices, for correcting gathered ROI pixels
+        """
+        gain = None if self.gain is None else self.gain.reshape(-1)[indices]
+        bad_positions = np.flatnonzero(np.isin(indices, self.bad_pixels))
+        return self.offset.reshape(-1)[indices], gain, bad_positions
+
+
+class PixelCorrection:
+    """
+    Non-uniformity correction of thermal frames in °C, in sensor coordinates:
+        corrected = gain * T + offset, then bad pixels replaced by their good neighbors
+    Built from flat-field references of a uniform scene:
+        one reference  : offset = mean(ref) - ref, no gain (offset-only)
+        two references : gain = (mean(ref2) - mean(ref1)) / (ref2 - ref1), offset = mean(ref1) - gain * ref1
+    Bad pixels are those with an outlying temporal std (noisy or stuck), an outlying deviation
+    from their 3x3 median in the reference (hot/cold), or a non-finite reference.
+    Corrections are cached per camera serial number under CACHE_DIR.
+    """
+
+    def __init__(self, serial_number:str, offset:np.ndarray, gain:Optional[np.ndarray],
+                 bad_pixel_mask:np.ndarray, reference:np.ndarray, created:Optional[str]=None):
+        self.serial_number = serial_number
+        self.offset = offset.astype(np.float32)
+        self.gain = None if gain is None else gain.astype(np.float32)
+        self.bad_pixel_mask = bad_pixel_mask.astype(bool)
+        self.reference = reference.astype(np.float32) # first reference, needed to add a gain reference later
+        self.created = created or datetime.now().isoformat(timespec="seconds")
+        self._windowed = None
+
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.offset.shape
+
+
+    @property
+    def bad_pixel_count(self) -> int:
+        return int(np.count_nonzero(self.bad_pixel_mask))
+
+
+    @classmethod
+    def from_flat_field(cls, serial_number:str, capture:FlatFieldCapture,
+                        threshold:float=OUTLIER_THRESHOLD) -> "PixelCorrection":
+        reference = capture.mean
+        bad = ~np.isfinite(reference)
+        std = capture.std
+        bad |= (std == 0) | _robust_outliers(std, threshold)
+        deviation = reference - _local_median(reference)
+        bad |= _robust_outliers(deviation, threshold)
+        level = np.mean(reference[~bad])
+        offset = np.where(bad, 0.0, level - reference)
+        return cls(serial_number, offset, None, bad, reference)
+
+
+    def with_gain_reference(self, capture:FlatFieldCapture) -> "PixelCorrection":
+        """
+        two-point correction from this one and a second flat field at another temperature;
+        this one is returned unchanged if the references are too close in temperature
+        """
+        reference2 = capture.mean
+        bad = self.bad_pixel_mask | ~np.isfinite(reference2)
+        difference = reference2 - self.reference
+        spread = np.mean(reference2[~bad]) - np.mean(self.reference[~bad])
+        if not abs(spread) >= MIN_GAIN_SPREAD:
+            logging.error(f"Gain reference differs by {spread:.2f} K from the flat field, at least {MIN_GAIN_SPREAD} K needed")
+            return self
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gain = spread / difference
+        bad |= ~np.isfinite(gain) | _robust_outliers(np.where(bad, np.nan, gain), OUTLIER_THRESHOLD)
+        gain = np.where(bad, 1.0, gain)
+        offset = np.where(bad, 0.0, np.mean(self.reference[~bad]) - gain * self.reference)
+        return PixelCorrection(self.serial_number, offset, gain, bad, self.reference)
+
+
+    def for_window(self, window:Optional[tuple[int, int, int, int]]) -> WindowedCorrection:
+        """
+        correction for frames read from window (full sensor if None); the last one is cached
+        """
+        if window is None:
+            window = (0, 0, self.shape[1], self.shape[0])
+        window = tuple(int(v) for v in window)
+        if self._windowed is None or self._windowed.window != window:
+            self._windowed = WindowedCorrection(self, window)
+        return self._windowed
+
+
+    @staticmethod
+    def cache_path(serial_number:str) -> Path:
+        return CACHE_DIR / f"{serial_number}.npz"
+
+
+    def save(self) -> None:
+        path = self.cache_path(self.serial_number)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {"offset": self.offset, "bad_pixel_mask": self.bad_pixel_mask, "reference": self.reference}
+        if self.gain is not None:
+            arrays["gain"] = self.gain
+        np.savez(path, created=np.array(self.created), **arrays)
+        logging.info(f"Pixel correction saved to {path}")
+
+
+    @classmethod
+    def load(cls, serial_number:str) -> Optional["PixelCorrection"]:
+        path = cls.cache_path(serial_number)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                gain = data["gain"] if "gain" in data else None
+                correction = cls(serial_number, data["offset"], gain, data["bad_pixel_mask"],
+                                 data["reference"], str(data["created"]))
+            logging.info(f"Pixel correction for {serial_number} loaded ({correction.bad_pixel_count} bad pixels)")
+            return correction
+        except (OSError, KeyError, ValueError) as e:
+            logging.error(f"Failed to load pixel correction {path}: {e}")
+            return None
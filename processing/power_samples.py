@@ -0,0 +1,147 @@
+import numpy as np
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+SAMPLE_BUFFER_CAPACITY = 1 << 16 # samples kept per meter (hours at a few Hz, a minute at kHz rates)
+STATUS_OK = 0 # Ophir GetData status of a valid reading; other values flag overrange, range change etc.
+DEVICE_TIMESTAMP_UNIT = 1e-3 # Ophir GetData timestamps are in ms
+TIMESTAMP_ALIGNMENT = 1e-3 # s, target accuracy of the host timestamps of different meters
+PAIRING_MAX_GAP = 0.25 # s, largest spacing of the two samples a value is interpolated between
+
+
+@dataclass
+class PowerStatistics:
+    """
+    statistics of the valid samples delivered in one polling interval
+    """
+    mean: float
+    std: float
+    min: float
+    max: float
+    count: int # valid samples
+    flagged: int # samples left out because of their status
+    device_timestamp: float # device timestamp of the last sample [ms]
+    host_timestamp: float # time.time() of the last sample (device clock mapped onto host), reception time before sync
+
+
+def interval_statistics(values:np.ndarray, timestamps:np.ndarray, statuses:np.ndarray,
+                        host_timestamps:Optional[np.ndarray]=None) -> Optional[PowerStatistics]:
+    """
+    statistics of one batch, None if it holds no valid sample
+    """
+    valid = (statuses == STATUS_OK) & np.isfinite(values)
+    count = int(np.count_nonzero(valid))
+    if count == 0:
+        return None
+    valid_values = values if count == values.size else values[valid]
+    return PowerStatistics(
+        mean=float(valid_values.mean()),
+        std=float(valid_values.std()),
+        min=float(valid_values.min()),
+        max=float(valid_values.max()),
+        count=count,
+        flagged=int(values.size - count),
+        device_timestamp=float(timestamps[-1]),
+        host_timestamp=time.time() if host_timestamps is None or not np.isfinite(host_timestamps[-1]) else float(host_timestamps[-1]),
+    )
+
+
+def pair_samples(times_a:np.ndarray, values_a:np.ndarray, times_b:np.ndarray, values_b:np.ndarray,
+                 max_gap:float=PAIRING_MAX_GAP) -> tuple[np.ndarray, np.ndarray]:
+    """
+    the meters free-run, so b is linearly interpolated onto the host timestamps of a (both ascending);
+    samples of a outside b's time span, or between two b samples more than max_gap [s] apart, are dropped.
+    returns (values a, values b at the times of a)
+    """
+    empty = np.empty(0, dtype=np.float64)
+    if len(times_a) == 0 or len(times_b) < 2:
+        return empty, empty
+    right = np.searchsorted(times_b, times_a)
+    inside = (right > 0) & (right < len(times_b))
+    right = np.where(inside, right, 1)
+    paired = inside & (times_b[right] - times_b[right - 1] <= max_gap)
+    paired |= np.isin(times_a, times_b) # exactly on a sample of b
+    return values_a[paired], np.interp(times_a[paired], times_b, values_b)
+
+
+class PowerSampleBuffer:
+    """
+    Ring buffer of power meter samples (value [W], device timestamp [ms], status, host time.time()),
+    filled batch-wise by the polling thread and read from any thread. extend() is one or two slice copies per batch.
+    """
+
+    def __init__(self, capacity:int=SAMPLE_BUFFER_CAPACITY):
+        self.capacity = capacity
+        self._values = np.empty(capacity, dtype=np.float64)
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._statuses = np.empty(capacity, dtype=np.int32)
+        self._host_timestamps = np.empty(capacity, dtype=np.float64)
+        self._lock = threading.Lock()
+        self._total = 0 # samples ever added
+
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+
+    def __len__(self) -> int:
+        return min(self._total, self.capacity)
+
+
+    def clear(self) -> None:
+        with self._lock:
+            self._total = 0
+
+
+    def extend(self, values:np.ndarray, timestamps:np.ndarray, statuses:np.ndarray,
+               host_timestamps:Optional[np.ndarray]=None) -> None:
+        """
+        append a batch; host_timestamps None (clock not synchronized yet) is stored as NaN
+        """
+        n = len(values)
+        if n == 0:
+            return
+        if host_timestamps is None:
+            host_timestamps = np.full(n, np.nan)
+        if n > self.capacity: # only the newest fit
+            values, timestamps, statuses = values[-self.capacity:], timestamps[-self.capacity:], statuses[-self.capacity:]
+            host_timestamps = host_timestamps[-self.capacity:]
+            skipped = n - self.capacity
+            n = self.capacity
+        else:
+            skipped = 0
+        with self._lock:
+            start = (self._total + skipped) % self.capacity
+            first = min(n, self.capacity - start)
+            for target, source in ((self._values, values), (self._timestamps, timestamps), (self._statuses, statuses),
+                                   (self._host_timestamps, host_timestamps)):
+                target[start:start + first] = source[:first]
+                target[:n - first] = source[first:]
+            self._total += skipped + n
+
+
+    def latest(self, n:Optional[int]=None) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        copies of the newest n samples (all kept samples if None), oldest first:
+        (values, device timestamps, statuses, host timestamps)
+        """
+        with self._lock:
+            size = min(self._total, self.capacity)
+            n = size if n is None else min(n, size)
+            end = self._total % self.capacity
+            indices = np.arange(end - n, end) % self.capacity
+            return self._values[indices], self._timestamps[indices], self._statuses[indices], self._host_timestamps[indices]
+
+
+    def since(self, host_time:float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (host timestamps, values) of the valid samples taken after host_time [time.time()]
+        """
+        values, _, statuses, host_timestamps = self.latest()
+        selected = (host_timestamps > host_time) & (statuses == STATUS_OK)
+        host_timestamps, values = host_timestamps[selected], values[selected]
+        order = np.argsort(host_timestamps, kind="stable") # refits can step the mapping back a little between batches
+        return host_timestamps[order], values[order]
@@ -0,0 +1,304 @@
+import numpy as np
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+ALLAN_OCTAVES = 18 # taus 1, 2, 4 .. 2^17 samples (36 h at 1 Hz, 2 min at 1 kHz)
+DRIFT_BLOCK = 1.0 # s, drift is fit to block means of this length
+DRIFT_CAPACITY = 1 << 18 # blocks kept (three days of 1 s blocks)
+DRIFT_WINDOWS = {"1 min": 60.0, "10 min": 600.0, "1 h": 3600.0, "1 day": 86400.0}
+SPECTRUM_SEGMENT = 1024 # samples per Welch segment
+SPECTRUM_SAMPLES = 1 << 15 # newest samples the spectrum is computed from
+GAP_FACTOR = 1.5 # a timestamp step longer than this many sample intervals breaks the series
+
+
+class AllanDeviation:
+    """
+    Overlapping Allan deviation at octave-spaced averaging times m = 1, 2, 4 .. 2^(octaves - 1) samples,
+    updated incrementally. With the running sum X of the samples, every new sample k adds one term
+        d = X[k] - 2 X[k - m] + X[k - 2m]
+    per octave, and
+        sigma^2(m) = sum d^2 / (2 m^2 count)
+    so only a ring of the last 4 * 2^(octaves - 1) running sums and two accumulators per octave are kept,
+    whatever the length of the run. Samples are offset by the first one to keep X small.
+    Terms need 2m + 1 consecutive samples: after a gap restart() begins a new segment, whose terms
+    add to the same accumulators, so no term spans the gap.
+    """
+
+    def __init__(self, octaves:int=ALLAN_OCTAVES):
+        self.octaves = octaves
+        self.m = 1 << np.arange(octaves)
+        self._ring = np.zeros(4 << (octaves - 1), dtype=np.float64)
+        self._mask = len(self._ring) - 1
+        self.reset()
+
+
+    def reset(self) -> None:
+        self._reference = None
+        self._samples = 0 # samples added over all segments
+        self._total = 0.0 # sum of the offset samples over all segments
+        self._sums = np.zeros(self.octaves, dtype=np.float64)
+        self._terms = np.zeros(self.octaves, dtype=np.int64)
+        self.restart()
+
+
+    def restart(self) -> None:
+        """
+        begin a new segment of consecutive samples, keeping the accumulated terms
+        """
+        self._count = 0 # samples of the segment; X[0] = 0 precedes the first
+        self._sum = 0.0 # running sum of the offset samples of the segment, X[count]
+        self._ring[0] = 0.0
+
+
+    @property
+    def count(self) -> int:
+        return self._samples
+
+
+    @property
+    def mean(self) -> float:
+        if self._samples == 0:
+            return np.nan
+        return self._reference + self._total / self._samples
+
+
+    def update(self, values:np.ndarray) -> None:
+        if len(values) == 0:
+            return
+        if self._reference is None:
+            self._reference = float(values[0])
+        chunk_size = len(self._ring) // 2 # the ring must still hold X[k - 2m] of the oldest new k
+        for start in range(0, len(values), chunk_size):
+            self._add_chunk(values[start:start + chunk_size])
+
+
+    def _add_chunk(self, values:np.ndarray) -> None:
+        n = len(values)
+        running = np.cumsum(values - self._reference)
+        running += self._sum
+        self._total += float(running[-1]) - self._sum
+        self._samples += n
+        self._sum = float(running[-1])
+        k = np.arange(self._count + 1, self._count + n + 1) # X indices of the new samples
+        first = k[0] & self._mask
+        end = first + n
+        if end <= len(self._ring):
+            self._ring[first:end] = running
+        else:
+            self._ring[first:] = running[:len(self._ring) - first]
+            self._ring[:end - len(self._ring)] = running[len(self._ring) - first:]
+        self._count += n
+        for octave, m in enumerate(self.m):
+            valid = k >= 2 * m
+            if not valid[-1]:
+                break
+            ks = k[valid]
+            d = running[valid] - 2.0 * self._ring[(ks - m) & self._mask] + self._ring[(ks - 2 * m) & self._mask]
+            self._sums[octave] += float(np.dot(d, d))
+            self._terms[octave] += len(d)
+
+
+    def deviation(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (m [samples], Allan deviation [units of the samples], terms per octave) of the octaves with terms
+        """
+        filled = self._terms > 0
+        m = self.m[filled]
+        variance = self._sums[filled] / (2.0 * m.astype(np.float64) ** 2 * self._terms[filled])
+        return m, np.sqrt(variance), self._terms[filled]
+
+
+@dataclass
+class DriftEstimate:
+    slope: float # W/s
+    mean: float # W
+    span: float # s covered by the fit
+    blocks: int
+
+
+class DriftTracker:
+    """
+    Means of DRIFT_BLOCK second blocks of host-timestamped samples in a bounded ring,
+    for least-squares drift over any window up to DRIFT_CAPACITY blocks.
+    """
+
+    def __init__(self, block:float=DRIFT_BLOCK, capacity:int=DRIFT_CAPACITY):
+        self.block = block
+        self.capacity = capacity
+        self._times = np.empty(capacity, dtype=np.float64)
+        self._means = np.empty(capacity, dtype=np.float64)
+        self.reset()
+
+
+    def reset(self) -> None:
+        self._total = 0 # blocks ever completed
+        self._partial = None # (block id, sum of times, sum of values, count) of the block being filled
+
+
+    def _push(self, time_sum:float, value_sum:float, count:int) -> None:
+        index = self._total % self.capacity
+        self._times[index] = time_sum / count
+        self._means[index] = value_sum / count
+        self._total += 1
+
+
+    def update(self, host_timestamps:np.ndarray, values:np.ndarray) -> None:
+        """
+        add samples (time.time(), ascending); samples without host time are skipped
+        """
+        valid = np.isfinite(host_timestamps)
+        if not np.any(valid):
+            return
+        host_timestamps, values = host_timestamps[valid], values[valid]
+        ids, inverse = np.unique(np.floor(host_timestamps / self.block).astype(np.int64), return_inverse=True)
+        time_sums = np.bincount(inverse, weights=host_timestamps)
+        value_sums = np.bincount(inverse, weights=values)
+        counts = np.bincount(inverse)
+        if self._partial is not None:
+            partial_id, partial_times, partial_values, partial_count = self._partial
+            if partial_id == ids[0]:
+                time_sums[0] += partial_times
+                value_sums[0] += partial_values
+                counts[0] += partial_count
+            else: # the host mapping may step back, the block is complete either way
+                self._push(partial_times, partial_values, partial_count)
+        for i in range(len(ids) - 1):
+            self._push(time_sums[i], value_sums[i], counts[i])
+        self._partial = (ids[-1], time_sums[-1], value_sums[-1], counts[-1])
+
+
+    def drift(self, window:float) -> Optional[DriftEstimate]:
+        """
+        linear fit of the block means of the last window seconds, None with fewer than two blocks
+        """
+        size = min(self._total, self.capacity)
+        if size < 2:
+            return None
+        indices = np.arange(self._total - size, self._total) % self.capacity
+        times, means = self._times[indices], self._means[indices]
+        selected = times >= times[-1] - window
+        if np.count_nonzero(selected) < 2:
+            return None
+        t = times[selected] - times[-1]
+        y = means[selected]
+        dt = t - t.mean()
+        slope = float(np.dot(dt, y - y.mean()) / np.dot(dt, dt))
+        return DriftEstimate(slope, float(y.mean()), float(t[-1] - t[0]), int(len(t)))
+
+
+@dataclass
+class PowerSpectrum:
+    frequencies: np.ndarray # Hz
+    density: np.ndarray # W^2/Hz, one-sided
+    sample_rate: float # Hz
+    segments: int
+
+
+def welch_spectrum(values:np.ndarray, sample_rate:float, segment:int=SPECTRUM_SEGMENT) -> Optional[PowerSpectrum]:
+    """
+    one-sided power spectral density: Hann-windowed segments overlapping by half, mean removed per segment;
+    None if there is not one full segment
+    """
+    segment = min(segment, len(values))
+    if segment < 8 or not sample_rate > 0:
+        return None
+    step = segment // 2
+    segments = np.lib.stride_tricks.sliding_window_view(values, segment)[::step]
+    window = np.hanning(segment)
+    detrended = segments - segments.mean(axis=1, keepdims=True)
+    spectra = np.fft.rfft(detrended * window, axis=1)
+    density = (spectra.real ** 2 + spectra.imag ** 2).mean(axis=0) / (sample_rate * np.dot(window, window))
+    density[1:-1 if segment % 2 == 0 else None] *= 2.0
+    return PowerSpectrum(np.fft.rfftfreq(segment, 1.0 / sample_rate), density, sample_rate, len(segments))
+
+
+class PowerStability:
+    """
+    Allan deviation and drift of one meter, fed with every batch by the polling thread
+    (valid samples only) and read from the GUI thread. The sample interval for the Allan taus
+    is the mean device timestamp step since the last reset, gaps left out. Flagged samples, timestamp steps
+    longer than GAP_FACTOR intervals and device clock restarts are gaps: the Allan deviation
+    continues with a new segment after each, and gaps counts them.
+    """
+
+    def __init__(self):
+        self.allan = AllanDeviation()
+        self.drift_tracker = DriftTracker()
+        self._lock = threading.Lock()
+        self._last_timestamp = None # device [ms]
+        self._step_sum = 0.0 # device [ms], of the timestamp steps that are not gaps
+        self._steps = 0
+        self._gaps = 0
+        self._broken = False # the last sample was flagged, the next valid one starts a segment
+
+
+    def reset(self) -> None:
+        with self._lock:
+            self.allan.reset()
+            self.drift_tracker.reset()
+            self._last_timestamp = None
+            self._step_sum = 0.0
+            self._steps = 0
+            self._gaps = 0
+            self._broken = False
+
+
+    @property
+    def gaps(self) -> int:
+        """
+        interruptions of the sample series since the last reset
+        """
+        return self._gaps
+
+
+    @property
+    def sample_interval(self) -> Optional[float]:
+        """
+        mean spacing of the samples [s]
+        """
+        if self._steps == 0 or not self._step_sum > 0:
+            return None
+        return self._step_sum * 1e-3 / self._steps
+
+
+    def update(self, values:np.ndarray, timestamps:np.ndarray, valid:np.ndarray, host_timestamps:Optional[np.ndarray]) -> None:
+        with self._lock:
+            interval = self.sample_interval
+            steps = np.diff(timestamps, prepend=timestamps[0] if self._last_timestamp is None else self._last_timestamp)
+            gaps = steps > GAP_FACTOR * interval * 1e3 if interval is not None else np.zeros(len(steps), dtype=bool)
+            if self._last_timestamp is None or timestamps[0] < self._last_timestamp: # first sample, or the device restarted its clock
+                gaps[0] = True
+            self._last_timestamp = float(timestamps[-1])
+            self._step_sum += float(steps[~gaps].sum())
+            self._steps += int(np.count_nonzero(~gaps))
+            # a valid sample after a flagged one or a step in time starts a new segment
+            after_flagged = np.concatenate([[self._broken], ~valid[:-1]])
+            self._broken = not valid[-1]
+            indices = np.flatnonzero(valid)
+            segments = np.split(indices, np.flatnonzero((gaps | after_flagged)[indices]))
+            self.allan.update(values[segments[0]])
+            for segment in segments[1:]:
+                if self.allan.count > 0:
+                    self._gaps += 1
+                self.allan.restart()
+                self.allan.update(values[segment])
+            if host_timestamps is not None:
+                self.drift_tracker.update(host_timestamps[valid], values[valid])
+
+
+    def allan_deviation(self) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        """
+        (tau [s], Allan deviation relative to the mean power), None before the sample interval is known
+        """
+        with self._lock:
+            interval = self.sample_interval
+            if interval is None:
+                return None
+            m, deviation, _ = self.allan.deviation()
+            return m * interval, deviation / abs(self.allan.mean)
+
+
+    def drift(self, window:float) -> Optional[DriftEstimate]:
+        with self._lock:
+            return self.drift_tracker.drift(window)
@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class ROIEstimator:
+    MEAN = "Mean"
+    MEDIAN = "Median"
+    TRIMMED_MEAN = "Trimmed Mean"
+    SIGMA_CLIPPED_MEAN = "Sigma-Clipped Mean"
+
+
+ESTIMATORS = [ROIEstimator.MEAN, ROIEstimator.MEDIAN, ROIEstimator.TRIMMED_MEAN, ROIEstimator.SIGMA_CLIPPED_MEAN]
+TRIM_FRACTION = 0.1 # cut from each end for the trimmed mean
+SIGMA_CLIP = 3.0 # clipping threshold in standard deviations
+SIGMA_CLIP_ITERATIONS = 5
+MAD_TO_SIGMA = 1.4826 # std of a normal distribution per median absolute deviation
+
+
+class RobustEstimator:
+    """
+    Location estimates of ROI pixels that a few outliers (reflections, bad pixels) cannot move:
+        MEDIAN             : middle value
+        TRIMMED_MEAN       : mean without the lowest and highest trim_fraction of the values
+        SIGMA_CLIPPED_MEAN : mean of the values within sigma_clip standard deviations of the center,
+                             starting from median and MAD, iterated until no more values are clipped
+    Order statistics come from in-place ndarray.partition (O(n)) on scratch buffers that grow
+    to the largest ROI and are reused, so an estimate allocates nothing for finite input.
+    Not thread safe; each thread needs its own instance.
+    """
+
+    def __init__(self, trim_fraction:float=TRIM_FRACTION, sigma_clip:float=SIGMA_CLIP,
+                 iterations:int=SIGMA_CLIP_ITERATIONS):
+        self.trim_fraction = trim_fraction
+        self.sigma_clip = sigma_clip
+        self.iterations = iterations
+        self._allocate(0)
+
+
+    def _allocate(self, size:int) -> None:
+        self._values = np.empty(size, dtype=np.float32)
+        self._deviation = np.empty(size, dtype=np.float32)
+        self._scratch = np.empty(size, dtype=np.float32)
+        self._mask = np.empty(size, dtype=bool)
+
+
+    def _load(self, values:np.ndarray) -> np.ndarray:
+        """
+        finite values copied into the scratch buffer (values may be a 2D slice of a frame)
+        """
+        n = values.size
+        if n > self._values.size:
+            self._allocate(n)
+        buffer = self._values[:n]
+        np.copyto(buffer.reshape(values.shape), values)
+        np.isfinite(buffer, out=self._mask[:n])
+        if not self._mask[:n].all():
+            return buffer[self._mask[:n]] # rare; compress at the cost of a copy
+        return buffer
+
+
+    @staticmethod
+    def _median(buffer:np.ndarray) -> float:
+        """
+        median of buffer, reordering it
+        """
+        n = buffer.size
+        k = n // 2
+        if n % 2:
+            buffer.partition(k)
+            return float(buffer[k])
+        buffer.partition((k - 1, k))
+        return (float(buffer[k - 1]) + float(buffer[k])) / 2
+
+
+    def estimate(self, values:np.ndarray, estimator:str) -> float:
+        """
+        estimate of the finite values, NaN if there are none
+        """
+        buffer = self._load(values)
+        n = buffer.size
+        if n == 0:
+            return np.nan
+        if estimator == ROIEstimator.MEDIAN:
+            return self._median(buffer)
+        if estimator == ROIEstimator.TRIMMED_MEAN:
+            cut = int(n * self.trim_fraction)
+            if cut > 0:
+                buffer.partition((cut, n - cut - 1))
+                buffer = buffer[cut:n - cut]
+            return float(buffer.mean(dtype=np.float64))
+        if estimator == ROIEstimator.SIGMA_CLIPPED_MEAN:
+            return self._sigma_clipped_mean(buffer)
+        return float(buffer.mean(dtype=np.float64))
+
+
+    def _sigma_clipped_mean(self, buffer:np.ndarray) -> float:
+        n = buffer.size
+        deviation = self._deviation[:n]
+        scratch = self._scratch[:n]
+        mask = self._mask[:n]
+        np.copyto(scratch, buffer)
+        center = self._median(scratch)
+        np.subtract(buffer, center, out=deviation)
+        np.abs(deviation, out=deviation)
+        np.copyto(scratch, deviation)
+        sigma = MAD_TO_SIGMA * self._median(scratch)
+        kept = n
+        for _ in range(self.iterations):
+            np.less_equal(deviation, self.sigma_clip * sigma, out=mask)
+            count = int(np.count_nonzero(mask))
+            if count == 0:
+                return center
+            center = float(np.mean(buffer, where=mask, dtype=np.float64))
+            if count == kept:
+                break
+            kept = count
+            sigma = float(np.std(buffer, where=mask, dtype=np.float64))
+            np.subtract(buffer, center, out=deviation)
+            np.abs(deviation, out=deviation)
+        return center
@@ -0,0 +1,276 @@
+import numpy as np
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from processing.pixel_correction import WindowedCorrection
+from processing.robust_estimators import ROIEstimator, RobustEstimator
+
+
+def roi_bounds(x:int, y:int, w:int, h:int, shape:Optional[tuple]=None) -> tuple[int, int, int, int]:
+    """
+    pixel bounds (x_start, x_end, y_start, y_end) of a w x h rectangle centered on (x, y),
+    clipped to an image of given (height, width) shape if any
+    """
+    half_w = w // 2
+    half_h = h // 2
+    x_start = max(x - half_w, 0)
+    x_end = x + half_w + 1
+    y_start = max(y - half_h, 0)
+    y_end = y + half_h + 1
+    if shape is not None:
+        x_end = min(x_end, shape[1])
+        y_end = min(y_end, shape[0])
+    return x_start, x_end, y_start, y_end
+
+
+@dataclass(frozen=True)
+class ThermalROI:
+    name: str
+    x: int # center
+    y: int # center
+    w: int
+    h: int
+    estimator: str = ROIEstimator.MEAN # location estimate reported as ROIStatistics.estimate
+
+
+@dataclass
+class ROIStatistics:
+    name: str
+    seq: int # frame sequence number
+    timestamp: float # frame timestamp
+    mean: float
+    std: float
+    min: float
+    max: float
+    count: int # number of valid (finite) pixels
+    x: int # ROI center on the sensor when the statistics were taken
+    y: int
+    estimator: str
+    estimate: float # location by estimator (equals mean for ROIEstimator.MEAN)
+
+
+class ROIStatisticsEngine:
+    """
+    Statistics of any number of named rectangular ROIs, computed per frame in the acquisition thread.
+    One summed-area table of the frame and one of its squares are built per frame, after which
+    mean and std of each ROI cost four lookups regardless of its size.
+    min/max are reduced over the ROI slice (there is no summed-area form for them).
+    Non-finite pixels (counts outside the calibration range) are excluded via a third table
+    that is only built when such pixels are present.
+    ROIs may be changed from any thread; compute() works on a snapshot.
+    ROIs are given in sensor pixels; when the camera reads out a window, set_origin() tells
+    the engine where frame pixel (0, 0) lies on the sensor.
+    compute_counts() works on raw counts instead and converts only the ROI pixels, gathered
+    through flat index arrays that are rebuilt only when ROIs, origin or frame shape change.
+    Given a pixel correction, it is applied to the gathered pixels and bad pixels are left out.
+    ROIs with a robust estimator (median, trimmed or sigma-clipped mean) additionally get their
+    pixels partitioned in a shared scratch buffer, a cost proportional to the ROI size.
+    """
+
+    def __init__(self):
+        self._rois = {}
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._shape = None
+        self._origin = (0, 0)
+        self._index_key = None # (rois, origin, shape, correction) the flat indices were built for
+        self._roi_indices = {}
+        self._robust = RobustEstimator() # used by the computing thread only
+
+
+    @property
+    def rois(self) -> dict[str, ThermalROI]:
+        with self._lock:
+            return dict(self._rois)
+
+
+    @property
+    def latest(self) -> dict[str, ROIStatistics]:
+        """
+        results of the most recent compute(), keyed by ROI name
+        """
+        return self._latest
+
+
+    def set_roi(self, name:str, x:int, y:int, w:int, h:int, estimator:Optional[str]=None) -> None:
+        """
+        add or move a ROI; estimator None keeps the one it had (ROIEstimator.MEAN for a new ROI)
+        """
+        with self._lock:
+            if estimator is None:
+                previous = self._rois.get(name)
+                estimator = ROIEstimator.MEAN if previous is None else previous.estimator
+            self._rois[name] = ThermalROI(name, x, y, w, h, estimator)
+
+
+    def set_estimator(self, name:str, estimator:str) -> None:
+        with self._lock:
+            roi = self._rois.get(name)
+            if roi is not None:
+                self._rois[name] = ThermalROI(roi.name, roi.x, roi.y, roi.w, roi.h, estimator)
+
+
+    @property
+    def origin(self) -> tuple[int, int]:
+        return self._origin
+
+
+    def set_origin(self, x:int, y:int) -> None:
+        """
+        sensor coordinates (offset x, offset y) of the first pixel of the frames passed to compute()
+        """
+        self._origin = (x, y)
+
+
+    def remove_roi(self, name:str) -> None:
+        with self._lock:
+            self._rois.pop(name, None)
+
+
+    def _allocate(self, shape:tuple) -> None:
+        h, w = shape
+        self._shape = shape
+        self._shifted = np.empty(shape, dtype=np.float64)
+        self._squared = np.empty(shape, dtype=np.float64)
+        self._invalid = np.empty(shape, dtype=bool)
+        self._valid = np.empty(shape, dtype=np.int64)
+        # summed-area tables carry a leading row/column of zeros so lookups need no bounds checks
+        self._sat = np.zeros((h + 1, w + 1), dtype=np.float64)
+        self._sat_sq = np.zeros((h + 1, w + 1), dtype=np.float64)
+        self._sat_count = np.zeros((h + 1, w + 1), dtype=np.int64)
+
+
+    def _build_indices(self, rois:dict[str, ThermalROI], shape:tuple, correction:Optional[WindowedCorrection]) -> None:
+        """
+        flat pixel indices of every ROI plus gather buffers for its counts and temperatures,
+        and the correction gathered at those indices
+        """
+        origin_x, origin_y = self._origin
+        self._roi_indices = {}
+        for name, roi in rois.items():
+            x_start, x_end, y_start, y_end = roi_bounds(roi.x - origin_x, roi.y - origin_y, roi.w, roi.h, shape)
+            if x_end <= x_start or y_end <= y_start:
+                continue
+            indices = (np.arange(y_start, y_end)[:, None] * shape[1] + np.arange(x_start, x_end)).ravel()
+            self._roi_indices[name] = (
+                roi,
+                indices,
+                np.empty(indices.size, dtype=np.uint16),
+                np.empty(indices.size, dtype=np.float32),
+                None if correction is None else correction.gather(indices), # (offset, gain, bad positions)
+            )
+        self._index_key = (rois, self._origin, shape, correction)
+
+
+    def compute_counts(self, counts:np.ndarray, lut:np.ndarray, seq:int=-1, timestamp:float=0.0,
+                       correction:Optional[WindowedCorrection]=None) -> dict[str, ROIStatistics]:
+        """
+        statistics from raw Mono16 counts, converting only the ROI pixels through lut (counts -> °C)
+        and correcting them with correction (for the frame window) if given
+        """
+        rois = self.rois
+        if self._index_key != (rois, self._origin, counts.shape, correction):
+            self._build_indices(rois, counts.shape, correction)
+        flat_counts = counts.reshape(-1)
+        results = {}
+        for name, (roi, indices, roi_counts, roi_temperatures, roi_correction) in self._roi_indices.items():
+            np.take(flat_counts, indices, out=roi_counts, mode="clip")
+            np.take(lut, roi_counts, out=roi_temperatures, mode="clip")
+            if roi_correction is not None:
+                offset, gain, bad_positions = roi_correction
+                if gain is not None:
+                    np.multiply(roi_temperatures, gain, out=roi_temperatures)
+                np.add(roi_temperatures, offset, out=roi_temperatures)
+                roi_temperatures[bad_positions] = np.nan # their neighbors may lie outside the ROI
+            finite = np.isfinite(roi_temperatures)
+            values = roi_temperatures if finite.all() else roi_temperatures[finite]
+            if values.size == 0:
+                results[name] = ROIStatistics(name, seq, timestamp, np.nan, np.nan, np.nan, np.nan, 0, roi.x, roi.y,
+                                              roi.estimator, np.nan)
+                continue
+            mean = float(values.mean(dtype=np.float64))
+            results[name] = ROIStatistics(
+                name, seq, timestamp,
+                mean=mean,
+                std=float(values.std(dtype=np.float64)),
+                min=float(values.min()),
+                max=float(values.max()),
+                count=int(values.size),
+                x=roi.x,
+                y=roi.y,
+                estimator=roi.estimator,
+                estimate=mean if roi.estimator == ROIEstimator.MEAN else self._robust.estimate(values, roi.estimator),
+            )
+        self._latest = results
+        return results
+
+
+    @staticmethod
+    def _integrate(values:np.ndarray, sat:np.ndarray) -> None:
+        np.cumsum(values, axis=0, out=values)
+        np.cumsum(values, axis=1, out=sat[1:, 1:])
+
+
+    @staticmethod
+    def _rect_sum(sat:np.ndarray, x_start:int, x_end:int, y_start:int, y_end:int):
+        return sat[y_end, x_end] - sat[y_start, x_end] - sat[y_end, x_start] + sat[y_start, x_start]
+
+
+    def compute(self, frame:np.ndarray, seq:int=-1, timestamp:float=0.0) -> dict[str, ROIStatistics]:
+        rois = self.rois
+        if not rois:
+            self._latest = {}
+            return self._latest
+        if self._shape != frame.shape:
+            self._allocate(frame.shape)
+
+        # shift by a typical value so the sum of squares does not lose the sub-kelvin variance
+        center = frame[frame.shape[0] // 2, frame.shape[1] // 2]
+        shift = float(center) if np.isfinite(center) else 0.0
+        np.subtract(frame, shift, out=self._shifted, dtype=np.float64)
+        np.isfinite(self._shifted, out=self._invalid)
+        np.logical_not(self._invalid, out=self._invalid)
+        has_invalid = bool(self._invalid.any())
+        if has_invalid:
+            np.copyto(self._shifted, 0.0, where=self._invalid)
+            np.logical_not(self._invalid, out=self._invalid)
+            np.copyto(self._valid, self._invalid)
+            self._integrate(self._valid, self._sat_count)
+        np.square(self._shifted, out=self._squared)
+        self._integrate(self._shifted, self._sat)
+        self._integrate(self._squared, self._sat_sq)
+
+        results = {}
+        origin_x, origin_y = self._origin
+        for name, roi in rois.items():
+            x_start, x_end, y_start, y_end = roi_bounds(roi.x - origin_x, roi.y - origin_y, roi.w, roi.h, frame.shape)
+            if x_end <= x_start or y_end <= y_start:
+                continue
+            if has_invalid:
+                count = int(self._rect_sum(self._sat_count, x_start, x_end, y_start, y_end))
+            else:
+                count = (x_end - x_start) * (y_end - y_start)
+            if count == 0:
+                results[name] = ROIStatistics(name, seq, timestamp, np.nan, np.nan, np.nan, np.nan, 0, roi.x, roi.y,
+                                              roi.estimator, np.nan)
+                continue
+            total = self._rect_sum(self._sat, x_start, x_end, y_start, y_end)
+            total_sq = self._rect_sum(self._sat_sq, x_start, x_end, y_start, y_end)
+            mean = total / count
+            variance = max(total_sq / count - mean * mean, 0.0)
+            region = frame[y_start:y_end, x_start:x_end]
+            mean = float(mean + shift)
+            results[name] = ROIStatistics(
+                name, seq, timestamp,
+                mean=mean,
+                std=float(np.sqrt(variance)),
+                min=float(np.nanmin(region)),
+                max=float(np.nanmax(region)),
+                count=count,
+                x=roi.x,
+                y=roi.y,
+                estimator=roi.estimator,
+                estimate=mean if roi.estimator == ROIEstimator.MEAN else self._robust.estimate(region, roi.estimator),
+            )
+        self._latest = results
+        return results
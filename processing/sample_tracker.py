@@ -0,0 +1,107 @@
+import numpy as np
+from typing import Optional
+from processing.roi_statistics import ThermalROI, roi_bounds
+
+
+class TrackingPolarity:
+    AUTO = "Auto"
+    HOT = "Hot"
+    COLD = "Cold"
+
+
+class SampleTracker:
+    """
+    Locates a sample that is hotter or colder than its surroundings inside a search window
+    (the sample ROI grown by search_margin on every side), so the ROI can follow it as it drifts.
+        background : median of the search window border
+        contrast   : |T - background| with the sign given by polarity (AUTO picks the larger excursion)
+        position   : contrast-weighted centroid of the pixels above threshold * peak contrast
+    The position is rejected when the peak contrast is below min_contrast [K] or fewer than
+    min_pixels pixels pass the threshold, and a move is limited to max_step [px] per frame.
+    Work per frame is a few passes over the search window only, whatever the frame size.
+    """
+
+    def __init__(self, search_margin:int=20, threshold:float=0.5, min_contrast:float=0.2,
+                 min_pixels:int=4, max_step:int=5, polarity:str=TrackingPolarity.AUTO):
+        self.enabled = False
+        self.search_margin = search_margin
+        self.threshold = threshold
+        self.min_contrast = min_contrast
+        self.min_pixels = min_pixels
+        self.max_step = max_step
+        self.polarity = polarity
+        self._shape = None
+
+
+    def search_bounds(self, roi:ThermalROI, origin:tuple[int, int], shape:tuple) -> tuple[int, int, int, int]:
+        """
+        frame pixel bounds (x_start, x_end, y_start, y_end) of the search window around roi (sensor coordinates)
+        """
+        return roi_bounds(roi.x - origin[0], roi.y - origin[1],
+                          roi.w + 2 * self.search_margin, roi.h + 2 * self.search_margin, shape)
+
+
+    def region_buffer(self, shape:tuple) -> np.ndarray:
+        """
+        float32 buffer of the search window shape, e.g. to convert raw counts into
+        """
+        self._allocate(shape)
+        return self._region
+
+
+    def _allocate(self, shape:tuple) -> None:
+        if self._shape == shape:
+            return
+        self._shape = shape
+        self._region = np.empty(shape, dtype=np.float32)
+        self._contrast = np.empty(shape, dtype=np.float32)
+        self._weights = np.empty(shape, dtype=np.float32)
+        self._mask = np.empty(shape, dtype=bool)
+        self._border = np.empty(2 * (shape[0] + shape[1]), dtype=np.float32)
+
+
+    def locate(self, region:np.ndarray, x_start:int, y_start:int) -> Optional[tuple[float, float]]:
+        """
+        sample centroid (x, y) in the coordinates of region[0, 0] = (x_start, y_start), None if not found
+        """
+        height, width = region.shape
+        if height < 3 or width < 3:
+            return None
+        self._allocate(region.shape)
+        border = self._border
+        border[:width] = region[0]
+        border[width:2 * width] = region[-1]
+        border[2 * width:2 * width + height] = region[:, 0]
+        border[2 * width + height:] = region[:, -1]
+        background = np.nanmedian(border)
+        if not np.isfinite(background):
+            return None
+
+        contrast = self._contrast
+        np.subtract(region, background, out=contrast)
+        if self.polarity == TrackingPolarity.COLD or (
+            self.polarity == TrackingPolarity.AUTO and -np.nanmin(contrast) > np.nanmax(contrast)
+        ):
+            np.negative(contrast, out=contrast)
+        peak = np.nanmax(contrast)
+        if not peak >= self.min_contrast:
+            return None
+        np.greater_equal(contrast, self.threshold * peak, out=self._mask) # NaN compares False
+        if np.count_nonzero(self._mask) < self.min_pixels:
+            return None
+        weights = self._weights
+        weights.fill(0.0)
+        np.copyto(weights, contrast, where=self._mask)
+        total = float(weights.sum(dtype=np.float64))
+        x = float(np.dot(weights.sum(axis=0, dtype=np.float64), np.arange(width)) / total)
+        y = float(np.dot(weights.sum(axis=1, dtype=np.float64), np.arange(height)) / total)
+        return x_start + x, y_start + y
+
+
+    def step(self, x:int, y:int, target:tuple[float, float]) -> tuple[int, int]:
+        """
+        ROI center moved from (x, y) towards target by at most max_step pixels per axis
+        """
+        dx = int(np.clip(round(target[0]) - x, -self.max_step, self.max_step))
+        dy = int(np.clip(round(target[1]) - y, -self.max_step, self.max_step))
+        return x + dx, y + dy
@@ -0,0 +1,45 @@
+import numpy as np
+from typing import Iterable, Optional
+from processing.roi_statistics import ThermalROI, roi_bounds
+
+
+def roi_bounding_window(rois:Iterable[ThermalROI], margin:int=0,
+                        sensor_shape:Optional[tuple]=None) -> Optional[tuple[int, int, int, int]]:
+    """
+    (offset_x, offset_y, width, height) of the smallest window holding all ROIs plus margin [px]
+    on every side, in sensor pixels; None without ROIs
+    """
+    bounds = [roi_bounds(roi.x, roi.y, roi.w, roi.h, sensor_shape) for roi in rois]
+    if not bounds:
+        return None
+    x_start = max(min(b[0] for b in bounds) - margin, 0)
+    x_end = max(b[1] for b in bounds) + margin
+    y_start = max(min(b[2] for b in bounds) - margin, 0)
+    y_end = max(b[3] for b in bounds) + margin
+    if sensor_shape is not None:
+        x_end = min(x_end, sensor_shape[1])
+        y_end = min(y_end, sensor_shape[0])
+    return x_start, y_start, x_end - x_start, y_end - y_start
+
+
+def _snap_axis(start:int, size:int, sensor:int, size_increment:int, offset_increment:int, min_size:int) -> tuple[int, int]:
+    end = start + size
+    start = (start // offset_increment) * offset_increment
+    size = int(np.ceil((end - start) / size_increment)) * size_increment
+    size = min(max(size, min_size), (sensor // size_increment) * size_increment)
+    if start + size > sensor:
+        start = ((sensor - size) // offset_increment) * offset_increment
+    return start, size
+
+
+def snap_window(window:tuple[int, int, int, int], sensor_shape:tuple[int, int],
+                size_increment:tuple[int, int]=(1, 1), offset_increment:tuple[int, int]=(1, 1),
+                min_size:tuple[int, int]=(1, 1)) -> tuple[int, int, int, int]:
+    """
+    grow (offset_x, offset_y, width, height) to the nearest window the camera accepts:
+    offsets and sizes on their increments (x, y), at least min_size (width, height) and inside the sensor
+    """
+    offset_x, offset_y, width, height = window
+    offset_x, width = _snap_axis(offset_x, width, sensor_shape[1], size_increment[0], offset_increment[0], min_size[0])
+    offset_y, height = _snap_axis(offset_y, height, sensor_shape[0], size_increment[1], offset_increment[1], min_size[1])
+    return offset_x, offset_y, width, height
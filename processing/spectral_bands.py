@@ -0,0 +1,88 @@
+import numpy as np
+import threading
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class SpectralBand:
+    name: str
+    start: float # nm
+    end: float # nm
+
+
+@dataclass
+class BandResult:
+    integral: float # counts * nm
+    centroid: float # nm, mean wavelength weighted by the positive intensities
+    peak: float # nm, wavelength of the brightest pixel in the band
+
+
+class SpectralBandEngine:
+    """
+    Integral, centroid and peak of named wavelength bands. Every pixel covers the wavelengths between
+    the midpoints to its neighbors; its weight in a band is the overlap [nm], so band edges cut pixels
+    fractionally. The integral is taken over the dark-subtracted intensities as they are; the centroid
+    weights are clipped at zero, so negative noise cannot push it outside the band or make it diverge.
+    Built once per calibration and band set:
+        weights : (2 * bands, pixels), rows of overlap and overlap * wavelength
+        indices : (bands, longest band) pixel indices padded with a sentinel, for the peaks
+    Bands may be changed from any thread; compute() rebuilds the tables on the next spectrum.
+    """
+
+    def __init__(self, wavelengths:np.ndarray):
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        midpoints = 0.5 * (self.wavelengths[1:] + self.wavelengths[:-1])
+        self._lower_edges = np.concatenate([[self.wavelengths[0] - (midpoints[0] - self.wavelengths[0])], midpoints])
+        self._upper_edges = np.concatenate([midpoints, [self.wavelengths[-1] + (self.wavelengths[-1] - midpoints[-1])]])
+        self._bands = ()
+        self._lock = threading.Lock()
+        self._table_key = None
+        self._padded = np.empty(len(self.wavelengths) + 1, dtype=np.float64)
+        self._padded[-1] = -np.inf # sentinel of the padded peak indices
+        self._positive = np.empty(len(self.wavelengths), dtype=np.float64)
+
+
+    @property
+    def bands(self) -> tuple[SpectralBand, ...]:
+        with self._lock:
+            return self._bands
+
+
+    def set_bands(self, bands) -> None:
+        with self._lock:
+            self._bands = tuple(bands)
+
+
+    def _build(self, bands:tuple[SpectralBand, ...]) -> None:
+        overlap = np.clip(
+            np.minimum(self._upper_edges, np.array([[max(b.start, b.end)] for b in bands]))
+            - np.maximum(self._lower_edges, np.array([[min(b.start, b.end)] for b in bands])),
+            0.0, None
+        )
+        self._weights = np.vstack([overlap, overlap * self.wavelengths])
+        members = [np.flatnonzero(row > 0) for row in overlap]
+        self._indices = np.full((len(bands), max((len(m) for m in members), default=0) or 1), len(self.wavelengths))
+        for i, member in enumerate(members):
+            self._indices[i, :len(member)] = member
+        self._table_key = bands
+
+
+    def compute(self, intensities:np.ndarray) -> dict[str, BandResult]:
+        bands = self.bands
+        if not bands:
+            return {}
+        if self._table_key != bands:
+            self._build(bands)
+        integrals = self._weights[:len(bands)] @ intensities
+        np.maximum(intensities, 0.0, out=self._positive)
+        sums = self._weights @ self._positive
+        positive_integrals, moments = sums[:len(bands)], sums[len(bands):]
+        self._padded[:-1] = intensities
+        peak_indices = self._indices[np.arange(len(bands)), np.argmax(self._padded[self._indices], axis=1)]
+        peaks = np.append(self.wavelengths, np.nan)[peak_indices] # NaN for a band outside the detector
+        with np.errstate(divide="ignore", invalid="ignore"):
+            centroids = moments / positive_integrals # NaN for a band without positive intensity
+        return {
+            band.name: BandResult(float(integrals[i]), float(centroids[i]), float(peaks[i]))
+            for i, band in enumerate(bands)
+        }
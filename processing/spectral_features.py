@@ -0,0 +1,110 @@
+import numpy as np
+from dataclasses import dataclass
+
+
+class PeakFit:
+    PARABOLIC = "Parabolic"
+    GAUSSIAN = "Gaussian" # parabola fit to the logarithm of the intensities
+
+
+PEAK_FITS = [PeakFit.GAUSSIAN, PeakFit.PARABOLIC]
+CENTROID_THRESHOLD = 0.1 # fraction of the peak intensity below which pixels are left out of the centroid
+
+
+@dataclass
+class SpectralFeatures:
+    timestamp: float # time.time() of the spectrum
+    peak_wavelength: float # nm, sub-pixel
+    peak_intensity: float # counts, at the fitted vertex
+    centroid_wavelength: float # nm, intensity weighted over the peak region above the threshold
+    fwhm: float # nm, NaN if the peak does not fall below half maximum on both sides
+
+
+class SpectralFeatureEngine:
+    """
+    Peak, centroid and FWHM of dark-subtracted spectra.
+        peak     : vertex of a least-squares parabola (or Gaussian) over the pixels above half maximum
+                   around the argmax, at least the argmax and its two neighbors
+        centroid : sum (I - T) * wavelength / sum (I - T) over the contiguous pixels around the peak
+                   above T = threshold * peak, so noise and other lines do not pull it
+        FWHM     : half-maximum crossings on both sides, linearly interpolated between pixels
+    Positions are found in fractional pixels and converted through the wavelength calibration,
+    so a non-uniform pixel pitch is taken into account.
+    """
+
+    def __init__(self, wavelengths:np.ndarray, peak_fit:str=PeakFit.GAUSSIAN, threshold:float=CENTROID_THRESHOLD):
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        self.peak_fit = peak_fit
+        self.threshold = threshold
+        self._pixels = np.arange(len(self.wavelengths), dtype=np.float64)
+
+
+    def _wavelength_at(self, pixel:float) -> float:
+        return float(np.interp(pixel, self._pixels, self.wavelengths))
+
+
+    def _vertex(self, intensities:np.ndarray, peak:int) -> tuple[float, float]:
+        """
+        (fractional pixel, intensity) of the fitted peak; every pixel of the half maximum region
+        enters the fit, so the vertex averages over the noise of all of them
+        """
+        center = intensities[peak]
+        if peak == 0 or peak == len(intensities) - 1 or not center > 0:
+            return float(peak), float(center)
+        start, end = self._region(intensities >= 0.5 * center, peak)
+        start, end = min(start, peak - 1), max(end, peak + 2)
+        x = self._pixels[start:end] - peak
+        y = intensities[start:end]
+        gaussian = self.peak_fit == PeakFit.GAUSSIAN and np.all(y > 0)
+        if gaussian: # log I has the variance of I scaled by 1 / I^2
+            c2, c1, c0 = np.polyfit(x, np.log(y), 2, w=y)
+        else:
+            c2, c1, c0 = np.polyfit(x, y, 2)
+        if not c2 < 0: # flat top or not a maximum
+            return float(peak), float(center)
+        delta = -0.5 * c1 / c2
+        if not x[0] <= delta <= x[-1]:
+            return float(peak), float(center)
+        vertex = c0 + 0.5 * c1 * delta
+        return peak + delta, float(np.exp(vertex) if gaussian else vertex)
+
+
+    @staticmethod
+    def _region(above:np.ndarray, peak:int) -> tuple[int, int]:
+        """
+        [start, end) of the run of True in above that holds peak
+        """
+        below_left = np.flatnonzero(~above[:peak])
+        below_right = np.flatnonzero(~above[peak:])
+        start = below_left[-1] + 1 if len(below_left) else 0
+        end = peak + below_right[0] if len(below_right) else len(above)
+        return int(start), int(end)
+
+
+    def _fwhm(self, intensities:np.ndarray, peak:int, half:float) -> float:
+        start, end = self._region(intensities >= half, peak)
+        if start == 0 or end == len(intensities) or end <= start:
+            return np.nan
+        inner, outer = intensities[start], intensities[start - 1]
+        left = start - (inner - half) / (inner - outer)
+        inner, outer = intensities[end - 1], intensities[end]
+        right = end - 1 + (inner - half) / (inner - outer)
+        return self._wavelength_at(right) - self._wavelength_at(left)
+
+
+    def compute(self, intensities:np.ndarray, timestamp:float) -> SpectralFeatures:
+        peak = int(np.argmax(intensities))
+        peak_pixel, peak_intensity = self._vertex(intensities, peak)
+        if not peak_intensity > 0:
+            return SpectralFeatures(timestamp, self._wavelength_at(peak_pixel), peak_intensity, np.nan, np.nan)
+        level = self.threshold * peak_intensity
+        start, end = self._region(intensities > level, peak)
+        weights = intensities[start:end] - level
+        centroid = float(np.dot(weights, self.wavelengths[start:end]) / weights.sum())
+        return SpectralFeatures(
+            timestamp=timestamp,
+            peak_wavelength=self._wavelength_at(peak_pixel),
+            peak_intensity=peak_intensity,
+            centroid_wavelength=centroid,
+            fwhm=self._fwhm(intensities, peak, 0.5 * peak_intensity),
+        )
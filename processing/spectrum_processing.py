@@ -0,0 +1,134 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Optional
+from processing.spectral_features import SpectralFeatureEngine, SpectralFeatures
+from processing.spectral_bands import SpectralBandEngine, BandResult
+
+MAX_SCANS_TO_AVERAGE = 1000
+MAX_BOXCAR_WIDTH = 50 # px on each side
+
+
+@dataclass
+class ProcessedSpectrum:
+    timestamp: float # time.time() when the last scan of the average was read
+    scans: int # scans averaged
+    boxcar_width: int # px on each side of every pixel
+    intensities: np.ndarray # averaged, dark subtracted and smoothed [counts]
+    features: SpectralFeatures
+    bands: dict[str, BandResult] # by band name
+
+
+class BoxcarSmoother:
+    """
+    Moving mean over 2 * width + 1 pixels, shrunk at both ends of the spectrum.
+    One cumulative sum and one difference per spectrum, into preallocated arrays;
+    the divisor of every pixel is computed when the width or length changes.
+    """
+
+    def __init__(self, width:int=0):
+        self._width = width
+        self._size = None
+
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+
+    @width.setter
+    def width(self, width:int) -> None:
+        self._width = int(np.clip(width, 0, MAX_BOXCAR_WIDTH))
+        self._size = None
+
+
+    def _allocate(self, size:int) -> None:
+        self._size = size
+        w = self._width
+        self._cumulative = np.zeros(size + 1, dtype=np.float64) # cumulative[0] stays 0
+        index = np.arange(size)
+        self._upper = np.minimum(index + w + 1, size)
+        self._lower = np.maximum(index - w, 0)
+        self._inverse_counts = 1.0 / (self._upper - self._lower)
+
+
+    def smooth(self, spectrum:np.ndarray, out:np.ndarray) -> np.ndarray:
+        if self._width == 0:
+            out[:] = spectrum
+            return out
+        if self._size != len(spectrum):
+            self._allocate(len(spectrum))
+        np.cumsum(spectrum, out=self._cumulative[1:])
+        np.subtract(self._cumulative[self._upper], self._cumulative[self._lower], out=out)
+        np.multiply(out, self._inverse_counts, out=out)
+        return out
+
+
+class SpectrumAccumulator:
+    """
+    Sum of scans_to_average scans read back to back (Ocean "scans to average"), kept in a preallocated
+    float64 array; the counts are integers, so the running sum is exact. Once complete, process()
+    divides, subtracts the dark spectrum, smooths and derives the spectral features and band values, in preallocated arrays.
+    """
+
+    def __init__(self, wavelengths:np.ndarray, scans_to_average:int=1, boxcar_width:int=0):
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        self.scans_to_average = scans_to_average
+        self.smoother = BoxcarSmoother(boxcar_width)
+        self.features = SpectralFeatureEngine(self.wavelengths)
+        self.bands = SpectralBandEngine(self.wavelengths)
+        self.dark = None # averaged dark spectrum [counts], subtracted when set
+        size = len(self.wavelengths)
+        self._sum = np.zeros(size, dtype=np.float64)
+        self._mean = np.empty(size, dtype=np.float64)
+        self._smoothed = np.empty(size, dtype=np.float64)
+        self._scans = 0
+        self.last_mean = None # average of the last complete set of scans, before dark subtraction
+
+
+    @property
+    def scans_to_average(self) -> int:
+        return self._scans_to_average
+
+
+    @scans_to_average.setter
+    def scans_to_average(self, scans:int) -> None:
+        self._scans_to_average = int(np.clip(scans, 1, MAX_SCANS_TO_AVERAGE))
+
+
+    @property
+    def complete(self) -> bool:
+        return self._scans >= self._scans_to_average
+
+
+    def reset(self) -> None:
+        self._sum.fill(0.0)
+        self._scans = 0
+
+
+    def add(self, intensities:np.ndarray) -> None:
+        np.add(self._sum, intensities, out=self._sum)
+        self._scans += 1
+
+
+    def process(self, timestamp:float) -> Optional[ProcessedSpectrum]:
+        """
+        average of the scans added since the last process() (None if there are none), ready to emit
+        """
+        if self._scans == 0:
+            return None
+        scans = self._scans
+        np.multiply(self._sum, 1.0 / scans, out=self._mean)
+        self.last_mean = self._mean.copy()
+        dark = self.dark
+        if dark is not None and dark.shape == self._mean.shape:
+            np.subtract(self._mean, dark, out=self._mean)
+        self.reset()
+        intensities = self.smoother.smooth(self._mean, self._smoothed).copy() # the emitted array is handed to the GUI thread
+        return ProcessedSpectrum(
+            timestamp=timestamp,
+            scans=scans,
+            boxcar_width=self.smoother.width,
+            intensities=intensities,
+            features=self.features.compute(intensities, timestamp),
+            bands=self.bands.compute(intensities),
+        )
@@ -0,0 +1,153 @@
+import numpy as np
+import threading
+from typing import Optional
+
+
+class AveragingMode:
+    OFF = "Off"
+    BOXCAR = "Boxcar"
+    EMA = "EMA"
+
+
+MAX_BOXCAR_FRAMES = 64 # history is kept as float32 frames: 64 x 640x480 -> 79 MB
+
+
+class TemporalAverager:
+    """
+    Per-pixel temporal averaging of the thermal stream, applied in place in the acquisition thread.
+        BOXCAR : mean and variance over the last n frames, kept as running sums (float64)
+                 plus a ring of the last n frames to subtract the frame leaving the window
+        EMA    : exponential moving average with alpha = 1 / n and exponentially weighted variance
+    Every update is a fixed number of whole-frame passes into preallocated buffers.
+    The boxcar sums are rebuilt from the history each time the window wraps, so rounding
+    drift cannot accumulate and a non-finite pixel only affects n frames.
+    configure() may be called from any thread; it takes effect (and resets) on the next update.
+    """
+
+    def __init__(self, mode:str=AveragingMode.OFF, n_frames:int=8):
+        self._lock = threading.Lock()
+        self._pending = None
+        self._mode = mode
+        self._n_frames = n_frames
+        self._shape = None
+        self._variance = None
+
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+
+    @property
+    def n_frames(self) -> int:
+        return self._n_frames
+
+
+    @property
+    def variance(self) -> Optional[np.ndarray]:
+        """
+        per-pixel variance [K^2] of the frames in the current window (float32), None when off
+        """
+        return self._variance if self._mode != AveragingMode.OFF else None
+
+
+    def configure(self, mode:str, n_frames:int) -> None:
+        if mode == AveragingMode.BOXCAR:
+            n_frames = min(n_frames, MAX_BOXCAR_FRAMES)
+        with self._lock:
+            self._pending = (mode, max(1, n_frames))
+
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pending = (self._mode, self._n_frames)
+
+
+    def _allocate(self, shape:tuple) -> None:
+        self._shape = shape
+        self._count = 0
+        self._index = 0
+        self._sum = np.zeros(shape, dtype=np.float64) # boxcar: sum, EMA: mean
+        self._sum_sq = np.zeros(shape, dtype=np.float64) # boxcar: sum of squares, EMA: variance
+        self._scratch = np.empty(shape, dtype=np.float64)
+        self._scratch2 = np.empty(shape, dtype=np.float64)
+        self._finite = np.empty(shape, dtype=bool)
+        self._variance = np.zeros(shape, dtype=np.float32)
+        if self._mode == AveragingMode.BOXCAR:
+            self._history = np.empty((self._n_frames, *shape), dtype=np.float32)
+        else:
+            self._history = None
+
+
+    def update(self, frame:np.ndarray) -> np.ndarray:
+        """
+        add frame to the running statistics and overwrite it with the averaged frame
+        """
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            self._mode, self._n_frames = pending
+            self._shape = None
+        if self._mode == AveragingMode.OFF:
+            return frame
+        if self._shape != frame.shape:
+            self._allocate(frame.shape)
+        if self._mode == AveragingMode.BOXCAR:
+            self._update_boxcar(frame)
+        elif self._mode == AveragingMode.EMA:
+            self._update_ema(frame)
+        return frame
+
+
+    def _update_boxcar(self, frame:np.ndarray) -> None:
+        if self._count == self._n_frames:
+            oldest = self._history[self._index]
+            np.subtract(self._sum, oldest, out=self._sum)
+            np.square(oldest, out=self._scratch, dtype=np.float64)
+            np.subtract(self._sum_sq, self._scratch, out=self._sum_sq)
+        else:
+            self._count += 1
+        np.copyto(self._history[self._index], frame)
+        np.add(self._sum, frame, out=self._sum)
+        np.square(frame, out=self._scratch, dtype=np.float64)
+        np.add(self._sum_sq, self._scratch, out=self._sum_sq)
+        self._index = (self._index + 1) % self._n_frames
+        if self._index == 0 and self._count == self._n_frames:
+            self._resync_boxcar()
+
+        inverse_count = 1.0 / self._count
+        np.multiply(self._sum, inverse_count, out=self._scratch) # mean
+        np.multiply(self._sum_sq, inverse_count, out=self._scratch2)
+        np.copyto(frame, self._scratch, casting="same_kind")
+        np.square(self._scratch, out=self._scratch)
+        np.subtract(self._scratch2, self._scratch, out=self._scratch2)
+        np.maximum(self._scratch2, 0.0, out=self._scratch2)
+        np.copyto(self._variance, self._scratch2, casting="same_kind")
+
+
+    def _resync_boxcar(self) -> None:
+        self._sum.fill(0.0)
+        self._sum_sq.fill(0.0)
+        for past_frame in self._history:
+            np.add(self._sum, past_frame, out=self._sum)
+            np.square(past_frame, out=self._scratch, dtype=np.float64)
+            np.add(self._sum_sq, self._scratch, out=self._sum_sq)
+
+
+    def _update_ema(self, frame:np.ndarray) -> None:
+        mean, variance = self._sum, self._sum_sq
+        if self._count == 0:
+            np.copyto(mean, frame)
+            variance.fill(0.0)
+            self._count = 1
+        else:
+            alpha = 1.0 / self._n_frames
+            np.isfinite(frame, out=self._finite)
+            np.subtract(frame, mean, out=self._scratch, dtype=np.float64) # deviation from previous mean
+            np.multiply(self._scratch, alpha, out=self._scratch2)
+            np.add(mean, self._scratch2, out=mean, where=self._finite)
+            np.multiply(self._scratch, self._scratch2, out=self._scratch) # alpha * deviation^2
+            np.add(variance, self._scratch, out=variance, where=self._finite)
+            np.multiply(variance, 1.0 - alpha, out=variance, where=self._finite)
+        np.copyto(frame, mean, casting="same_kind")
+        np.copyto(self._variance, variance, casting="same_kind")
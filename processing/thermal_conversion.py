@@ -0,0 +1,99 @@
+import numpy as np
+
+MONO16_LEVELS = 1 << 16 # number of distinct Mono16 counts
+KELVIN_OFFSET = 273.15
+
+
+class IRFormatType:
+    LINEAR_10MK = 1
+    LINEAR_100MK = 2
+    RADIOMETRIC = 3
+
+
+def radiometric_temperature_lut(J0:float, J1:float, R:float, B:float, F:float,
+                                tau:float, K2:float, emissivity:float, dtype=np.float32) -> np.ndarray:
+    """
+    Build counts -> temperature [°C] lookup table for radiometric Mono16 frames.
+    Entry i holds the temperature of a pixel reading i counts, so conversion of a
+    whole frame becomes a single gather: lut[image].
+    Counts outside the valid range of the Planck inversion are set to NaN.
+    The table is evaluated in float64 and stored as dtype (float32 keeps it at 256 kB).
+    """
+    counts = np.arange(MONO16_LEVELS, dtype=np.float64)
+    radiance = (counts - J0) / J1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lut = (B / np.log(R / ((radiance / emissivity / tau) - K2) + F)) - KELVIN_OFFSET
+    lut[~np.isfinite(lut)] = np.nan
+    return lut.astype(dtype)
+
+
+def atmospheric_transmission(X:float, alpha1:float, alpha2:float, beta1:float, beta2:float,
+                             humidity:float, atmospheric_temperature:float, distance:float) -> float:
+    """
+    transmission of the atmosphere between camera and object;
+    humidity as fraction (0-1), temperature in K, distance in m
+    """
+    t_atm_c = atmospheric_temperature - KELVIN_OFFSET
+    h2o = humidity * np.exp(1.5587 + 0.06939 * t_atm_c - 0.00027816 * t_atm_c * t_atm_c + 0.00000068455 * t_atm_c * t_atm_c * t_atm_c)
+    return X * np.exp(-np.sqrt(distance) * (alpha1 + beta1 * np.sqrt(h2o))) + (1 - X) * np.exp(-np.sqrt(distance) * (alpha2 + beta2 * np.sqrt(h2o)))
+
+
+def background_pseudo_radiance(R:float, B:float, F:float, emissivity:float, tau:float,
+                               reflected_temperature:float, atmospheric_temperature:float,
+                               ext_optics_transmission:float, ext_optics_temperature:float) -> float:
+    """
+    K2: pseudo radiance of the reflected environment, the atmosphere and the external optics
+    (temperatures in K), subtracted from the measured radiance before the Planck inversion
+    """
+    # Pseudo radiance of the reflected environment
+    r1 = ((1 - emissivity) / emissivity) * (R / (np.exp(B / reflected_temperature) - F))
+    # Pseudo radiance of the atmosphere
+    r2 = ((1 - tau) / (emissivity * tau)) * (R / (np.exp(B / atmospheric_temperature) - F))
+    # Pseudo radiance of the external optics
+    r3 = ((1 - ext_optics_transmission) / (emissivity * tau * ext_optics_transmission)) * (R / (np.exp(B / ext_optics_temperature) - F))
+    return r1 + r2 + r3
+
+
+def radiometric_counts(temperature, J0:float, J1:float, R:float, B:float, F:float,
+                       tau:float, K2:float, emissivity:float) -> np.ndarray:
+    """
+    inverse of radiometric_temperature_lut: Mono16 counts (float64, not rounded) read
+    for an object at temperature [°C] (scalar or array)
+    """
+    temperature_k = np.asarray(temperature, dtype=np.float64) + KELVIN_OFFSET
+    radiance = emissivity * tau * (R / (np.exp(B / temperature_k) - F) + K2)
+    return radiance * J1 + J0
+
+
+def linear_temperature_lut(resolution:float, dtype=np.float32) -> np.ndarray:
+    """
+    Build counts -> temperature [°C] lookup table for TemperatureLinear formats;
+    resolution is 0.01 for 10mK and 0.1 for 100mK.
+    """
+    return (np.arange(MONO16_LEVELS, dtype=np.float64) * resolution - KELVIN_OFFSET).astype(dtype)
+
+
+def temperature_lut(ir_type:int, calibration:dict, dtype=np.float32) -> np.ndarray:
+    """
+    counts -> temperature [°C] table for the given IRFormatType;
+    calibration holds J0, J1, R, B, F, Tau, K2 and emissivity (only needed for RADIOMETRIC)
+    """
+    if ir_type == IRFormatType.LINEAR_10MK:
+        return linear_temperature_lut(0.01, dtype)
+    if ir_type == IRFormatType.LINEAR_100MK:
+        return linear_temperature_lut(0.1, dtype)
+    if ir_type == IRFormatType.RADIOMETRIC:
+        return radiometric_temperature_lut(
+            calibration["J0"], calibration["J1"], calibration["R"], calibration["B"], calibration["F"],
+            calibration["Tau"], calibration["K2"], calibration["emissivity"], dtype
+        )
+    raise ValueError(f"Unknown IR format type: {ir_type}")
+
+
+def convert_counts(lut:np.ndarray, counts:np.ndarray, out:np.ndarray=None) -> np.ndarray:
+    """
+    gather temperatures for Mono16 counts; writes into out when given, so no frame is allocated
+    (mode "clip": uint16 counts are always inside the 65536-entry table, and the default "raise"
+    would gather into a temporary before copying to out)
+    """
+    return np.take(lut, counts, out=out, mode="clip")
@@ -0,0 +1,249 @@
+import numpy as np
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from processing.pixel_correction import WindowedCorrection
+from processing.roi_statistics import ThermalROI
+
+
+class ProfileKind:
+    LINE = "Line"
+    RADIAL = "Radial"
+
+
+@dataclass(frozen=True)
+class ProfileDefinition:
+    """
+    LINE   : samples every step [px] from (x0, y0) to (x1, y1)
+    RADIAL : mean over rings around center (x0, y0), every step [px] from 0 to radius,
+             each ring sampled about once per pixel of its circumference
+    Coordinates are sensor pixels (pixel centers on integers).
+    """
+    name: str
+    kind: str
+    x0: float
+    y0: float
+    x1: float = 0.0
+    y1: float = 0.0
+    radius: float = 0.0
+    step: float = 1.0
+
+
+    @property
+    def geometry(self) -> tuple[float, ...]:
+        if self.kind == ProfileKind.RADIAL:
+            return self.x0, self.y0, self.radius
+        return self.x0, self.y0, self.x1, self.y1
+
+
+    def bounding_roi(self) -> ThermalROI:
+        """
+        rectangle holding every sample, e.g. to include the profile in a sensor window
+        """
+        if self.kind == ProfileKind.RADIAL:
+            x_min, x_max = self.x0 - self.radius, self.x0 + self.radius
+            y_min, y_max = self.y0 - self.radius, self.y0 + self.radius
+        else:
+            x_min, x_max = min(self.x0, self.x1), max(self.x0, self.x1)
+            y_min, y_max = min(self.y0, self.y1), max(self.y0, self.y1)
+        w = int(np.ceil(x_max - x_min)) + 3 # bilinear taps reach one pixel further
+        h = int(np.ceil(y_max - y_min)) + 3
+        return ThermalROI(self.name, int(round((x_min + x_max) / 2)), int(round((y_min + y_max) / 2)), w | 1, h | 1)
+
+
+@dataclass
+class ThermalProfile:
+    name: str
+    seq: int # frame sequence number
+    timestamp: float # frame timestamp
+    kind: str
+    geometry: tuple[float, ...] # ProfileDefinition.geometry the profile was taken with
+    positions: np.ndarray # distance along the line or ring radius [px]
+    values: np.ndarray # °C, NaN where no sample fell inside the frame
+
+
+def sample_points(definition:ProfileDefinition) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    sample coordinates (xs, ys), the output position index of every sample, and the output positions [px]
+    """
+    step = max(definition.step, 1e-3)
+    if definition.kind == ProfileKind.RADIAL:
+        positions = np.arange(0.0, definition.radius + step / 2, step)
+        xs, ys, groups = [], [], []
+        for i, r in enumerate(positions):
+            n_angles = max(1, int(np.ceil(2 * np.pi * r)))
+            angles = np.arange(n_angles) * (2 * np.pi / n_angles)
+            xs.append(definition.x0 + r * np.cos(angles))
+            ys.append(definition.y0 + r * np.sin(angles))
+            groups.append(np.full(n_angles, i))
+        return np.concatenate(xs), np.concatenate(ys), np.concatenate(groups), positions
+    length = float(np.hypot(definition.x1 - definition.x0, definition.y1 - definition.y0))
+    positions = np.arange(0.0, length + step / 2, step)
+    fraction = positions / length if length > 0 else positions
+    xs = definition.x0 + fraction * (definition.x1 - definition.x0)
+    ys = definition.y0 + fraction * (definition.y1 - definition.y0)
+    return xs, ys, np.arange(positions.size), positions
+
+
+class BilinearSampler:
+    """
+    Bilinear interpolation of a fixed set of points in frames of one shape and origin,
+    reduced to a mean per output position. The four neighbor indices and weights of every point
+    are computed once; a frame then costs a gather, a multiply and a sum over 4 x n points.
+    Points outside the frame are dropped. With a pixel correction, the taps are corrected and
+    bad pixels get zero weight (the remaining weights are renormalized).
+    """
+
+    def __init__(self, definition:ProfileDefinition, origin:tuple[int, int], shape:tuple,
+                 correction:Optional[WindowedCorrection]=None):
+        xs, ys, groups, positions = sample_points(definition)
+        height, width = shape
+        xs = xs - origin[0]
+        ys = ys - origin[1]
+        inside = (xs >= 0) & (xs <= width - 1) & (ys >= 0) & (ys <= height - 1)
+        xs, ys, groups = xs[inside], ys[inside], groups[inside]
+        x_left = np.minimum(np.floor(xs).astype(np.intp), width - 2) if width > 1 else np.zeros(xs.size, dtype=np.intp)
+        y_top = np.minimum(np.floor(ys).astype(np.intp), height - 2) if height > 1 else np.zeros(ys.size, dtype=np.intp)
+        fx = xs - x_left
+        fy = ys - y_top
+        x_right = np.minimum(x_left + 1, width - 1)
+        y_bottom = np.minimum(y_top + 1, height - 1)
+        self.indices = np.stack([y_top * width + x_left, y_top * width + x_right,
+                                 y_bottom * width + x_left, y_bottom * width + x_right], axis=1)
+        weights = np.stack([(1 - fx) * (1 - fy), fx * (1 - fy), (1 - fx) * fy, fx * fy], axis=1)
+        self.offset = None
+        self.gain = None
+        if correction is not None and self.indices.size:
+            weights[np.isin(self.indices, correction.bad_pixels)] = 0.0
+            total = weights.sum(axis=1, keepdims=True)
+            valid = total[:, 0] > 0
+            weights = weights[valid] / total[valid]
+            self.indices, groups = self.indices[valid], groups[valid]
+            self.offset = correction.offset.reshape(-1)[self.indices]
+            if correction.gain is not None:
+                self.gain = correction.gain.reshape(-1)[self.indices]
+        self.weights = weights.astype(np.float32)
+        self.groups = groups
+        self.positions = positions
+        counts = np.bincount(groups, minlength=positions.size).astype(np.float64)
+        with np.errstate(divide="ignore"):
+            self._inverse_counts = np.where(counts > 0, 1.0 / counts, np.nan)
+        self._taps = np.empty(self.indices.shape, dtype=np.float32)
+        self._tap_counts = np.empty(self.indices.shape, dtype=np.uint16)
+        self._point_values = np.empty(len(self.indices), dtype=np.float32)
+
+
+    def _reduce(self) -> np.ndarray:
+        taps = self._taps
+        if self.gain is not None:
+            np.multiply(taps, self.gain, out=taps)
+        if self.offset is not None:
+            np.add(taps, self.offset, out=taps)
+        np.multiply(taps, self.weights, out=taps)
+        np.sum(taps, axis=1, out=self._point_values)
+        sums = np.bincount(self.groups, weights=self._point_values, minlength=self.positions.size)
+        return sums * self._inverse_counts
+
+
+    def sample(self, frame:np.ndarray) -> np.ndarray:
+        np.take(frame.reshape(-1), self.indices, out=self._taps, mode="clip")
+        return self._reduce()
+
+
+    def sample_counts(self, counts:np.ndarray, lut:np.ndarray) -> np.ndarray:
+        np.take(counts.reshape(-1), self.indices, out=self._tap_counts, mode="clip")
+        np.take(lut, self._tap_counts, out=self._taps, mode="clip")
+        return self._reduce()
+
+
+class ProfileEngine:
+    """
+    Line and radial temperature profiles of named definitions, computed per frame in the acquisition thread.
+    Samplers are rebuilt only when definitions, origin, frame shape or pixel correction change.
+    Definitions may be changed from any thread; compute() works on a snapshot.
+    Coordinates are sensor pixels; set_origin() gives the sensor position of frame pixel (0, 0).
+    """
+
+    def __init__(self):
+        self._definitions = {}
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._origin = (0, 0)
+        self._sampler_key = None # (definitions, origin, shape, correction) the samplers were built for
+        self._samplers = {}
+
+
+    @property
+    def definitions(self) -> dict[str, ProfileDefinition]:
+        with self._lock:
+            return dict(self._definitions)
+
+
+    @property
+    def latest(self) -> dict[str, ThermalProfile]:
+        """
+        results of the most recent compute(), keyed by profile name
+        """
+        return self._latest
+
+
+    @property
+    def origin(self) -> tuple[int, int]:
+        return self._origin
+
+
+    def set_origin(self, x:int, y:int) -> None:
+        self._origin = (x, y)
+
+
+    def set_line(self, name:str, x0:float, y0:float, x1:float, y1:float, step:float=1.0) -> None:
+        with self._lock:
+            self._definitions[name] = ProfileDefinition(name, ProfileKind.LINE, x0, y0, x1, y1, step=step)
+
+
+    def set_radial(self, name:str, x:float, y:float, radius:float, step:float=1.0) -> None:
+        with self._lock:
+            self._definitions[name] = ProfileDefinition(name, ProfileKind.RADIAL, x, y, radius=radius, step=step)
+
+
+    def remove(self, name:str) -> None:
+        with self._lock:
+            self._definitions.pop(name, None)
+        self._latest = {key: value for key, value in self._latest.items() if key != name}
+
+
+    def _samplers_for(self, shape:tuple, correction:Optional[WindowedCorrection]) -> dict:
+        definitions = self.definitions
+        key = (definitions, self._origin, shape, correction)
+        if self._sampler_key != key:
+            self._samplers = {name: (definition, BilinearSampler(definition, self._origin, shape, correction))
+                              for name, definition in definitions.items()}
+            self._sampler_key = key
+        return self._samplers
+
+
+    def _publish(self, samplers:dict, values:dict, seq:int, timestamp:float) -> dict[str, ThermalProfile]:
+        self._latest = {
+            name: ThermalProfile(name, seq, timestamp, definition.kind, definition.geometry, sampler.positions, values[name])
+            for name, (definition, sampler) in samplers.items()
+        }
+        return self._latest
+
+
+    def compute(self, frame:np.ndarray, seq:int=-1, timestamp:float=0.0) -> dict[str, ThermalProfile]:
+        """
+        profiles of a converted (and already corrected) frame [°C]
+        """
+        samplers = self._samplers_for(frame.shape, None)
+        values = {name: sampler.sample(frame) for name, (_, sampler) in samplers.items()}
+        return self._publish(samplers, values, seq, timestamp)
+
+
+    def compute_counts(self, counts:np.ndarray, lut:np.ndarray, seq:int=-1, timestamp:float=0.0,
+                       correction:Optional[WindowedCorrection]=None) -> dict[str, ThermalProfile]:
+        """
+        profiles from raw Mono16 counts, converting only the sampled pixels through lut (counts -> °C)
+        """
+        samplers = self._samplers_for(counts.shape, correction)
+        values = {name: sampler.sample_counts(counts, lut) for name, (_, sampler) in samplers.items()}
+        return self._publish(samplers, values, seq, timestamp)
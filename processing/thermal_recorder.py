@@ -0,0 +1,287 @@
+import numpy as np
+import csv
+import yaml
+import queue
+import threading
+import logging
+from pathlib import Path
+from typing import Optional
+from processing.thermal_conversion import temperature_lut, convert_counts
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ENCODING = "utf-8"
+RAW_DTYPE = np.uint16 # Mono16
+FRAMES_PER_CHUNK = 256 # 640x480 Mono16 -> 150 MB per chunk file
+QUEUE_SIZE = 64 # raw frame buffers in flight between acquisition and writer thread
+METADATA_FILENAME = "metadata.yml"
+INDEX_FILENAME = "index.csv"
+INDEX_FIELDS = ["frame_number", "timestamp", "chunk", "position", "camera_frame_id", "camera_timestamp"]
+
+
+def chunk_filename(chunk:int) -> str:
+    return f"chunk_{chunk:05d}.u16"
+
+
+class ThermalMovieRecorder:
+    """
+    Streams raw Mono16 frames into append-only chunk files (np.memmap) on a background thread.
+    Sidecar files:
+        metadata.yml : frame shape, dtype, frames per chunk, calibration constants and the
+                       sensor window (offset_x, offset_y, width, height) the frames were read from
+        index.csv    : frame number, host timestamp, chunk and position of every recorded frame,
+                       plus camera frame ID and camera timestamp (-1 without chunk data)
+    The acquisition thread never waits for the disk: it takes a buffer from a preallocated pool
+    with acquire_buffer(), fills it and hands it over with submit(). When the writer falls behind
+    and the pool is empty, acquire_buffer() returns None and the frame is counted as dropped.
+    A frame still in flight when stop() is called cannot be written any more: submit() returns its
+    buffer to the pool and counts it as dropped too.
+    """
+
+    def __init__(self, folder, shape:tuple, calibration:dict,
+                 frames_per_chunk:int=FRAMES_PER_CHUNK, queue_size:int=QUEUE_SIZE, window:Optional[tuple]=None):
+        self._folder = Path(folder)
+        self._shape = tuple(shape)
+        self._window = window if window is not None else (0, 0, self._shape[1], self._shape[0])
+        self._calibration = calibration
+        self._frames_per_chunk = frames_per_chunk
+        self._free_buffers = queue.Queue()
+        for _ in range(queue_size):
+            self._free_buffers.put(np.empty(self._shape, dtype=RAW_DTYPE))
+        self._pending = queue.Queue()
+        self._lock = threading.Lock() # orders submit() against the stop sentinel
+        self._stopped = False
+        self._thread = None
+        self._recorded_frames = 0
+        self._dropped_frames = 0
+        self._chunk = -1
+        self._chunk_map = None
+        self._position = 0
+
+
+    @property
+    def folder(self) -> Path:
+        return self._folder
+
+
+    @property
+    def recording(self) -> bool:
+        return self._thread is not None
+
+
+    @property
+    def recorded_frames(self) -> int:
+        return self._recorded_frames
+
+
+    @property
+    def dropped_frames(self) -> int:
+        return self._dropped_frames
+
+
+    def start(self) -> None:
+        self._folder.mkdir(parents=True, exist_ok=True)
+        meta_data = {
+            "shape": list(self._shape),
+            "dtype": np.dtype(RAW_DTYPE).name,
+            "frames_per_chunk": self._frames_per_chunk,
+            "calibration": self._calibration,
+            "window": [int(v) for v in self._window],
+        }
+        with open(self._folder / METADATA_FILENAME, "w", encoding=ENCODING) as f_yml:
+            yaml.dump(meta_data, f_yml, allow_unicode=True)
+        self._index_file = open(self._folder / INDEX_FILENAME, "w", newline="", encoding=ENCODING)
+        self._index_writer = csv.writer(self._index_file)
+        self._index_writer.writerow(INDEX_FIELDS)
+        self._thread = threading.Thread(target=self._run, name="ThermalMovieRecorder", daemon=True)
+        self._thread.start()
+        logging.info(f"Thermal movie recording started: {self._folder}")
+
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        with self._lock:
+            self._stopped = True
+            self._pending.put(None)
+        self._thread.join()
+        self._thread = None
+        self._close_chunk()
+        self._index_file.close()
+        logging.info(f"Thermal movie recording stopped: {self._recorded_frames} frames, {self._dropped_frames} dropped")
+
+
+    def acquire_buffer(self) -> Optional[np.ndarray]:
+        """
+        free raw frame buffer for the producer, None (frame dropped) if the writer is behind
+        """
+        try:
+            return self._free_buffers.get_nowait()
+        except queue.Empty:
+            self._dropped_frames += 1
+            return None
+
+
+    def submit(self, buffer:np.ndarray, frame_number:int, timestamp:float,
+               camera_frame_id:int=-1, camera_timestamp:int=-1) -> None:
+        """
+        hand a filled buffer over to the writer thread; the producer must not touch it afterwards.
+        After stop() the frame is dropped
+        """
+        with self._lock:
+            if not self._stopped:
+                self._pending.put((buffer, frame_number, timestamp, camera_frame_id, camera_timestamp))
+                return
+            self._dropped_frames += 1
+        self._free_buffers.put(buffer)
+
+
+    def discard(self, buffer:np.ndarray) -> None:
+        """
+        return an unused buffer to the pool
+        """
+        self._free_buffers.put(buffer)
+
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            buffer, frame_number, *index_fields = item
+            try:
+                self._write(buffer, frame_number, *index_fields)
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to write thermal frame {frame_number}: {e}")
+            finally:
+                self._free_buffers.put(buffer)
+
+
+    def _write(self, buffer:np.ndarray, frame_number:int, timestamp:float,
+               camera_frame_id:int, camera_timestamp:int) -> None:
+        if self._chunk_map is None or self._position == self._frames_per_chunk:
+            self._open_chunk(self._chunk + 1)
+        self._chunk_map[self._position] = buffer
+        self._index_writer.writerow([frame_number, repr(timestamp), self._chunk, self._position,
+                                     camera_frame_id, camera_timestamp])
+        self._position += 1
+        self._recorded_frames += 1
+
+
+    def _open_chunk(self, chunk:int) -> None:
+        self._close_chunk()
+        self._chunk = chunk
+        self._position = 0
+        self._chunk_map = np.memmap(self._folder / chunk_filename(chunk), dtype=RAW_DTYPE, mode="w+",
+                                    shape=(self._frames_per_chunk, *self._shape))
+
+
+    def _close_chunk(self) -> None:
+        if self._chunk_map is None:
+            return
+        self._chunk_map.flush()
+        self._chunk_map = None # unmaps the file, no views of it are handed out
+        # drop the unused, preallocated tail of the last chunk
+        frame_bytes = int(np.prod(self._shape)) * np.dtype(RAW_DTYPE).itemsize
+        with open(self._folder / chunk_filename(self._chunk), "r+b") as f:
+            f.truncate(self._position * frame_bytes)
+        self._index_file.flush()
+
+
+class ThermalMovieReader:
+    """
+    Lazy access to a movie written by ThermalMovieRecorder.
+    Chunk files are memory mapped on first use, so only the frames actually touched are read.
+    """
+
+    def __init__(self, folder):
+        self._folder = Path(folder)
+        with open(self._folder / METADATA_FILENAME, "r", encoding=ENCODING) as f_yml:
+            meta_data = yaml.safe_load(f_yml)
+        self._shape = tuple(meta_data["shape"])
+        self._dtype = np.dtype(meta_data["dtype"])
+        self._calibration = meta_data["calibration"]
+        self._window = tuple(meta_data.get("window", (0, 0, self._shape[1], self._shape[0])))
+        index = np.loadtxt(self._folder / INDEX_FILENAME, delimiter=",", skiprows=1, ndmin=2)
+        self._frame_numbers = index[:, 0].astype(np.int64)
+        self._timestamps = index[:, 1]
+        self._chunks = index[:, 2].astype(np.int64)
+        self._positions = index[:, 3].astype(np.int64)
+        self._camera_frame_ids = index[:, 4].astype(np.int64)
+        self._chunk_maps = {}
+        self._lut = None
+
+
+    def __len__(self) -> int:
+        return len(self._frame_numbers)
+
+
+    @property
+    def shape(self) -> tuple:
+        return self._shape
+
+
+    @property
+    def calibration(self) -> dict:
+        return self._calibration
+
+
+    @property
+    def window(self) -> tuple:
+        """
+        (offset_x, offset_y, width, height) of the sensor area in the frames
+        """
+        return self._window
+
+
+    @property
+    def frame_numbers(self) -> np.ndarray:
+        return self._frame_numbers
+
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps
+
+
+    @property
+    def camera_frame_ids(self) -> np.ndarray:
+        return self._camera_frame_ids
+
+
+    def _chunk_map(self, chunk:int) -> np.memmap:
+        if chunk not in self._chunk_maps:
+            path = self._folder / chunk_filename(chunk)
+            frame_bytes = int(np.prod(self._shape)) * self._dtype.itemsize
+            n_frames = path.stat().st_size // frame_bytes
+            self._chunk_maps[chunk] = np.memmap(path, dtype=self._dtype, mode="r", shape=(n_frames, *self._shape))
+        return self._chunk_maps[chunk]
+
+
+    def __getitem__(self, i:int) -> np.ndarray:
+        """
+        raw counts of the i-th recorded frame (memory-mapped view)
+        """
+        return self._chunk_map(int(self._chunks[i]))[self._positions[i]]
+
+
+    def frames(self, start:int, stop:int) -> np.ndarray:
+        """
+        raw counts of recorded frames [start, stop); a view when the range lies within one chunk
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if stop <= start:
+            return np.empty((0, *self._shape), dtype=self._dtype)
+        first_chunk, last_chunk = self._chunks[start], self._chunks[stop - 1]
+        if first_chunk == last_chunk:
+            return self._chunk_map(int(first_chunk))[self._positions[start]:self._positions[stop - 1] + 1]
+        return np.stack([self[i] for i in range(start, stop)])
+
+
+    def temperature(self, i:int, out:Optional[np.ndarray]=None) -> np.ndarray:
+        """
+        i-th recorded frame in °C, converted with the calibration saved alongside the movie
+        """
+        if self._lut is None:
+            self._lut = temperature_lut(self._calibration["ir_type"], self._calibration)
+        return convert_counts(self._lut, self[i], out=out)
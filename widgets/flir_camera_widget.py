@@ -1,31 +1,43 @@
 from PyQt6.QtWidgets import (
     QGroupBox, QPushButton, QLabel, QVBoxLayout, QHBoxLayout,
-    QSpinBox, QFormLayout, QComboBox
+    QSpinBox, QFormLayout, QComboBox, QDoubleSpinBox, QCheckBox, QFileDialog
 )
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal
+from PyQt6.QtGui import QGuiApplication, QFontDatabase
 from devices.flir_camera_controller import FlirCameraController
-from matplotlib.backends.backend_qtagg import (
-    FigureCanvasQTAgg as FigureCanvas,
-    NavigationToolbar2QT as NavigationToolbar
-)
-from matplotlib import patches
-from matplotlib.figure import Figure
+from processing.frame_ring_buffer import FrameRingBuffer
+from processing.roi_statistics import ROIStatisticsEngine, ROIStatistics
+from processing.thermal_recorder import ThermalMovieRecorder
+from processing.temporal_averaging import TemporalAverager, AveragingMode, MAX_BOXCAR_FRAMES
+from processing.sensor_window import roi_bounding_window
+from processing.sample_tracker import SampleTracker
+from processing.cooling_rate import CoolingRateMap
+from processing.pixel_correction import PixelCorrection, FlatFieldCapture
+from processing.robust_estimators import ESTIMATORS
+from processing.thermal_profiles import ProfileEngine, ProfileKind, ThermalProfile
+from processing.thermal_conversion import convert_counts
+from widgets.thermal_image_view import ThermalImageView, COLORMAPS, ROI_COLORS, PROFILE_COLORS
+import pyqtgraph as pg
 import numpy as np
 import logging
 from typing import Optional
+from pathlib import Path
+from datetime import datetime
 import time
+import threading
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-
-def average_around_center(image:np.ndarray, x:int, y:int, w:int, h:int) -> float:
-        half_w = w // 2
-        half_h = h // 2
-        x_start = max(x - half_w, 0)
-        x_end = min(x + half_w + 1, image.shape[1])
-        y_start = max(y - half_h, 0)
-        y_end = min(y + half_h + 1, image.shape[0])
-        return np.mean(image[y_start:y_end, x_start:x_end])
+FRAME_BUFFER_CAPACITY = 64 # frames kept for consumers reading slower than the camera
+DEFAULT_REFRESH_RATE = 60 # Hz, used when the screen does not report its refresh rate
+PROBE_SIZE = 5 # px, width and height of a newly added probe
+STATS_REFRESH_INTERVAL = 1000 # ms
+WINDOW_MARGIN = 16 # px around the ROIs kept in the sensor window
+LAYER_TEMPERATURE = "Temperature [°C]"
+LAYER_COOLING_RATE = "dT/dt [K/min]"
+COOLING_RATE_REFRESH_INTERVAL = 0.5 # sec, the map changes slowly and costs a few whole-frame passes to read
+LINE_PROFILE_HALF_LENGTH = 60 # px, initial line across the sample
+RADIAL_PROFILE_RADIUS = 40 # px, initial circle around the sample
 
 
 class FlirCameraWidget(QGroupBox):
@@ -34,30 +46,112 @@ class FlirCameraWidget(QGroupBox):
     Using Spinnaker SDK (python ver 3.10)
     """
 
-    def __init__(self, parent=None, polling_interval=0.5):
+    def __init__(self, parent=None, polling_interval=0.5, controller=None):
+        """
+        controller defaults to FlirCameraController; pass a SimulatedFlirCameraController to run without a camera
+        """
         super().__init__("FLIR Camera Control", parent)
         self.controller = None
-        self.polling_thread = None
+        self.acquisition_thread = None
+        self.frame_buffer = FrameRingBuffer(FRAME_BUFFER_CAPACITY)
+        self.roi_engine = ROIStatisticsEngine() # evaluated on every frame in the acquisition thread
+        self.profile_engine = ProfileEngine() # line/radial profiles, evaluated on every frame as well
+        self.recorder = None
+        self.averager = TemporalAverager() # applied to every frame before display and ROI statistics
+        self.tracker = SampleTracker() # moves the sample ROI onto the sample on every frame while enabled
+        self.cooling_rate = CoolingRateMap() # per-pixel dT/dt, accumulated from every full frame while enabled
+        self.pixel_correction = None # PixelCorrection of the connected camera, cached per serial number
+        self._cooling_rate_image = None
+        self._cooling_rate_time = 0.0
+        self._probe_count = 0
+        self._displayed_frame = None # pinned in frame_buffer until the next frame replaces it on screen
         self._polling_interval = polling_interval
-        self.controller = FlirCameraController()
-        self.canvas = ThermalImageCanvas(self)
-        self.toolbar = NavigationToolbar(self.canvas, self)
+        self.controller = controller if controller is not None else FlirCameraController()
+        # display is a consumer of frame_buffer and refreshes at its own rate
+        self.display_timer = QTimer(self)
+        self.display_timer.timeout.connect(self.refresh_display)
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.image_view = ThermalImageView(self, metrics=self.controller.metrics)
+        self.image_view.roi_moved.connect(self.on_roi_moved)
+        self.image_view.profile_moved.connect(self.on_profile_moved)
+        self.profile_plot = pg.PlotWidget()
+        self.profile_plot.setLabel("bottom", "Distance / Radius [px]")
+        self.profile_plot.setLabel("left", "Temperature [°C]")
+        self.profile_plot.addLegend()
+        self.profile_plot.setVisible(False)
+        self.profile_curves = {}
 
         # UI Elements
         self.connect_btn = QPushButton("Connect")
         self.connect_btn.clicked.connect(self.toggle_connect)
 
         self.library_version_label = QLabel(self.controller.library_version)
-        self.emissivity_label = QLabel("---")
+        self.emissivity_spin = QDoubleSpinBox()
+        self.emissivity_spin.setRange(0.01, 1.0)
+        self.emissivity_spin.setSingleStep(0.01)
+        self.emissivity_spin.setDecimals(2)
+        self.emissivity_spin.setEnabled(False)
+        self.emissivity_spin.editingFinished.connect(self.set_emissivity) # rebuilding lookup table on every step is wasteful
 
         self.stream_btn = QPushButton("Start Stream")
         self.stream_btn.clicked.connect(self.toggle_stream)
         self.stream_btn.setEnabled(False)
+        self.window_check = QCheckBox("Crop Sensor to ROIs")
+        self.window_check.setToolTip("Read out only the bounding box of the ROIs (applied when the stream starts; ROIs are locked while streaming)")
+        self.roi_only_check = QCheckBox("Convert ROIs Only")
+        self.roi_only_check.setToolTip("Convert only ROI pixels to temperature; full frames are converted only while the image is on screen (no temporal averaging)")
+        self.roi_only_check.toggled.connect(self.set_roi_only)
+
+        self.averaging_combo = QComboBox()
+        self.averaging_combo.addItems([AveragingMode.OFF, AveragingMode.BOXCAR, AveragingMode.EMA])
+        self.averaging_combo.currentTextChanged.connect(self.set_averaging)
+        self.averaging_frames_spin = QSpinBox()
+        self.averaging_frames_spin.setRange(2, MAX_BOXCAR_FRAMES)
+        self.averaging_frames_spin.setValue(8)
+        self.averaging_frames_spin.setSuffix(" frames")
+        self.averaging_frames_spin.setToolTip("Boxcar window length, or EMA time constant (alpha = 1 / frames)")
+        self.averaging_frames_spin.valueChanged.connect(self.set_averaging)
+
+        self.record_btn = QPushButton("Record Movie")
+        self.record_btn.clicked.connect(self.toggle_record)
+        self.record_btn.setEnabled(False)
+        self.record_status_label = QLabel("---")
 
         self.cmap_combo = QComboBox()
-        self.cmap_combo.addItems(["viridis", "plasma", "inferno", "magma", "cividis"])
+        self.cmap_combo.addItems(COLORMAPS)
         self.cmap_combo.setCurrentIndex(0)
-        self.cmap_combo.currentTextChanged.connect(self.canvas.change_cmap)
+        self.cmap_combo.currentTextChanged.connect(self.image_view.change_cmap)
+
+        self.layer_combo = QComboBox()
+        self.layer_combo.addItems([LAYER_TEMPERATURE, LAYER_COOLING_RATE])
+        self.layer_combo.currentTextChanged.connect(self.change_layer)
+        self.cooling_rate_check = QCheckBox("Accumulate dT/dt")
+        self.cooling_rate_check.setToolTip("Fit temperature against time per pixel from every full frame (raw, before temporal averaging)")
+        self.cooling_rate_check.toggled.connect(self.set_cooling_rate)
+        self.reset_cooling_rate_btn = QPushButton("Reset dT/dt")
+        self.reset_cooling_rate_btn.clicked.connect(self.cooling_rate.reset)
+        self.export_cooling_rate_btn = QPushButton("Export dT/dt...")
+        self.export_cooling_rate_btn.clicked.connect(self.export_cooling_rate)
+        self.cooling_rate_status_label = QLabel("---")
+
+        self.pixel_correction_check = QCheckBox("Correct Pixels")
+        self.pixel_correction_check.setToolTip("Apply the flat-field gain/offset and replace bad pixels by their neighbors")
+        self.pixel_correction_check.setEnabled(False)
+        self.pixel_correction_check.toggled.connect(self.set_pixel_correction)
+        self.capture_flat_field_btn = QPushButton("Capture Flat Field")
+        self.capture_flat_field_btn.setToolTip("Point the camera at a uniform scene (e.g. lens cap); needs a full-sensor stream")
+        self.capture_flat_field_btn.clicked.connect(lambda: self.capture_flat_field(False))
+        self.capture_flat_field_btn.setEnabled(False)
+        self.capture_gain_reference_btn = QPushButton("Capture Gain Reference")
+        self.capture_gain_reference_btn.setToolTip("Second uniform scene at another temperature, for a per-pixel gain")
+        self.capture_gain_reference_btn.clicked.connect(lambda: self.capture_flat_field(True))
+        self.capture_gain_reference_btn.setEnabled(False)
+        self.pixel_correction_status_label = QLabel("---")
+
+        self.auto_levels_check = QCheckBox("Auto Levels")
+        self.auto_levels_check.setChecked(True)
+        self.auto_levels_check.toggled.connect(self.image_view.set_auto_levels)
 
         self.temperature_sample_label = QLabel("---")
         self.sample_x_spin = QSpinBox()
@@ -77,6 +171,15 @@ class FlirCameraWidget(QGroupBox):
         self.sample_w_spin.valueChanged.connect(self.move_rect)
         self.sample_h_spin.valueChanged.connect(self.move_rect)
 
+        self.sample_estimator_combo = QComboBox()
+        self.sample_estimator_combo.addItems(ESTIMATORS)
+        self.sample_estimator_combo.setToolTip("Median and clipped means ignore a few reflections or bad pixels in the ROI")
+        self.sample_estimator_combo.currentTextChanged.connect(lambda estimator: self.roi_engine.set_estimator("sample", estimator))
+
+        self.track_sample_check = QCheckBox("Track Sample")
+        self.track_sample_check.setToolTip("Move the sample ROI onto the warmest or coldest spot near it on every frame")
+        self.track_sample_check.toggled.connect(self.set_tracking)
+
         self.temperature_reference_label = QLabel("---")
         self.reference_x_spin = QSpinBox()
         self.reference_y_spin = QSpinBox()
@@ -94,6 +197,29 @@ class FlirCameraWidget(QGroupBox):
         self.reference_y_spin.valueChanged.connect(self.move_rect)
         self.reference_w_spin.valueChanged.connect(self.move_rect)
         self.reference_h_spin.valueChanged.connect(self.move_rect)
+        self.reference_estimator_combo = QComboBox()
+        self.reference_estimator_combo.addItems(ESTIMATORS)
+        self.reference_estimator_combo.currentTextChanged.connect(lambda estimator: self.roi_engine.set_estimator("reference", estimator))
+
+        self.line_profile_check = QCheckBox("Line Profile")
+        self.line_profile_check.setToolTip("Temperature along a line (drag its ends on the image)")
+        self.line_profile_check.toggled.connect(self.set_line_profile)
+        self.radial_profile_check = QCheckBox("Radial Profile")
+        self.radial_profile_check.setToolTip("Mean temperature on rings around the circle center, out to its radius")
+        self.radial_profile_check.toggled.connect(self.set_radial_profile)
+
+        self.add_probe_btn = QPushButton("Add Probe")
+        self.add_probe_btn.clicked.connect(self.add_probe)
+        self.clear_probes_btn = QPushButton("Clear Probes")
+        self.clear_probes_btn.clicked.connect(self.clear_probes)
+        self.probe_label = QLabel("")
+
+        self.stats_label = QLabel("")
+        self.stats_label.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        self.reset_stats_btn = QPushButton("Reset Stats")
+        self.reset_stats_btn.clicked.connect(self.reset_stats)
+        self.export_stats_btn = QPushButton("Export Stats...")
+        self.export_stats_btn.clicked.connect(self.export_stats)
 
         self.rect_spin_enabled(False)
 
@@ -107,11 +233,43 @@ class FlirCameraWidget(QGroupBox):
         layout.addWidget(self.connect_btn)
 
         info_form = QFormLayout()
-        info_form.addRow("Emissivity:", self.emissivity_label)
+        info_form.addRow("Emissivity:", self.emissivity_spin)
         layout.addLayout(info_form)
         
         layout.addWidget(self.stream_btn)
-        layout.addWidget(self.cmap_combo)
+        layout.addWidget(self.window_check)
+        layout.addWidget(self.roi_only_check)
+        record_form = QFormLayout()
+        record_form.addRow(self.record_btn)
+        record_form.addRow("Recorded Frames:", self.record_status_label)
+        layout.addLayout(record_form)
+        averaging_form = QFormLayout()
+        averaging_hbox = QHBoxLayout()
+        averaging_hbox.addWidget(self.averaging_combo)
+        averaging_hbox.addWidget(self.averaging_frames_spin)
+        averaging_form.addRow("Temporal Averaging:", averaging_hbox)
+        layout.addLayout(averaging_form)
+        display_hbox = QHBoxLayout()
+        display_hbox.addWidget(self.layer_combo)
+        display_hbox.addWidget(self.cmap_combo)
+        display_hbox.addWidget(self.auto_levels_check)
+        layout.addLayout(display_hbox)
+        cooling_rate_form = QFormLayout()
+        cooling_rate_hbox = QHBoxLayout()
+        cooling_rate_hbox.addWidget(self.cooling_rate_check)
+        cooling_rate_hbox.addWidget(self.reset_cooling_rate_btn)
+        cooling_rate_hbox.addWidget(self.export_cooling_rate_btn)
+        cooling_rate_form.addRow(cooling_rate_hbox)
+        cooling_rate_form.addRow("dT/dt Fit:", self.cooling_rate_status_label)
+        layout.addLayout(cooling_rate_form)
+        pixel_correction_form = QFormLayout()
+        pixel_correction_hbox = QHBoxLayout()
+        pixel_correction_hbox.addWidget(self.pixel_correction_check)
+        pixel_correction_hbox.addWidget(self.capture_flat_field_btn)
+        pixel_correction_hbox.addWidget(self.capture_gain_reference_btn)
+        pixel_correction_form.addRow(pixel_correction_hbox)
+        pixel_correction_form.addRow("Pixel Correction:", self.pixel_correction_status_label)
+        layout.addLayout(pixel_correction_form)
 
         sample_form = QFormLayout()
         sample_form.addRow("Sample Temperature:", self.temperature_sample_label)
@@ -119,6 +277,8 @@ class FlirCameraWidget(QGroupBox):
         sample_form.addRow("Y:", self.sample_y_spin)
         sample_form.addRow("Width:", self.sample_w_spin)
         sample_form.addRow("Height:", self.sample_h_spin)
+        sample_form.addRow("Estimator:", self.sample_estimator_combo)
+        sample_form.addRow(self.track_sample_check)
 
         reference_form = QFormLayout()
         reference_form.addRow("Reference Temperature:", self.temperature_reference_label)
@@ -126,15 +286,38 @@ class FlirCameraWidget(QGroupBox):
         reference_form.addRow("Y:", self.reference_y_spin)
         reference_form.addRow("Width:", self.reference_w_spin)
         reference_form.addRow("Height:", self.reference_h_spin)
+        reference_form.addRow("Estimator:", self.reference_estimator_combo)
 
         hbox = QHBoxLayout()
         hbox.addLayout(sample_form)
         hbox.addLayout(reference_form)
 
         layout.addLayout(hbox)
-        layout.addWidget(self.canvas)
-        layout.addWidget(self.toolbar)
+
+        probe_hbox = QHBoxLayout()
+        probe_hbox.addWidget(self.add_probe_btn)
+        probe_hbox.addWidget(self.clear_probes_btn)
+        layout.addLayout(probe_hbox)
+        layout.addWidget(self.probe_label)
+        profile_hbox = QHBoxLayout()
+        profile_hbox.addWidget(self.line_profile_check)
+        profile_hbox.addWidget(self.radial_profile_check)
+        layout.addLayout(profile_hbox)
+
+        stats_box = QGroupBox("Pipeline Statistics")
+        stats_layout = QVBoxLayout()
+        stats_layout.addWidget(self.stats_label)
+        stats_hbox = QHBoxLayout()
+        stats_hbox.addWidget(self.reset_stats_btn)
+        stats_hbox.addWidget(self.export_stats_btn)
+        stats_layout.addLayout(stats_hbox)
+        stats_box.setLayout(stats_layout)
+        layout.addWidget(stats_box)
+
+        layout.addWidget(self.image_view)
+        layout.addWidget(self.profile_plot)
         self.setLayout(layout)
+        self.move_rect()
     
 
     def toggle_connect(self):
@@ -148,15 +331,32 @@ class FlirCameraWidget(QGroupBox):
                 return
         else:
             # disconnect
+            self.stop_acquisition()
             self.controller.disconnect()
+            self.stream_btn.setText("Start Stream")
             self.connect_btn.setText("Connect")
             self.rect_spin_enabled(False)
             self.stream_btn.setEnabled(False)
+            self.emissivity_spin.setEnabled(False)
+            self.pixel_correction = None
+            self.update_pixel_correction_status()
         if self.controller.camera_connected:
             self.connect_btn.setText("Disconnect")
             self.rect_spin_enabled(True)
             self.stream_btn.setEnabled(True)
-            self.emissivity_label.setText(f"{self.controller.emissivity}")
+            self.emissivity_spin.blockSignals(True)
+            self.emissivity_spin.setValue(self.controller.emissivity)
+            self.emissivity_spin.blockSignals(False)
+            self.emissivity_spin.setEnabled(True)
+            self.load_pixel_correction()
+    
+
+    def set_emissivity(self):
+        if not self.controller.camera_connected:
+            return
+        new_emissivity = self.emissivity_spin.value()
+        if new_emissivity != self.controller.emissivity:
+            self.controller.emissivity = new_emissivity
     
 
     def toggle_stream(self):
@@ -165,25 +365,263 @@ class FlirCameraWidget(QGroupBox):
         if not self.controller.streaming:
             # start stream
             try:
+                windowed = self.window_check.isChecked()
+                regions = list(self.roi_engine.rois.values()) + [
+                    definition.bounding_roi() for definition in self.profile_engine.definitions.values()
+                ]
+                self.controller.set_window(roi_bounding_window(regions, WINDOW_MARGIN) if windowed else None)
                 self.controller.start_stream()
+                if self.controller.window is not None:
+                    offset_x, offset_y = self.controller.window[:2]
+                    self.roi_engine.set_origin(offset_x, offset_y)
+                    self.profile_engine.set_origin(offset_x, offset_y)
+                    self.image_view.set_origin(offset_x, offset_y)
+                # ROIs moved outside the window would have no pixels, so they stay put while windowed
+                self.set_roi_editing(not windowed)
+                self.window_check.setEnabled(False)
                 self.stream_btn.setText("Stop Stream")
-                self.polling_thread = FlirCameraPollingThread(self.controller, interval=self._polling_interval)
-                self.polling_thread.updated.connect(self.update)
-                self.polling_thread.start()
+                self.averager.reset()
+                self.acquisition_thread = FlirCameraAcquisitionThread(self.controller, self.frame_buffer, self.roi_engine,
+                                                                      self.averager, self.tracker, self.cooling_rate,
+                                                                      self.profile_engine)
+                self.acquisition_thread.roi_only = self.roi_only_check.isChecked()
+                self.acquisition_thread.flat_field_captured.connect(self.on_flat_field_captured)
+                self.set_pixel_correction(self.pixel_correction_check.isChecked())
+                self.acquisition_thread.start()
+                # references are kept in full-sensor coordinates
+                self.capture_flat_field_btn.setEnabled(self.controller.full_sensor)
+                self.capture_gain_reference_btn.setEnabled(self.controller.full_sensor and self.pixel_correction is not None)
+                self.display_timer.start(self.display_period_ms())
+                self.stats_timer.start(STATS_REFRESH_INTERVAL)
+                self.record_btn.setEnabled(True)
             except Exception as e:
                 logging.error(f"Failed to start stream: {e}")
         else:
             # stop stream
             try:
-                if not self.polling_thread is None:
-                    self.polling_thread.stop()
-                    self.polling_thread = None
+                self.stop_acquisition()
                 self.controller.stop_stream()
                 self.stream_btn.setText("Start Stream")
             except Exception as e:
                 logging.error(f"Failed to stop stream: {e}")
     
 
+    def stop_acquisition(self):
+        self.set_roi_editing(True)
+        self.window_check.setEnabled(True)
+        self.display_timer.stop()
+        self.stats_timer.stop()
+        self.update_stats()
+        self.stop_record()
+        self.record_btn.setEnabled(False)
+        self.capture_flat_field_btn.setEnabled(False)
+        self.capture_gain_reference_btn.setEnabled(False)
+        if not self.acquisition_thread is None:
+            self.acquisition_thread.stop()
+            self.acquisition_thread = None
+        self.update_pixel_correction_status() # drops a capture in progress
+        self.frame_buffer.release(self._displayed_frame)
+        self._displayed_frame = None
+
+
+    def set_roi_only(self, enabled:bool):
+        if self.acquisition_thread is not None:
+            self.acquisition_thread.roi_only = enabled
+        # averaging needs every full frame, which this mode no longer converts
+        self.averaging_combo.setEnabled(not enabled)
+        self.averaging_frames_spin.setEnabled(not enabled)
+        if enabled:
+            self.averager.configure(AveragingMode.OFF, self.averaging_frames_spin.value())
+        else:
+            self.set_averaging()
+
+
+    def set_tracking(self, enabled:bool):
+        self.tracker.enabled = enabled
+        connected = self.controller.camera_connected
+        self.sample_x_spin.setEnabled(connected and not enabled)
+        self.sample_y_spin.setEnabled(connected and not enabled)
+
+
+    def set_cooling_rate(self, enabled:bool):
+        self.cooling_rate.reset()
+        self.cooling_rate.enabled = enabled
+
+
+    def change_layer(self, layer:str):
+        self.image_view.reset_levels() # temperature and rate levels have nothing in common
+        self._cooling_rate_time = 0.0
+
+
+    def export_cooling_rate(self):
+        if self.cooling_rate.frame_count < 2:
+            logging.warning("No dT/dt map to export yet")
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export dT/dt Map", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_cooling_rate.csv", "CSV files (*.csv)"
+        )
+        if not path:
+            return
+        try:
+            if self.cooling_rate.export(path, self.controller.window):
+                logging.info(f"dT/dt map exported to {path}")
+        except OSError as e:
+            logging.error(f"Failed to export dT/dt map: {e}")
+
+
+    def load_pixel_correction(self):
+        serial_number = self.controller.serial_number
+        self.pixel_correction = PixelCorrection.load(serial_number) if serial_number else None
+        self.pixel_correction_check.setChecked(self.pixel_correction is not None)
+        self.update_pixel_correction_status()
+
+
+    def set_pixel_correction(self, enabled:bool):
+        if self.acquisition_thread is None:
+            return
+        correction = self.pixel_correction if enabled else None
+        sensor_shape = self.controller.sensor_shape
+        if correction is not None and sensor_shape is not None and correction.shape != tuple(sensor_shape):
+            logging.warning(f"Pixel correction is for a {correction.shape} sensor, camera streams {sensor_shape}; not applied")
+            correction = None
+        self.acquisition_thread.pixel_correction = correction
+
+
+    def capture_flat_field(self, gain_reference:bool):
+        if self.acquisition_thread is None:
+            return
+        self.acquisition_thread.flat_field_capture = FlatFieldCapture(second_reference=gain_reference)
+        self.capture_flat_field_btn.setEnabled(False)
+        self.capture_gain_reference_btn.setEnabled(False)
+        self.pixel_correction_status_label.setText("Capturing gain reference..." if gain_reference else "Capturing flat field...")
+
+
+    def on_flat_field_captured(self, capture:FlatFieldCapture):
+        serial_number = self.controller.serial_number or "unknown"
+        sensor_shape = self.controller.sensor_shape
+        if sensor_shape is not None and capture.mean.shape != tuple(sensor_shape):
+            logging.error("Flat field must be captured from full-sensor frames")
+        elif capture.second_reference and self.pixel_correction is not None:
+            self.pixel_correction = self.pixel_correction.with_gain_reference(capture)
+        else:
+            self.pixel_correction = PixelCorrection.from_flat_field(serial_number, capture)
+        if self.pixel_correction is not None:
+            try:
+                self.pixel_correction.save()
+            except OSError as e:
+                logging.error(f"Failed to save pixel correction: {e}")
+        self.pixel_correction_check.setChecked(self.pixel_correction is not None)
+        self.set_pixel_correction(self.pixel_correction_check.isChecked())
+        streaming_full_sensor = self.acquisition_thread is not None and self.controller.full_sensor
+        self.capture_flat_field_btn.setEnabled(streaming_full_sensor)
+        self.capture_gain_reference_btn.setEnabled(streaming_full_sensor and self.pixel_correction is not None)
+        self.update_pixel_correction_status()
+
+
+    def update_pixel_correction_status(self):
+        correction = self.pixel_correction
+        self.pixel_correction_check.setEnabled(correction is not None)
+        if correction is None:
+            self.pixel_correction_status_label.setText("---")
+            return
+        kind = "two-point" if correction.gain is not None else "offset only"
+        self.pixel_correction_status_label.setText(f"{kind}, {correction.bad_pixel_count} bad pixels ({correction.created})")
+
+
+    def set_line_profile(self, enabled:bool):
+        if enabled:
+            x, y = self.sample_x_spin.value(), self.sample_y_spin.value()
+            geometry = (x - LINE_PROFILE_HALF_LENGTH, y, x + LINE_PROFILE_HALF_LENGTH, y)
+            self.profile_engine.set_line("line", *geometry)
+            self.image_view.set_line_profile("line", *geometry)
+        else:
+            self.remove_profile("line")
+        self.profile_plot.setVisible(bool(self.profile_engine.definitions))
+
+
+    def set_radial_profile(self, enabled:bool):
+        if enabled:
+            geometry = (self.sample_x_spin.value(), self.sample_y_spin.value(), RADIAL_PROFILE_RADIUS)
+            self.profile_engine.set_radial("radial", *geometry)
+            self.image_view.set_radial_profile("radial", *geometry)
+        else:
+            self.remove_profile("radial")
+        self.profile_plot.setVisible(bool(self.profile_engine.definitions))
+
+
+    def remove_profile(self, name:str):
+        self.profile_engine.remove(name)
+        self.image_view.remove_profile(name)
+        curve = self.profile_curves.pop(name, None)
+        if curve is not None:
+            self.profile_plot.removeItem(curve)
+
+
+    def on_profile_moved(self, name:str, geometry:tuple):
+        """
+        follow a line or circle dragged on the image
+        """
+        if name not in self.profile_engine.definitions:
+            return
+        if self.profile_engine.definitions[name].kind == ProfileKind.RADIAL:
+            self.profile_engine.set_radial(name, *geometry)
+        else:
+            self.profile_engine.set_line(name, *geometry)
+
+
+    def update_profile_plot(self):
+        latest = self.profile_engine.latest
+        for name in [name for name in self.profile_curves if name not in self.profile_engine.definitions]:
+            self.profile_plot.removeItem(self.profile_curves.pop(name))
+        for name, profile in latest.items():
+            if name not in self.profile_engine.definitions: # removed since this frame was computed
+                continue
+            curve = self.profile_curves.get(name)
+            if curve is None:
+                curve = self.profile_plot.plot(pen=PROFILE_COLORS.get(name, "y"), name=f"{profile.kind} profile")
+                self.profile_curves[name] = curve
+            curve.setData(profile.positions, profile.values, connect="finite")
+
+
+    def set_averaging(self):
+        mode = self.averaging_combo.currentText()
+        n_frames = self.averaging_frames_spin.value()
+        self.averager.configure(mode, n_frames)
+        logging.info(f"Temporal averaging set to {mode} ({n_frames} frames)")
+
+
+    def toggle_record(self):
+        if self.recorder is None:
+            if self.acquisition_thread is None or self.controller.image_shape is None:
+                return
+            folder = QFileDialog.getExistingDirectory(self, "Select Movie Destination Folder")
+            if not folder:
+                return
+            movie_folder = Path(folder) / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_thermal_movie"
+            try:
+                self.recorder = ThermalMovieRecorder(movie_folder, self.controller.image_shape, self.controller.calibration_parameters,
+                                                     window=self.controller.window)
+                self.recorder.start()
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to start movie recording: {e}")
+                self.recorder = None
+                return
+            self.acquisition_thread.recorder = self.recorder
+            self.record_btn.setText("Stop Recording")
+        else:
+            self.stop_record()
+
+
+    def stop_record(self):
+        if self.recorder is None:
+            return
+        if self.acquisition_thread is not None:
+            self.acquisition_thread.recorder = None
+        self.recorder.stop()
+        self.recorder = None
+        self.record_btn.setText("Record Movie")
+
+
     def clear_uis(self):
         pass
 
@@ -197,126 +635,411 @@ class FlirCameraWidget(QGroupBox):
         self.reference_y_spin.setEnabled(enabled)
         self.reference_w_spin.setEnabled(enabled)
         self.reference_h_spin.setEnabled(enabled)
+        if self.tracker.enabled: # position belongs to the tracker
+            self.sample_x_spin.setEnabled(False)
+            self.sample_y_spin.setEnabled(False)
+
+
+    def set_roi_editing(self, enabled:bool):
+        self.rect_spin_enabled(enabled)
+        self.add_probe_btn.setEnabled(enabled)
+        self.clear_probes_btn.setEnabled(enabled)
+        self.line_profile_check.setEnabled(enabled)
+        self.radial_profile_check.setEnabled(enabled)
+        self.image_view.set_rois_movable(enabled)
+
+
+    def display_period_ms(self) -> int:
+        """
+        redraw no faster than the screen refreshes
+        """
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None else 0
+        if refresh_rate <= 0:
+            refresh_rate = DEFAULT_REFRESH_RATE
+        return max(1, int(np.ceil(1000 / refresh_rate)))
+
+
+    def refresh_display(self):
+        roi_only = self.acquisition_thread is not None and self.acquisition_thread.roi_only
+        if roi_only and self.isVisible():
+            self.acquisition_thread.request_frame()
+        if self._displayed_frame is not None and self._displayed_frame.seq == self.frame_buffer.latest_seq:
+            return
+        frame = self.frame_buffer.acquire_latest()
+        if frame is None:
+            return
+        metrics = self.controller.metrics
+        # frames left unconverted in ROI-only mode are not counted as skipped
+        if not roi_only and self._displayed_frame is not None and frame.seq > self._displayed_frame.seq + 1:
+            metrics.count("skipped", frame.seq - self._displayed_frame.seq - 1) # published but never drawn
+        with metrics.timed("set_image"): # the paint is timed by the image view
+            self.update(frame.data, frame.timestamp)
+        # the image item keeps referencing the slot until it repaints, so drop the pin on the previous frame only now
+        self.frame_buffer.release(self._displayed_frame)
+        self._displayed_frame = frame
+
+
+    def update(self, new_image:np.ndarray, timestamp:Optional[float]=None):
+        if self.isVisible(): # nothing to paint while another tab is shown
+            if self.layer_combo.currentText() == LAYER_COOLING_RATE:
+                self.update_cooling_rate_layer()
+            else:
+                self.image_view.update_image(new_image, timestamp)
+        self.update_roi_labels()
+        if self.isVisible() and (self.profile_curves or self.profile_engine.latest):
+            self.update_profile_plot()
+        if self.cooling_rate.enabled:
+            span = self.cooling_rate.time_span
+            duration = 0.0 if span is None else span[1] - span[0]
+            self.cooling_rate_status_label.setText(f"{self.cooling_rate.frame_count} frames over {duration:.1f} s")
+        if self.recorder is not None:
+            self.record_status_label.setText(f"{self.recorder.recorded_frames} ({self.recorder.dropped_frames} dropped)")
+
+
+    def update_cooling_rate_layer(self):
+        now = time.time()
+        if now - self._cooling_rate_time < COOLING_RATE_REFRESH_INTERVAL:
+            return
+        self._cooling_rate_time = now
+        rate = self.cooling_rate.rate(out=self._cooling_rate_image)
+        if rate is None:
+            return
+        self._cooling_rate_image = rate
+        # shown in K/min; scaled in place, the buffer is refilled on the next read
+        np.multiply(rate, 60.0, out=rate)
+        self.image_view.update_image(rate)
+
+
+    def update_stats(self):
+        self.stats_label.setText(self.controller.metrics.format_summary())
+
+
+    def reset_stats(self):
+        self.controller.metrics.reset()
+        self.update_stats()
+
+
+    def export_stats(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Pipeline Statistics", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_thermal_pipeline.csv",
+            "CSV files (*.csv)"
+        )
+        if not path:
+            return
+        try:
+            self.controller.metrics.export_csv(path)
+            logging.info(f"Pipeline statistics exported to {path}")
+        except OSError as e:
+            logging.error(f"Failed to export pipeline statistics: {e}")
+
 
+    def update_roi_labels(self):
+        statistics = self.roi_engine.latest
+        if self.tracker.enabled and "sample" in statistics:
+            self.follow_tracked_sample(statistics["sample"].x, statistics["sample"].y)
+        for name, label in (("sample", self.temperature_sample_label), ("reference", self.temperature_reference_label)):
+            if name in statistics:
+                label.setText(f"{statistics[name].estimate:.2f}°C (σ {statistics[name].std:.2f})")
+        probe_lines = [
+            f"{name}: {s.mean:.2f}°C  σ {s.std:.2f}  min {s.min:.2f}  max {s.max:.2f}"
+            for name, s in statistics.items() if name not in ROI_COLORS
+        ]
+        self.probe_label.setText("\n".join(probe_lines))
 
-    def update(self, new_image:np.ndarray):
-        self.canvas.update_image(new_image)
-        self.update_average_temperature(new_image)
 
+    def move_rect(self):
+        sample = (self.sample_x_spin.value(), self.sample_y_spin.value(),
+                  self.sample_w_spin.value(), self.sample_h_spin.value())
+        reference = (self.reference_x_spin.value(), self.reference_y_spin.value(),
+                     self.reference_w_spin.value(), self.reference_h_spin.value())
+        self.image_view.set_roi("sample", *sample)
+        self.image_view.set_roi("reference", *reference)
+        self.roi_engine.set_roi("sample", *sample)
+        self.roi_engine.set_roi("reference", *reference)
 
-    def update_average_temperature(self, image):
-        sample_x = self.sample_x_spin.value()
-        sample_y = self.sample_y_spin.value()
-        sample_w = self.sample_w_spin.value()
-        sample_h = self.sample_h_spin.value()
-        T_sample = average_around_center(image, sample_x, sample_y, sample_w, sample_h)
-        self.temperature_sample_label.setText(f"{T_sample:.2f}°C")
 
-        reference_x = self.reference_x_spin.value()
-        reference_y = self.reference_y_spin.value()
-        reference_w = self.reference_w_spin.value()
-        reference_h = self.reference_h_spin.value()
-        T_reference = average_around_center(image, reference_x, reference_y, reference_w, reference_h)
-        self.temperature_reference_label.setText(f"{T_reference:.2f}°C")
+    def follow_tracked_sample(self, x:int, y:int):
+        if (x, y) == (self.sample_x_spin.value(), self.sample_y_spin.value()):
+            return
+        for spin, value in ((self.sample_x_spin, x), (self.sample_y_spin, y)):
+            spin.blockSignals(True)
+            spin.setValue(value)
+            spin.blockSignals(False)
+        self.image_view.set_roi("sample", x, y, self.sample_w_spin.value(), self.sample_h_spin.value())
 
 
-    def move_rect(self, value):
+    def on_roi_moved(self, name:str, x:int, y:int, w:int, h:int):
+        """
+        follow a rectangle dragged on the image
         """
-        identify which widget emits signal --> self.sender()
-        sample_rect.set_width(), .set_x(), ...
+        self.roi_engine.set_roi(name, x, y, w, h)
+        if name == "sample":
+            spins = (self.sample_x_spin, self.sample_y_spin, self.sample_w_spin, self.sample_h_spin)
+        elif name == "reference":
+            spins = (self.reference_x_spin, self.reference_y_spin, self.reference_w_spin, self.reference_h_spin)
+        else:
+            return
+        for spin, value in zip(spins, (x, y, w, h)):
+            spin.blockSignals(True)
+            spin.setValue(value)
+            spin.blockSignals(False)
+
+
+    def add_probe(self):
         """
-        if self.sender() == self.sample_x_spin:
-            self.canvas.sample_rect.set_x(value)
-        elif self.sender() == self.sample_y_spin:
-            self.canvas.sample_rect.set_y(value)
-        elif self.sender() == self.sample_w_spin:
-            self.canvas.sample_rect.set_width(value)
-        elif self.sender() == self.sample_h_spin:
-            self.canvas.sample_rect.set_height(value)
-        elif self.sender() == self.reference_x_spin:
-            self.canvas.reference_rect.set_x(value)
-        elif self.sender() == self.reference_y_spin:
-            self.canvas.reference_rect.set_y(value)
-        elif self.sender() == self.reference_w_spin:
-            self.canvas.reference_rect.set_width(value)
-        elif self.sender() == self.reference_h_spin:
-            self.canvas.reference_rect.set_height(value)
+        add a small probe ROI at the image center; drag it to the point of interest
+        """
+        self._probe_count += 1
+        name = f"probe{self._probe_count}"
+        height, width = self.controller.sensor_shape or (480, 640)
+        self.image_view.set_roi(name, width // 2, height // 2, PROBE_SIZE, PROBE_SIZE)
+        self.roi_engine.set_roi(name, width // 2, height // 2, PROBE_SIZE, PROBE_SIZE)
+
+
+    def clear_probes(self):
+        for name in self.roi_engine.rois:
+            if name not in ROI_COLORS:
+                self.roi_engine.remove_roi(name)
+                self.image_view.remove_roi(name)
+        self._probe_count = 0
+        self.probe_label.setText("")
+
+
+    def roi_statistics(self, name:str) -> Optional[ROIStatistics]:
+        return self.roi_engine.latest.get(name)
     
 
     @property
     def sample_temperature(self) -> Optional[float]:
-        try:
-            text = self.temperature_sample_label.text()
-            return float(text[:-len("°C")].strip())
-        except (TypeError, Exception) as e:
-            # logging.error(f"Failed to read sample temperature for data export: {e}")
-            return None
+        statistics = self.roi_statistics("sample")
+        return None if statistics is None else statistics.estimate
     
 
     @property
-    def reference_temperature(self) -> Optional[float]:
-        try:
-            text = self.temperature_reference_label.text()
-            return float(text[:-len("°C")].strip())
-        except (TypeError, Exception) as e:
-            # logging.error(f"Failed to read reference temperature for data export: {e}")
-            return None
+    def sample_position(self) -> Optional[tuple[int, int]]:
+        """
+        sensor pixel (x, y) of the sample ROI center behind sample_temperature
+        """
+        statistics = self.roi_statistics("sample")
+        return None if statistics is None else (statistics.x, statistics.y)
+    
 
+    @property
+    def line_profile(self) -> Optional[ThermalProfile]:
+        return self.profile_engine.latest.get("line")
 
-class ThermalImageCanvas(FigureCanvas):
-    def __init__(self, parent=None):
-        self.fig = Figure()
-        self.ax = self.fig.add_subplot(111)
-        self.ax.axis("off")
-        super().__init__(self.fig)
-        self.setParent(parent)
-        self.image = None
-    
 
-    def update_image(self, new_image:np.ndarray):
-        if self.image is None:
-            self.image = self.ax.imshow(new_image)
-            self.create_rects()
-        else:
-            self.image.set_data(new_image)
-        self.draw()
-    
+    @property
+    def radial_profile(self) -> Optional[ThermalProfile]:
+        return self.profile_engine.latest.get("radial")
 
-    def change_cmap(self, cmap:str):
-        try:
-            self.image.set_cmap(cmap)
-            logging.info(f"cmap changed to {cmap}")
-            self.draw()
-        except Exception as e:
-            logging.error(f"Failed to change cmap to {cmap}: {e}")
-    
 
-    def create_rects(self):
-        self.sample_rect = patches.Rectangle(xy=(280, 220), width=60, height=20, linewidth=1, ls="dashed", edgecolor="c", facecolor="none")
-        self.reference_rect = patches.Rectangle(xy=(280, 120), width=60, height=20, linewidth=1, ls="dashed", edgecolor="w", facecolor="none")
-        self.ax.add_patch(self.sample_rect)
-        self.ax.add_patch(self.reference_rect)
+    @property
+    def reference_temperature(self) -> Optional[float]:
+        statistics = self.roi_statistics("reference")
+        return None if statistics is None else statistics.estimate
+
 
+    @property
+    def temperature_timestamp(self) -> Optional[float]:
+        """
+        host time (time.time()) at which the frame behind sample/reference temperature was exposed
+        """
+        statistics = self.roi_statistics("sample")
+        return None if statistics is None else statistics.timestamp
 
-class FlirCameraPollingThread(QThread):
-    updated = pyqtSignal(np.ndarray)
 
-    def __init__(self, controller, interval, parent=None):
+class FlirCameraAcquisitionThread(QThread):
+    """
+    Pulls every frame from the camera at its native rate into a FrameRingBuffer;
+    no sleep, GetNextImage blocks until the next frame is delivered.
+    Frames are converted by the controller directly into the claimed ring slot (float32),
+    so nothing is allocated or copied per frame. Temporal averaging is applied in place before the
+    frame is published, and ROI statistics are evaluated on every (averaged) frame.
+    While a recorder is attached, the raw counts of every frame are handed to it as well.
+    Stage timings and latencies are recorded in controller.metrics.
+    While cooling_rate is enabled, every full frame (before averaging) is added to the per-pixel dT/dt fit.
+    While tracker is enabled, the sample ROI is moved onto the sample before its statistics are taken.
+    Line and radial profiles of profile_engine are sampled after the ROI statistics.
+    With pixel_correction set, every frame is corrected (gain/offset, bad pixels) right after conversion;
+    while flat_field_capture is set, uncorrected frames are fed to it and flat_field_captured is emitted once it is complete.
+    With roi_only set, only raw counts are fetched and ROI statistics convert just their own
+    pixels; a full frame is converted and published only after request_frame() (display).
+    """
+
+    flat_field_captured = pyqtSignal(object) # completed FlatFieldCapture
+
+
+    def __init__(self, controller, frame_buffer:FrameRingBuffer, roi_engine:ROIStatisticsEngine,
+                 averager:TemporalAverager, tracker:SampleTracker, cooling_rate:CoolingRateMap,
+                 profile_engine:ProfileEngine, parent=None):
         super().__init__(parent)
         self.controller = controller
-        self.interval = interval
+        self.frame_buffer = frame_buffer
+        self.roi_engine = roi_engine
+        self.averager = averager
+        self.tracker = tracker
+        self.cooling_rate = cooling_rate
+        self.profile_engine = profile_engine
+        self.recorder = None # ThermalMovieRecorder, attached and detached from the GUI thread
+        self.roi_only = False
+        self.pixel_correction = None # PixelCorrection matching the sensor, set from the GUI thread
+        self.flat_field_capture = None # FlatFieldCapture in progress, set from the GUI thread
+        self._frame_requested = threading.Event()
+        self._raw_frame = None # counts of the current frame in ROI-only mode without recorder
         self._running = True
 
     
     def run(self):
-        while self._running:
+        metrics = self.controller.metrics
+        while self._running and self.controller.streaming:
+            recorder = self.recorder
+            raw_buffer = None
             try:
-                image = self.controller.get_image()
+                raw_buffer = recorder.acquire_buffer() if recorder is not None else None
+                if self.roi_only:
+                    seq = self._next_roi_only_frame(raw_buffer, metrics)
+                    if seq is not None and raw_buffer is not None:
+                        self._submit(recorder, raw_buffer, seq)
+                        raw_buffer = None
+                    continue
+                buffer = self.frame_buffer.begin_write(self.controller.image_shape, np.float32)
+                image = self.controller.get_image(out=buffer, raw_out=raw_buffer)
                 if not image is None:
-                    self.updated.emit(image)
+                    frame_info = self.controller.last_frame_info
+                    timestamp = frame_info.host_timestamp # exposure time on the host clock
+                    self._capture_flat_field(image)
+                    correction = self._window_correction()
+                    if correction is not None:
+                        with metrics.timed("pixel_correction"):
+                            correction.apply(image)
+                    if self.cooling_rate.enabled:
+                        with metrics.timed("cooling_rate"):
+                            self.cooling_rate.update(image, timestamp)
+                    with metrics.timed("average"):
+                        self.averager.update(image)
+                    if self.tracker.enabled:
+                        with metrics.timed("track"):
+                            self._track_sample(image)
+                    seq = self.frame_buffer.commit(timestamp)
+                    if raw_buffer is not None:
+                        self._submit(recorder, raw_buffer, seq)
+                        raw_buffer = None
+                    # the producer is the only writer, so the committed slot is stable until the next begin_write
+                    with metrics.timed("roi"):
+                        self.roi_engine.compute(image, seq, timestamp)
+                    if self.profile_engine.definitions:
+                        with metrics.timed("profile"):
+                            self.profile_engine.compute(image, seq, timestamp)
+                    metrics.record("exposure_to_roi", time.time() - timestamp)
             except Exception as e:
-                logging.error(f"Thermal camera polling failed: {e}")
-            time.sleep(self.interval)
+                logging.error(f"Thermal camera acquisition failed: {e}")
+                time.sleep(0.1) # avoid spinning on a persistent error
+            finally:
+                if raw_buffer is not None: # no frame, or it failed before it was handed over
+                    recorder.discard(raw_buffer)
+
+
+    def _submit(self, recorder, raw_buffer:np.ndarray, seq:int) -> None:
+        frame_info = self.controller.last_frame_info
+        recorder.submit(raw_buffer, seq, frame_info.host_timestamp, frame_info.frame_id, frame_info.camera_timestamp)
+
+
+    def _next_roi_only_frame(self, raw_buffer:Optional[np.ndarray], metrics) -> Optional[int]:
+        """
+        frame sequence number, None without a frame; raw_buffer is left to the caller
+        """
+        shape = self.controller.image_shape
+        raw = raw_buffer
+        if raw is None:
+            if self._raw_frame is None or self._raw_frame.shape != shape:
+                self._raw_frame = np.empty(shape, dtype=np.uint16)
+            raw = self._raw_frame
+        counts = self.controller.get_image(raw_out=raw, convert=False)
+        if counts is None:
+            return None
+        frame_info = self.controller.last_frame_info
+        timestamp = frame_info.host_timestamp
+        lut = self.controller.temperature_lut
+        correction = self._window_correction()
+        # a flat-field capture needs every full frame
+        if self._frame_requested.is_set() or self.flat_field_capture is not None:
+            self._frame_requested.clear()
+            buffer = self.frame_buffer.begin_write(shape, np.float32)
+            with metrics.timed("convert_display"):
+                convert_counts(lut, counts, out=buffer)
+            self._capture_flat_field(buffer)
+            if correction is not None:
+                with metrics.timed("pixel_correction"):
+                    correction.apply(buffer)
+            if self.cooling_rate.enabled: # least squares copes with the irregular spacing of displayed frames
+                with metrics.timed("cooling_rate"):
+                    self.cooling_rate.update(buffer, timestamp)
+            seq = self.frame_buffer.commit(timestamp)
+        else:
+            seq = self.frame_buffer.skip()
+        if self.tracker.enabled:
+            with metrics.timed("track"):
+                self._track_sample(counts=counts, lut=lut)
+        with metrics.timed("roi"):
+            self.roi_engine.compute_counts(counts, lut, seq, timestamp, correction)
+        if self.profile_engine.definitions:
+            with metrics.timed("profile"):
+                self.profile_engine.compute_counts(counts, lut, seq, timestamp, correction)
+        metrics.record("exposure_to_roi", time.time() - timestamp)
+        return seq
+
+
+    def _window_correction(self):
+        correction = self.pixel_correction
+        if correction is None:
+            return None
+        return correction.for_window(self.controller.window)
+
+
+    def _capture_flat_field(self, frame:np.ndarray) -> None:
+        capture = self.flat_field_capture
+        if capture is None:
+            return
+        capture.add(frame)
+        if capture.complete:
+            self.flat_field_capture = None
+            self.flat_field_captured.emit(capture)
+
+
+    def _track_sample(self, frame:Optional[np.ndarray]=None, counts:Optional[np.ndarray]=None,
+                      lut:Optional[np.ndarray]=None) -> None:
+        """
+        move the sample ROI onto the sample found in the search window of frame (°C),
+        or of counts converted through lut (only the search window is converted)
+        """
+        roi = self.roi_engine.rois.get("sample")
+        if roi is None:
+            return
+        origin = self.roi_engine.origin
+        source = frame if frame is not None else counts
+        x_start, x_end, y_start, y_end = self.tracker.search_bounds(roi, origin, source.shape)
+        if x_end <= x_start or y_end <= y_start:
+            return
+        if frame is not None:
+            region = frame[y_start:y_end, x_start:x_end]
+        else:
+            region = self.tracker.region_buffer((y_end - y_start, x_end - x_start))
+            np.take(lut, counts[y_start:y_end, x_start:x_end], out=region, mode="clip")
+        target = self.tracker.locate(region, x_start + origin[0], y_start + origin[1])
+        if target is None:
+            return
+        x, y = self.tracker.step(roi.x, roi.y, target)
+        if (x, y) != (roi.x, roi.y):
+            self.roi_engine.set_roi("sample", x, y, roi.w, roi.h)
+
+
+    def request_frame(self):
+        """
+        have the next frame converted in full and published (ROI-only mode)
+        """
+        self._frame_requested.set()
 
 
     def stop(self):
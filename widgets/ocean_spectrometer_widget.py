@@ -1,19 +1,25 @@
 from PyQt6.QtWidgets import (
     QGroupBox, QPushButton, QLabel, QVBoxLayout,
-    QSpinBox, QFormLayout
+    QSpinBox, QFormLayout, QComboBox, QDoubleSpinBox, QTableWidget, QTableWidgetItem, QHBoxLayout
 )
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
 import pyqtgraph as pg
 import numpy as np
 import seabreeze
 seabreeze.use('cseabreeze')
 from seabreeze.spectrometers import Spectrometer
+from processing.spectrum_processing import ProcessedSpectrum, SpectrumAccumulator, MAX_SCANS_TO_AVERAGE, MAX_BOXCAR_WIDTH
+from processing.spectral_features import PEAK_FITS, CENTROID_THRESHOLD
+from processing.spectral_bands import SpectralBand, BandResult
 import logging
 from typing import Optional
 import time
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+BAND_COLUMNS = ["Name", "Start [nm]", "End [nm]", "Integral", "Centroid [nm]", "Peak [nm]"]
+BAND_DEFINITION_COLUMNS = 3 # editable; the others show results
+
 
 class OceanSpectrometerWidget(QGroupBox):
 
@@ -24,8 +30,12 @@ class OceanSpectrometerWidget(QGroupBox):
         self.polling_thread = None
         self._polling_interval = polling_interval
         self.wavelength = np.array([])
-        self.intensity = np.array([])
-        self.dark = np.array([])
+        self.intensity = np.array([]) # processed spectrum on display
+        self.dark = None # averaged dark spectrum, subtracted in the polling thread
+        self.last_spectrum = None # ProcessedSpectrum of the last update
+        self.features = None # SpectralFeatures of the last update, read by the data collector
+        self.bands = [] # SpectralBand definitions from the band table
+        self._band_regions = [] # plot regions of the bands
 
         self.plot_widget = pg.PlotWidget()
         self.plot_widget.setBackground("w")
@@ -46,6 +56,26 @@ class OceanSpectrometerWidget(QGroupBox):
         self.integration_time_spin.valueChanged.connect(self.set_integration_time)
         self.integration_time_spin.setEnabled(False)
 
+        self.scans_to_average_spin = QSpinBox()
+        self.scans_to_average_spin.setRange(1, MAX_SCANS_TO_AVERAGE)
+        self.scans_to_average_spin.valueChanged.connect(self.set_scans_to_average)
+        self.boxcar_width_spin = QSpinBox()
+        self.boxcar_width_spin.setRange(0, MAX_BOXCAR_WIDTH)
+        self.boxcar_width_spin.setSuffix(" px")
+        self.boxcar_width_spin.setToolTip("Pixels averaged on each side of every pixel")
+        self.boxcar_width_spin.valueChanged.connect(self.set_boxcar_width)
+
+        self.peak_fit_combo = QComboBox()
+        self.peak_fit_combo.addItems(PEAK_FITS)
+        self.peak_fit_combo.currentTextChanged.connect(self.set_peak_fit)
+        self.centroid_threshold_spin = QDoubleSpinBox()
+        self.centroid_threshold_spin.setRange(0.0, 99.0)
+        self.centroid_threshold_spin.setDecimals(1)
+        self.centroid_threshold_spin.setSuffix(" %")
+        self.centroid_threshold_spin.setValue(CENTROID_THRESHOLD * 100)
+        self.centroid_threshold_spin.setToolTip("Pixels below this fraction of the peak are left out of the centroid")
+        self.centroid_threshold_spin.valueChanged.connect(self.set_centroid_threshold)
+
         self.start_btn = QPushButton("Start")
         self.start_btn.clicked.connect(self.start)
         self.start_btn.setEnabled(False)
@@ -56,6 +86,15 @@ class OceanSpectrometerWidget(QGroupBox):
 
         self.peak_wavelength_label = QLabel("---")
         self.mean_wavelength_label = QLabel("---")
+        self.fwhm_label = QLabel("---")
+
+        self.band_table = QTableWidget(0, len(BAND_COLUMNS))
+        self.band_table.setHorizontalHeaderLabels(BAND_COLUMNS)
+        self.band_table.itemChanged.connect(self.on_band_item_changed)
+        self.add_band_btn = QPushButton("Add Band")
+        self.add_band_btn.clicked.connect(self.add_band)
+        self.remove_band_btn = QPushButton("Remove Band")
+        self.remove_band_btn.clicked.connect(self.remove_band)
 
         # layout
         layout = QVBoxLayout()
@@ -69,6 +108,10 @@ class OceanSpectrometerWidget(QGroupBox):
 
         parameter_from = QFormLayout()
         parameter_from.addRow("Integration Time:", self.integration_time_spin)
+        parameter_from.addRow("Scans to Average:", self.scans_to_average_spin)
+        parameter_from.addRow("Boxcar Width:", self.boxcar_width_spin)
+        parameter_from.addRow("Peak Fit:", self.peak_fit_combo)
+        parameter_from.addRow("Centroid Threshold:", self.centroid_threshold_spin)
         layout.addLayout(parameter_from)
 
         layout.addWidget(self.start_btn)
@@ -76,9 +119,16 @@ class OceanSpectrometerWidget(QGroupBox):
 
         wavelength_form = QFormLayout()
         wavelength_form.addRow("Peak Wavelength", self.peak_wavelength_label)
-        wavelength_form.addRow("Mean Wavelength", self.mean_wavelength_label)
+        wavelength_form.addRow("Centroid Wavelength", self.mean_wavelength_label)
+        wavelength_form.addRow("FWHM", self.fwhm_label)
         layout.addLayout(wavelength_form)
 
+        band_hbox = QHBoxLayout()
+        band_hbox.addWidget(self.add_band_btn)
+        band_hbox.addWidget(self.remove_band_btn)
+        layout.addLayout(band_hbox)
+        layout.addWidget(self.band_table)
+
         layout.addWidget(self.plot_widget)
 
         self.setLayout(layout)
@@ -104,7 +154,7 @@ class OceanSpectrometerWidget(QGroupBox):
                 self.dark_btn.setEnabled(True)
                 self.wavelength = self.spectrometer.wavelengths()
                 self.intensity = np.zeros_like(self.wavelength)
-                self.dark = np.zeros_like(self.wavelength)
+                self.dark = None
             except (TypeError, TimeoutError, RuntimeError, OSError, Exception) as e:
                 logging.error(f"Failed to initialize spectrometer: {e}")
         else:
@@ -125,12 +175,96 @@ class OceanSpectrometerWidget(QGroupBox):
     def set_integration_time(self, new_value:int):
         self.spectrometer.integration_time_micros(new_value)
         logging.info(f"Integration Time changed to {new_value} us")
+
+
+    def set_scans_to_average(self, scans:int):
+        if self.polling_thread is not None:
+            self.polling_thread.scans_to_average = scans # applied from the next spectrum
+
+
+    def set_boxcar_width(self, width:int):
+        if self.polling_thread is not None:
+            self.polling_thread.boxcar_width = width
+
+
+    def set_peak_fit(self, peak_fit:str):
+        if self.polling_thread is not None:
+            self.polling_thread.accumulator.features.peak_fit = peak_fit
+
+
+    def set_centroid_threshold(self, percent:float):
+        if self.polling_thread is not None:
+            self.polling_thread.accumulator.features.threshold = percent / 100
+
+
+    def add_band(self):
+        """
+        new band over the middle third of the visible wavelength range
+        """
+        (low, high), _ = self.plot_widget.viewRange()
+        third = (high - low) / 3
+        names = {band.name for band in self.bands}
+        index = self.band_table.rowCount() + 1
+        while f"Band {index}" in names:
+            index += 1
+        row = self.band_table.rowCount()
+        self.band_table.blockSignals(True)
+        self.band_table.insertRow(row)
+        for column, text in enumerate([f"Band {index}", f"{low + third:.2f}", f"{high - third:.2f}"]):
+            self.band_table.setItem(row, column, QTableWidgetItem(text))
+        for column in range(BAND_DEFINITION_COLUMNS, len(BAND_COLUMNS)):
+            item = QTableWidgetItem("---")
+            item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+            self.band_table.setItem(row, column, item)
+        self.band_table.blockSignals(False)
+        self.update_bands()
+
+
+    def remove_band(self):
+        rows = sorted({index.row() for index in self.band_table.selectedIndexes()}, reverse=True)
+        if not rows and self.band_table.rowCount():
+            rows = [self.band_table.rowCount() - 1]
+        for row in rows:
+            self.band_table.removeRow(row)
+        self.update_bands()
+
+
+    def on_band_item_changed(self, item:QTableWidgetItem):
+        if item.column() < BAND_DEFINITION_COLUMNS:
+            self.update_bands()
+
+
+    def update_bands(self):
+        """
+        read the band definitions from the table and hand them to the polling thread
+        """
+        bands = []
+        for row in range(self.band_table.rowCount()):
+            name_item, start_item, end_item = (self.band_table.item(row, column) for column in range(BAND_DEFINITION_COLUMNS))
+            try:
+                name = name_item.text().strip()
+                start, end = sorted((float(start_item.text()), float(end_item.text())))
+            except (AttributeError, ValueError) as e:
+                logging.warning(f"Invalid spectral band in row {row + 1}: {e}")
+                continue
+            if not name or name in {band.name for band in bands}:
+                logging.warning(f"Spectral band in row {row + 1} needs a unique name")
+                continue
+            bands.append(SpectralBand(name, start, end))
+        self.bands = bands
+        for region in self._band_regions:
+            self.plot_widget.removeItem(region)
+        self._band_regions = [pg.LinearRegionItem((band.start, band.end), movable=False) for band in bands]
+        for region in self._band_regions:
+            self.plot_widget.addItem(region)
+        if self.polling_thread is not None:
+            self.polling_thread.accumulator.bands.set_bands(bands)
     
 
     def capture_dark(self):
-        if self.spectrometer is None:
+        if self.spectrometer is None or self.polling_thread is None:
             return
-        self.dark = self.intensity
+        self.dark = self.polling_thread.capture_dark()
         logging.info(f"Capture current spectrum as dark")
     
 
@@ -138,8 +272,15 @@ class OceanSpectrometerWidget(QGroupBox):
         if self.spectrometer is None:
             return
         if self.polling_thread is None:
-            self.polling_thread = SpectrometerPollingThread(self.spectrometer, interval=self._polling_interval)
+            self.polling_thread = SpectrometerPollingThread(
+                self.spectrometer, interval=self._polling_interval, wavelengths=self.wavelength,
+                scans_to_average=self.scans_to_average_spin.value(), boxcar_width=self.boxcar_width_spin.value(),
+                dark=self.dark
+            )
             self.polling_thread.updated.connect(self.update_spectrum)
+            self.set_peak_fit(self.peak_fit_combo.currentText())
+            self.set_centroid_threshold(self.centroid_threshold_spin.value())
+            self.polling_thread.accumulator.bands.set_bands(self.bands)
             self.polling_thread.start()
             self.start_btn.setText("Stop")
         else:
@@ -148,18 +289,29 @@ class OceanSpectrometerWidget(QGroupBox):
             self.start_btn.setText("Start")
     
 
-    def update_spectrum(self, intensity_array):
-        self.intensity = intensity_array
-        intensity_corrected = self.intensity - self.dark
-        self.plot.setData(self.wavelength, intensity_corrected)
-        self.update_wavelength(intensity_corrected)
-
-
-    def update_wavelength(self, intensity_array):
-        peak_wavelength = self.wavelength[np.argmax(intensity_array)]
-        mean_wavelength = np.sum(self.wavelength * intensity_array) / np.sum(intensity_array)
-        self.peak_wavelength_label.setText(f"{peak_wavelength:.2f} nm")
-        self.mean_wavelength_label.setText(f"{mean_wavelength:.2f} nm")
+    def update_spectrum(self, spectrum:ProcessedSpectrum):
+        """
+        display a spectrum processed in the polling thread
+        """
+        self.last_spectrum = spectrum
+        self.intensity = spectrum.intensities
+        self.features = spectrum.features
+        self.plot.setData(self.wavelength, self.intensity)
+        self.peak_wavelength_label.setText(f"{self.features.peak_wavelength:.3f} nm")
+        self.mean_wavelength_label.setText(f"{self.features.centroid_wavelength:.3f} nm")
+        self.fwhm_label.setText(f"{self.features.fwhm:.3f} nm")
+        self.update_band_display(spectrum.bands)
+
+
+    def update_band_display(self, results:dict[str, BandResult]):
+        self.band_table.blockSignals(True)
+        for row in range(self.band_table.rowCount()):
+            name_item = self.band_table.item(row, 0)
+            result = results.get(name_item.text().strip()) if name_item is not None else None
+            texts = ["---"] * 3 if result is None else [f"{result.integral:.4g}", f"{result.centroid:.3f}", f"{result.peak:.3f}"]
+            for column, text in enumerate(texts, BAND_DEFINITION_COLUMNS):
+                self.band_table.item(row, column).setText(text)
+        self.band_table.blockSignals(False)
 
     
     def __del__(self):
@@ -169,43 +321,79 @@ class OceanSpectrometerWidget(QGroupBox):
 
     @property
     def peak_wavelength(self) -> Optional[float]:
-        try:
-            text = self.peak_wavelength_label.text()
-            return float(text[:-len("nm")].strip())
-        except (TypeError, Exception) as e:
-            # logging.error(f"Failed to read peak wavelength for data export: {e}")
-            return None
+        """
+        sub-pixel peak [nm] of the last spectrum
+        """
+        return None if self.features is None else self.features.peak_wavelength
 
     
     @property
     def mean_wavelength(self) -> Optional[float]:
-        try:
-            text = self.mean_wavelength_label.text()
-            return float(text[:-len("nm")].strip())
-        except (TypeError, Exception) as e:
-            # logging.error(f"Failed to read mean wavelength for data export: {e}")
-            return None
+        """
+        thresholded centroid [nm] of the last spectrum
+        """
+        return None if self.features is None else self.features.centroid_wavelength
+
+
+    @property
+    def fwhm(self) -> Optional[float]:
+        return None if self.features is None else self.features.fwhm
+
+
+    @property
+    def band_results(self) -> dict[str, BandResult]:
+        """
+        integral, centroid and peak of every band in the last spectrum
+        """
+        return {} if self.last_spectrum is None else self.last_spectrum.bands
 
 
 class SpectrometerPollingThread(QThread):
+    """
+    Reads scans_to_average scans back to back, then averages, subtracts the dark spectrum,
+    applies the boxcar and derives peak and mean wavelength here; only the result is emitted.
+    scans_to_average and boxcar_width may be set from the GUI thread and apply from the next spectrum.
+    """
     
-    updated = pyqtSignal(np.ndarray)
+    updated = pyqtSignal(object) # ProcessedSpectrum
 
-    def __init__(self, spectrometer, interval, parent=None):
+    def __init__(self, spectrometer, interval, wavelengths:np.ndarray, scans_to_average:int=1, boxcar_width:int=0,
+                 dark:Optional[np.ndarray]=None, parent=None):
         super().__init__(parent)
         self.spectrometer = spectrometer
         self.interval = interval
+        self.scans_to_average = scans_to_average
+        self.boxcar_width = boxcar_width
+        self.accumulator = SpectrumAccumulator(wavelengths, scans_to_average, boxcar_width)
+        self.accumulator.dark = dark
         self._running = True
 
+
+    def capture_dark(self) -> Optional[np.ndarray]:
+        """
+        use the last averaged spectrum (before dark subtraction) as dark and return it
+        """
+        self.accumulator.dark = self.accumulator.last_mean
+        return self.accumulator.dark
+
     
     def run(self):
+        accumulator = self.accumulator
         while self._running:
+            started = time.monotonic()
+            accumulator.scans_to_average = self.scans_to_average
+            if accumulator.smoother.width != self.boxcar_width:
+                accumulator.smoother.width = self.boxcar_width
             try:
-                intensity_array = self.spectrometer.intensities()
-                self.updated.emit(intensity_array)
+                while self._running and not accumulator.complete:
+                    accumulator.add(self.spectrometer.intensities())
+                spectrum = accumulator.process(time.time())
+                if spectrum is not None:
+                    self.updated.emit(spectrum)
             except Exception as e:
                 logging.error(f"Polling spectrum failed: {e}")
-            time.sleep(self.interval)
+                accumulator.reset()
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
 
 
     def stop(self):
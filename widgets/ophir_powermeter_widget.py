@@ -1,25 +1,52 @@
 from PyQt6.QtWidgets import (
     QGroupBox, QPushButton, QLabel, QVBoxLayout, QHBoxLayout,
-    QFormLayout, QMessageBox, QLineEdit, QComboBox
+    QFormLayout, QMessageBox, QLineEdit, QComboBox, QGridLayout
 )
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont
 from devices.ophir_juno_controller import OphirJunoController
+from devices.ophir_com_session import OphirComSession
+from processing.power_samples import PowerSampleBuffer, PowerStatistics, interval_statistics, DEVICE_TIMESTAMP_UNIT, STATUS_OK
+from processing.power_stability import PowerStability, welch_spectrum, DRIFT_WINDOWS, SPECTRUM_SAMPLES
+from processing.clock_sync import ClockSync
+import numpy as np
+import pyqtgraph as pg
 from pywintypes import com_error
 import logging
+import threading
 from typing import Optional
 import time
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SPECTRUM_INTERVAL = 5.0 # s between noise spectrum updates
+
 
 class OphirPowerMeterWidget(QGroupBox):
+    """
+    Control widget for one Ophir Juno. Meters share polling_thread (and its COM session);
+    without one the widget creates its own.
+    COM calls run on the session worker; their results come back through com_finished,
+    so no button waits on the device.
+    """
+
+    com_finished = pyqtSignal(object, object) # handler to run in the GUI thread, finished Future
 
-    def __init__(self, parent=None, polling_interval=0.5):
+    def __init__(self, parent=None, polling_interval=0.5, polling_thread=None):
         super().__init__("Ophir Power Meter Control", parent)
 
         self.controller = None
+        if polling_thread is None:
+            polling_thread = OphirSessionPollingThread(OphirComSession(), interval=polling_interval)
+        self.polling_thread = polling_thread
+        self.polling_thread.updated.connect(self.on_polled)
+        self.com_finished.connect(self.on_com_finished)
         self.last_power = None  # keep latest value here to communicate with data class for saving
+        self.last_statistics = None # PowerStatistics of the last polling interval
+        self.samples = PowerSampleBuffer() # every sample the meter delivered, filled by the polling thread
+        self.stability = PowerStability() # Allan deviation and drift of every valid sample, fed by the polling thread
+        self.spectrum_thread = PowerSpectrumThread(self.samples, self.stability, SPECTRUM_INTERVAL)
+        self.spectrum_thread.spectrum_ready.connect(self.update_spectrum_display)
         self._polling_interval = polling_interval
 
         # UI Elements
@@ -40,6 +67,8 @@ class OphirPowerMeterWidget(QGroupBox):
         self.wavelength_select_combo.currentIndexChanged.connect(self.change_wavelength)
 
 
+        self.power_statistics_label = QLabel("---")
+        self.clock_label = QLabel("---")
         self.power_label = QLabel("---")
         self.power_label.setAlignment(Qt.AlignmentFlag.AlignRight)
         unit_label = QLabel("W")
@@ -52,6 +81,25 @@ class OphirPowerMeterWidget(QGroupBox):
         unit_label.setFont(font)
         unit_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
+        self.allan_plot = pg.PlotWidget()
+        self.allan_plot.setLogMode(x=True, y=True)
+        self.allan_plot.setLabel("bottom", "τ", units="s")
+        self.allan_plot.setLabel("left", "Allan deviation (relative)")
+        self.allan_plot.setMinimumHeight(150)
+        self.allan_curve = self.allan_plot.plot(pen="y", symbol="o", symbolSize=4)
+        self.spectrum_plot = pg.PlotWidget()
+        self.spectrum_plot.setLogMode(x=True, y=True)
+        self.spectrum_plot.setLabel("bottom", "Frequency", units="Hz")
+        self.spectrum_plot.setLabel("left", "PSD [W²/Hz]")
+        self.spectrum_plot.setMinimumHeight(150)
+        self.spectrum_curve = self.spectrum_plot.plot(pen="c")
+        self.drift_window_combo = QComboBox()
+        self.drift_window_combo.addItems(DRIFT_WINDOWS)
+        self.drift_window_combo.currentIndexChanged.connect(self.update_stability_display)
+        self.drift_label = QLabel("---")
+        self.reset_stability_btn = QPushButton("Reset Stability")
+        self.reset_stability_btn.clicked.connect(self.reset_stability)
+
         # layout
         layout = QVBoxLayout()
 
@@ -75,20 +123,57 @@ class OphirPowerMeterWidget(QGroupBox):
         power_hbox.addWidget(self.power_label)
         power_hbox.addWidget(unit_label)
         layout.addLayout(power_hbox)
+        statistics_form = QFormLayout()
+        statistics_form.addRow("Interval:", self.power_statistics_label)
+        statistics_form.addRow("Clock:", self.clock_label)
+        layout.addLayout(statistics_form)
+
+        stability_box = QGroupBox("Stability")
+        stability_layout = QGridLayout()
+        stability_layout.addWidget(self.allan_plot, 0, 0)
+        stability_layout.addWidget(self.spectrum_plot, 0, 1)
+        drift_hbox = QHBoxLayout()
+        drift_hbox.addWidget(QLabel("Drift over"))
+        drift_hbox.addWidget(self.drift_window_combo)
+        drift_hbox.addWidget(self.drift_label, 1)
+        drift_hbox.addWidget(self.reset_stability_btn)
+        stability_layout.addLayout(drift_hbox, 1, 0, 1, 2)
+        stability_box.setLayout(stability_layout)
+        layout.addWidget(stability_box)
 
         self.setLayout(layout)
     
 
+    def run_when_done(self, future, handler):
+        """
+        call handler(future) in the GUI thread once the COM job is finished
+        """
+        future.add_done_callback(lambda finished: self.com_finished.emit(handler, finished))
+
+
+    def on_com_finished(self, handler, future):
+        handler(future)
+
+
     def scan_usb(self):
         """
         get usb devices and update combo box
         """
+        if self.controller is None or not self.controller.connected:
+            self.controller = OphirJunoController(self.polling_thread.session)
+        self.scan_usb_btn.setEnabled(False)
+        self.run_when_done(self.polling_thread.session.submit(lambda com: com.ScanUSB()), self.on_usb_scanned)
+
+
+    def on_usb_scanned(self, future):
+        self.scan_usb_btn.setEnabled(True)
         try:
-            self.controller = OphirJunoController()
-            self.device_select_combo.clear()
-            self.device_select_combo.addItems(self.controller.device_list)
+            devices = future.result()
         except com_error as e:
             logging.error(f"Failed to scan USB devices: {e}")
+            return
+        self.device_select_combo.clear()
+        self.device_select_combo.addItems(devices)
 
     
 
@@ -104,85 +189,227 @@ class OphirPowerMeterWidget(QGroupBox):
 
 
     def toggle_connection(self):
+        if self.controller is None:
+            return
         if not self.controller.connected:
             selected_device_serial = self.device_select_combo.currentText()
             if selected_device_serial == "":
                 QMessageBox.warning(self, "Device Not Found", "No USB device is selected.")
                 return
-            self.controller.connect(selected_device_serial) # also start stream
-            if self.controller.connected:
-                self.device_info_label.setText(" - ".join(self.controller.device_info))
-                if self.controller.is_sensor_exist:
-                    self.sensor_info_label.setText(" - ".join(self.controller.sensor_info))
-                    self.range_select_combo.addItems(self.controller.available_ranges)
-                    self.wavelength_select_combo.addItems(self.controller.available_wavelengths)
-                    self.range_select_combo.setCurrentIndex(0)
-                    self.wavelength_select_combo.setCurrentIndex(0)
-
-                self.connect_btn.setText("Disconnect")
-                self.polling_thread = PowerMeterPollingThread(self.controller, interval=self._polling_interval)
-                self.polling_thread.updated.connect(self.update_value_display)
-                self.polling_thread.start()
+            if selected_device_serial in self.polling_thread.session.open_devices:
+                QMessageBox.warning(self, "Device In Use", f"{selected_device_serial} is already connected in another tab.")
+                return
+            self.connect_btn.setEnabled(False)
+            self.run_when_done(self.controller.connect_async(selected_device_serial), self.on_connected) # also start stream
         else: # controller connected
-            self.polling_thread.stop()
-            self.polling_thread = None
-            self.controller.disconnect()
-            self.connect_btn.setText("Connect")
-            self.clear_info()
+            self.polling_thread.unsubscribe(self.controller.serial_number)
+            self.spectrum_thread.stop()
+            self.connect_btn.setEnabled(False)
+            self.run_when_done(self.controller.disconnect_async(), self.on_disconnected)
+
+
+    def on_connected(self, future):
+        self.connect_btn.setEnabled(True)
+        try:
+            description = future.result() # controller.describe(), None if connecting failed
+        except Exception as e:
+            logging.error(f"Failed to connect power meter: {e}")
+            QMessageBox.critical(self, "Connection Error", f"{e}")
+            if self.controller.connected: # connected, but describing the device failed
+                self.connect_btn.setEnabled(False)
+                self.run_when_done(self.controller.disconnect_async(), self.on_disconnected)
+            return
+        if description is None:
+            return
+        self.device_info_label.setText(" - ".join(description["device_info"] or ()))
+        if description["sensor_info"] is not None:
+            self.sensor_info_label.setText(" - ".join(description["sensor_info"]))
+            self.range_select_combo.addItems(description["ranges"])
+            self.wavelength_select_combo.addItems(description["wavelengths"])
+            self.range_select_combo.setCurrentIndex(0)
+            self.wavelength_select_combo.setCurrentIndex(0)
+
+        self.connect_btn.setText("Disconnect")
+        self.samples.clear()
+        self.reset_stability()
+        self.polling_thread.subscribe(self.controller.serial_number, self.samples, self.stability)
+        self.spectrum_thread.start()
+
+
+    def on_disconnected(self, future):
+        self.connect_btn.setEnabled(True)
+        self.connect_btn.setText("Connect")
+        self.clear_info()
+        self.last_statistics = None
+        self.power_statistics_label.setText("---")
+        self.clock_label.setText("---")
     
 
-    def update_value_display(self, new_value): # check type of new_value!
+    def on_polled(self, serial_number:str, statistics:PowerStatistics):
+        """
+        the shared polling thread reports every meter; keep those of this one
+        """
+        if self.controller is not None and self.controller.connected and serial_number == self.controller.serial_number:
+            self.update_value_display(statistics)
+            self.update_clock_display()
+            self.update_stability_display()
+
+
+    def update_clock_display(self):
+        clock = self.polling_thread.clock(self.controller.serial_number)
+        if clock is None or not clock.synchronized:
+            self.clock_label.setText("syncing")
+            return
+        self.clock_label.setText(f"drift {clock.drift_ppm:+.1f} ppm  jitter {clock.residual * 1e3:.2f} ms")
+
+
+    def update_value_display(self, statistics:PowerStatistics):
         try:
-            self.last_power = float(new_value)
+            self.last_statistics = statistics
+            self.last_power = statistics.mean
             self.power_label.setText(f"{self.last_power:.2f}")
-        except (TypeError, Exception) as e:
+            flagged = f", {statistics.flagged} flagged" if statistics.flagged else ""
+            self.power_statistics_label.setText(
+                f"σ {statistics.std:.3f}  min {statistics.min:.2f}  max {statistics.max:.2f} W  ({statistics.count} samples{flagged})"
+            )
+        except (TypeError, AttributeError) as e:
             logging.error(f"Failed to update value display: {e}")
 
 
+    def reset_stability(self):
+        self.stability.reset()
+        self.allan_curve.setData([], [])
+        self.spectrum_curve.setData([], [])
+        self.drift_label.setText("---")
+
+
+    def update_stability_display(self):
+        allan = self.stability.allan_deviation()
+        if allan is not None and len(allan[0]):
+            self.allan_curve.setData(*allan)
+        drift = self.stability.drift(DRIFT_WINDOWS[self.drift_window_combo.currentText()])
+        if drift is None or drift.mean == 0:
+            self.drift_label.setText("---")
+            return
+        self.drift_label.setText(
+            f"{drift.slope * 3600:+.3g} W/h  ({drift.slope * 3600 / drift.mean * 100:+.3f} %/h over {drift.span:.0f} s)"
+        )
+
+
+    def update_spectrum_display(self, spectrum):
+        if spectrum is None:
+            return
+        self.spectrum_curve.setData(spectrum.frequencies[1:], spectrum.density[1:]) # DC does not fit a log axis
+
+
     def change_range(self):
         new_index = self.range_select_combo.currentIndex()
-        self.controller.range = new_index
+        if new_index < 0 or self.controller is None or not self.controller.connected:
+            return
+        self.controller.set_range(new_index) # queued; polling resumes after the stream restarts
 
 
     def change_wavelength(self):
         new_index = self.wavelength_select_combo.currentIndex()
-        self.controller.wavelength = new_index
+        if new_index < 0 or self.controller is None or not self.controller.connected:
+            return
+        self.controller.set_wavelength(new_index)
 
 
     @property
     def power(self) -> Optional[float]:
-        try:
-            return float(self.power_label.text())
-        except (TypeError, Exception) as e:
-            # logging.error(f"Failed to read power meter value for data export: {e}")
+        """
+        mean power [W] of the samples delivered in the last polling interval
+        """
+        if self.last_statistics is None:
             return None
+        return self.last_statistics.mean
 
 
-class PowerMeterPollingThread(QThread):
+class OphirSessionPollingThread(QThread):
+    """
+    The one polling thread of all meters on a COM session. Every tick, each subscribed meter
+    is read once (every sample buffered since the last poll, as one batch of arrays);
+    the batch is appended to the meter's sample buffer and its statistics are emitted with the serial number.
+    Each meter has its own device clock -> host clock fit, fed with the newest sample of every batch and
+    its reception time (which can only lag the sample: lower envelope fit), so every sample gets
+    a host time.time() and samples of different meters can be paired.
+    Runs while at least one meter is subscribed. Unsubscribing the last meter only asks the loop to end,
+    so the GUI thread never waits for a COM round trip; a meter subscribed while the loop is
+    winding down restarts it once finished.
+    """
 
-    updated = pyqtSignal(float)
+    updated = pyqtSignal(str, object) # serial number, PowerStatistics
 
-    def __init__(self, controller, interval, parent=None):
+    def __init__(self, session:OphirComSession, interval, parent=None):
         super().__init__(parent)
-        self.controller = controller
+        self.session = session
         self.interval = interval
-        self._running = True
+        self._subscriptions = {} # serial number -> PowerSampleBuffer
+        self._clocks = {} # serial number -> ClockSync
+        self._stabilities = {} # serial number -> PowerStability
+        self._lock = threading.Lock()
+        self._running = False
+        self.finished.connect(self._restart_if_subscribed)
+
+
+    def subscribe(self, serial_number:str, samples:PowerSampleBuffer, stability:Optional[PowerStability]=None):
+        with self._lock:
+            self._subscriptions[serial_number] = samples
+            self._stabilities[serial_number] = stability
+            self._clocks[serial_number] = ClockSync(DEVICE_TIMESTAMP_UNIT, lower_envelope=True) # device timestamps restart on connecting
+            self._running = True
+        if not self.isRunning():
+            self.start()
+
+
+    def unsubscribe(self, serial_number:str):
+        with self._lock:
+            self._subscriptions.pop(serial_number, None)
+            self._clocks.pop(serial_number, None)
+            self._stabilities.pop(serial_number, None)
+            if not self._subscriptions:
+                self._running = False # the loop ends after its current tick
+
+
+    def _restart_if_subscribed(self):
+        with self._lock:
+            restart = self._running and bool(self._subscriptions)
+        if restart and not self.isRunning():
+            self.start()
+
+
+    def clock(self, serial_number:str) -> Optional[ClockSync]:
+        with self._lock:
+            return self._clocks.get(serial_number)
 
     
     def run(self):
-        while self._running:
+        while True:
+            with self._lock:
+                if not self._running:
+                    break
+                subscriptions = dict(self._subscriptions)
+                clocks = dict(self._clocks)
+                stabilities = dict(self._stabilities)
             try:
-                if self.controller.connected:
-                    data = self.controller.get_data() # return list
-                    """
-                    data looks like
-                    [{'value': 0.0, 'timestamp': 520181089.0, 'status': 0}, {'value': 0.0, 'timestamp': 520181156.0, 'status': 0}, ...]
-                    """
-                    if data: # if list is not empty
-                        newest_power = data[-1]["value"]
-                        self.updated.emit(newest_power)
+                batches = self.session.read_all(list(subscriptions)) # one worker round trip for all meters
             except Exception as e:
-                logging.error(f"Polling power meter data failed: {e}")
+                logging.error(f"Polling power meters failed: {e}")
+                batches = {}
+            for serial_number, (values, timestamps, statuses, received) in batches.items():
+                if not len(values) or serial_number not in subscriptions:
+                    continue
+                clock = clocks[serial_number]
+                clock.add(timestamps[-1], received)
+                host_timestamps = clock.to_wall(timestamps) if clock.synchronized else None
+                subscriptions[serial_number].extend(values, timestamps, statuses, host_timestamps)
+                if stabilities[serial_number] is not None:
+                    valid = (statuses == STATUS_OK) & np.isfinite(values)
+                    stabilities[serial_number].update(values, timestamps, valid, host_timestamps)
+                statistics = interval_statistics(values, timestamps, statuses, host_timestamps)
+                if statistics is not None:
+                    self.updated.emit(serial_number, statistics)
             time.sleep(self.interval)
 
 
@@ -191,4 +418,40 @@ class PowerMeterPollingThread(QThread):
         self.wait()
 
 
-    
\ No newline at end of file
+    
+
+
+class PowerSpectrumThread(QThread):
+    """
+    Welch noise spectrum of the newest valid samples of one meter, recomputed every interval seconds
+    off the GUI thread; the sample rate is the mean sample interval tracked by PowerStability.
+    """
+
+    spectrum_ready = pyqtSignal(object) # PowerSpectrum
+
+    def __init__(self, samples:PowerSampleBuffer, stability:PowerStability, interval:float, parent=None):
+        super().__init__(parent)
+        self.samples = samples
+        self.stability = stability
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            sample_interval = self.stability.sample_interval
+            values, _, statuses, _ = self.samples.latest(SPECTRUM_SAMPLES)
+            values = values[(statuses == STATUS_OK) & np.isfinite(values)]
+            if sample_interval is None or len(values) == 0:
+                continue
+            self.spectrum_ready.emit(welch_spectrum(values, 1.0 / sample_interval))
+
+
+    def start(self):
+        self._stop_event.clear()
+        super().start()
+
+
+    def stop(self):
+        self._stop_event.set()
+        self.wait()
@@ -0,0 +1,197 @@
+from PyQt6.QtCore import Qt, pyqtSignal
+from processing.roi_statistics import roi_bounds
+import pyqtgraph as pg
+import numpy as np
+import logging
+import time
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+LEVELS_REFRESH_INTERVAL = 2.0 # sec, how often cached color levels are recomputed in auto mode
+COLORMAPS = ["viridis", "plasma", "inferno", "magma", "cividis"]
+ROI_COLORS = {"sample": "c", "reference": "w"}
+PROBE_COLOR = "y"
+PROFILE_COLORS = {"line": "m", "radial": "g"}
+
+
+class ThermalImageView(pg.GraphicsLayoutWidget):
+    """
+    pyqtgraph image view of thermal frames with draggable sample/reference rectangles
+    and line/circle handles for temperature profiles.
+    Color levels are cached and only recomputed every LEVELS_REFRESH_INTERVAL in auto mode,
+    so an update is a plain setImage without scanning the frame.
+    setImage only schedules a repaint; with metrics set, the paint itself is timed ("paint") and
+    the age of a frame passed with its timestamp is recorded once it is on screen ("exposure_to_display").
+    """
+
+    roi_moved = pyqtSignal(str, int, int, int, int) # name, center x, center y, width, height
+    profile_moved = pyqtSignal(str, tuple) # name, (x0, y0, x1, y1) of a line or (x, y, radius) of a circle
+
+    def __init__(self, parent=None, metrics=None):
+        super().__init__(parent)
+        self.metrics = metrics # PipelineMetrics
+        self.view_box = self.addViewBox()
+        self.view_box.setAspectLocked(True)
+        self.view_box.invertY(True) # image row 0 at the top
+        self.image_item = pg.ImageItem(axisOrder="row-major")
+        self.image_item.setColorMap(pg.colormap.get(COLORMAPS[0]))
+        self.view_box.addItem(self.image_item)
+        self._levels = None
+        self._levels_time = 0.0
+        self._auto_levels = True
+        self._image_shape = None
+        self._frame_timestamp = None # exposure time of the image waiting to be painted
+        self.rois = {}
+        self._roi_sizes = {} # name -> (w, h) requested and (w, h) drawn, so a drag keeps even sizes
+        self.profiles = {}
+    
+
+    def create_rect(self, color:str) -> pg.RectROI:
+        pen = pg.mkPen(color, width=1, style=Qt.PenStyle.DashLine)
+        rect = pg.RectROI(pos=(0, 0), size=(1, 1), pen=pen, translateSnap=True, scaleSnap=True)
+        rect.sigRegionChangeFinished.connect(self.emit_roi_moved)
+        self.view_box.addItem(rect)
+        return rect
+
+
+    def update_image(self, new_image:np.ndarray, timestamp:Optional[float]=None):
+        now = time.time()
+        if self._levels is None or (self._auto_levels and now - self._levels_time > LEVELS_REFRESH_INTERVAL):
+            low, high = np.nanmin(new_image), np.nanmax(new_image)
+            if np.isfinite(low) and np.isfinite(high):
+                self._levels = (float(low), float(high) if high > low else float(low) + 1.0)
+                self._levels_time = now
+        if self._image_shape != new_image.shape:
+            self._image_shape = new_image.shape
+            self.view_box.autoRange()
+        self.image_item.setImage(new_image, autoLevels=False, levels=self._levels)
+        self._frame_timestamp = timestamp
+
+
+    def paintEvent(self, event):
+        if self.metrics is None:
+            super().paintEvent(event)
+            return
+        start = time.perf_counter()
+        super().paintEvent(event)
+        self.metrics.record("paint", time.perf_counter() - start)
+        if self._frame_timestamp is not None:
+            self.metrics.record("exposure_to_display", time.time() - self._frame_timestamp)
+            self._frame_timestamp = None
+    
+
+    def set_origin(self, x:int, y:int):
+        """
+        place the image at sensor offset (x, y), so a windowed frame lines up with the ROIs
+        """
+        self.image_item.setPos(x, y)
+
+
+    def set_rois_movable(self, enabled:bool):
+        for rect in list(self.rois.values()) + list(self.profiles.values()):
+            rect.translatable = enabled
+            rect.resizable = enabled
+            for handle in rect.getHandles():
+                handle.setVisible(enabled)
+
+
+    def reset_levels(self):
+        """
+        recompute color levels from the next image, e.g. when a different quantity is shown
+        """
+        self._levels = None
+
+
+    def set_auto_levels(self, enabled:bool):
+        self._auto_levels = enabled
+        if enabled:
+            self._levels_time = 0.0 # refresh on the next frame
+    
+
+    def change_cmap(self, cmap:str):
+        try:
+            self.image_item.setColorMap(pg.colormap.get(cmap))
+            logging.info(f"cmap changed to {cmap}")
+        except Exception as e:
+            logging.error(f"Failed to change cmap to {cmap}: {e}")
+    
+
+    def set_roi(self, name:str, x:int, y:int, w:int, h:int):
+        """
+        place rectangle over exactly the pixels averaged for a w x h region centered on (x, y);
+        the rectangle is created on first use
+        """
+        x_start, x_end, y_start, y_end = roi_bounds(x, y, w, h)
+        if name not in self.rois:
+            self.rois[name] = self.create_rect(ROI_COLORS.get(name, PROBE_COLOR))
+        rect = self.rois[name]
+        self._roi_sizes[name] = (w, h, x_end - x_start, y_end - y_start)
+        rect.blockSignals(True)
+        rect.setPos((x_start, y_start), update=False, finish=False)
+        rect.setSize((x_end - x_start, y_end - y_start), update=True, finish=False)
+        rect.blockSignals(False)
+    
+
+    def remove_roi(self, name:str):
+        rect = self.rois.pop(name, None)
+        self._roi_sizes.pop(name, None)
+        if rect is not None:
+            self.view_box.removeItem(rect)
+
+
+    def emit_roi_moved(self, rect:pg.RectROI):
+        for name, item in self.rois.items():
+            if item is rect:
+                x_start, y_start = (int(round(v)) for v in rect.pos())
+                drawn_w, drawn_h = (max(1, int(round(v))) for v in rect.size())
+                w, h, last_w, last_h = self._roi_sizes.get(name, (drawn_w, drawn_h, drawn_w, drawn_h))
+                if (drawn_w, drawn_h) != (last_w, last_h): # resized: the drawn (odd) size is the new size
+                    w, h = drawn_w, drawn_h
+                self._roi_sizes[name] = (w, h, drawn_w, drawn_h)
+                # a w x h region spans w // 2 pixels on either side of its center
+                self.roi_moved.emit(name, x_start + w // 2, y_start + h // 2, w, h)
+                return
+
+
+    def set_line_profile(self, name:str, x0:float, y0:float, x1:float, y1:float):
+        """
+        line handle from (x0, y0) to (x1, y1), in sensor pixels (pixel centers on integers)
+        """
+        self.remove_profile(name)
+        pen = pg.mkPen(PROFILE_COLORS.get(name, PROBE_COLOR), width=1)
+        line = pg.LineSegmentROI(positions=[(x0 + 0.5, y0 + 0.5), (x1 + 0.5, y1 + 0.5)], pen=pen)
+        line.sigRegionChangeFinished.connect(self.emit_profile_moved)
+        self.view_box.addItem(line)
+        self.profiles[name] = line
+
+
+    def set_radial_profile(self, name:str, x:float, y:float, radius:float):
+        """
+        circle handle of radius around (x, y), in sensor pixels (pixel centers on integers)
+        """
+        self.remove_profile(name)
+        pen = pg.mkPen(PROFILE_COLORS.get(name, PROBE_COLOR), width=1)
+        circle = pg.CircleROI(pos=(x + 0.5 - radius, y + 0.5 - radius), size=(2 * radius, 2 * radius), pen=pen)
+        circle.sigRegionChangeFinished.connect(self.emit_profile_moved)
+        self.view_box.addItem(circle)
+        self.profiles[name] = circle
+
+
+    def remove_profile(self, name:str):
+        item = self.profiles.pop(name, None)
+        if item is not None:
+            self.view_box.removeItem(item)
+
+
+    def emit_profile_moved(self, item:pg.ROI):
+        for name, profile in self.profiles.items():
+            if profile is not item:
+                continue
+            if isinstance(item, pg.LineSegmentROI):
+                (x0, y0), (x1, y1) = ((p.x() - 0.5, p.y() - 0.5) for p in (item.mapToParent(q) for q in item.listPoints()))
+                self.profile_moved.emit(name, (x0, y0, x1, y1))
+            else:
+                radius = item.size().x() / 2
+                self.profile_moved.emit(name, (item.pos().x() + radius - 0.5, item.pos().y() + radius - 0.5, radius))
+            return